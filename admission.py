@@ -0,0 +1,142 @@
+import asyncio
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+
+from metrics import registry
+from ratelimit import TokenBucket
+
+registry.describe("veriguard_admission_shed_total", "Requests given a degraded response instead of a slot, by reason.")
+registry.describe("veriguard_admission_queue_seconds", "Time admitted requests waited for a slot.")
+
+
+class Ticket:
+    """One admitted request's slot; release() is safe to call more than once."""
+
+    __slots__ = ("_controller", "_released")
+
+    def __init__(self, controller):
+        self._controller = controller
+        self._released = False
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self._controller._release()
+
+
+class AdmissionController:
+    """Bounds the requests doing upstream work at once, shedding the rest instead of queueing them.
+
+    Up to max_in_flight requests hold a slot; up to max_queue more wait for
+    one, but no longer than queue_timeout. Each client (by IP) also
+    has a token bucket of client_rate requests per second with bursts of
+    client_burst; the least recently seen max_clients are tracked. A request
+    that can't be admitted gets None from acquire() and should be answered
+    from the degraded path.
+    """
+
+    def __init__(self, max_in_flight=64, max_queue=128, queue_timeout=2.0, client_rate=1.0, client_burst=10,
+                 max_clients=10000):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.client_rate = client_rate
+        self.client_burst = client_burst
+        self.max_clients = max_clients
+        self.in_flight = 0
+        self._waiters = deque()
+        self._clients = OrderedDict()
+        self.admitted = 0
+        self.shed = 0
+
+    @property
+    def queued(self):
+        return len(self._waiters)
+
+    def _allow_client(self, client):
+        if not client or self.client_rate <= 0:
+            return True
+        bucket = self._clients.get(client)
+        if bucket is None:
+            bucket = self._clients[client] = TokenBucket(self.client_rate, self.client_burst)
+            if len(self._clients) > self.max_clients:
+                self._clients.popitem(last=False)
+        else:
+            self._clients.move_to_end(client)
+        return bucket.try_acquire()
+
+    def check_client(self, client):
+        """Count one request against client's rate without taking a slot; False (and shed) when over it."""
+        if self._allow_client(client):
+            return True
+        self._shed("client_rate")
+        return False
+
+    def _shed(self, reason):
+        self.shed += 1
+        registry.inc("veriguard_admission_shed_total", reason=reason)
+        return None
+
+    def _admit(self, waited):
+        self.admitted += 1
+        registry.observe("veriguard_admission_queue_seconds", waited)
+        return Ticket(self)
+
+    async def acquire(self, client=None):
+        """Return a Ticket once a slot is free, or None if the request should be shed."""
+        if not self._allow_client(client):
+            return self._shed("client_rate")
+        if self.in_flight < self.max_in_flight and not self._waiters:
+            self.in_flight += 1
+            return self._admit(0.0)
+        if self.queued >= self.max_queue:
+            return self._shed("queue_full")
+        start = time.perf_counter()
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            # _release hands its slot straight to the waiter, so in_flight is already counted
+            await asyncio.wait_for(asyncio.shield(waiter), self.queue_timeout)
+        except asyncio.TimeoutError:
+            if not waiter.done():
+                waiter.cancel()
+                return self._shed("queue_timeout")
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self._release()
+            waiter.cancel()
+            raise
+        finally:
+            if waiter.cancelled():
+                self._waiters.remove(waiter)
+        return self._admit(time.perf_counter() - start)
+
+    def _release(self):
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
+
+    @asynccontextmanager
+    async def slot(self, client=None):
+        """Async context manager around acquire(); yields the Ticket, or None when shed."""
+        ticket = await self.acquire(client)
+        try:
+            yield ticket
+        finally:
+            if ticket is not None:
+                ticket.release()
+
+    def stats(self):
+        return {
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "queued": self.queued,
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "shed": self.shed,
+            "clients": len(self._clients),
+        }
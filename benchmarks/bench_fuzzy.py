@@ -0,0 +1,110 @@
+"""Benchmark the trigram index behind correct_medical_term against a linear difflib scan.
+
+Usage: python benchmarks/bench_fuzzy.py [--terms 50000] [--queries 300]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from difflib import SequenceMatcher
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fuzzy import DEFAULT_SYMPTOMS_PATH, TrigramIndex  # noqa: E402
+
+SYLLABLES = ["ab", "ac", "al", "an", "ar", "bra", "cal", "card", "cer", "chon", "cyst", "derm", "dys",
+             "en", "gas", "gen", "hem", "hep", "ia", "ic", "it", "is", "lith", "lum", "my", "neur", "oma",
+             "os", "path", "pep", "phy", "pul", "ren", "sis", "spas", "tal", "tis", "tro", "ul", "vas"]
+BODY_PARTS = ["", "chest", "back", "knee", "skin", "eye", "ear", "neck", "hip", "hand", "foot", "lower"]
+
+
+def load_real_terms():
+    with open(DEFAULT_SYMPTOMS_PATH, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith("#")]
+
+
+def synthetic_vocabulary(size, rng):
+    """Pad the shipped symptom list with plausible medical-looking terms."""
+    terms = set(load_real_terms())
+    while len(terms) < size:
+        word = "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 5)))
+        prefix = rng.choice(BODY_PARTS)
+        terms.add(f"{prefix} {word}".strip())
+    return sorted(terms)
+
+
+def misspell(term, rng):
+    chars = list(term)
+    i = rng.randrange(len(chars))
+    op = rng.choice(["delete", "swap", "replace", "insert"])
+    if op == "delete" and len(chars) > 3:
+        del chars[i]
+    elif op == "swap" and i < len(chars) - 1:
+        chars[i], chars[i + 1] = chars[i + 1], chars[i]
+    elif op == "replace":
+        chars[i] = rng.choice("abcdefghijklmnopqrstuvwxyz")
+    else:
+        chars.insert(i, rng.choice("abcdefghijklmnopqrstuvwxyz"))
+    return "".join(chars)
+
+
+def linear_scan(term, vocabulary, threshold=0.8):
+    """The previous correct_medical_term: first vocabulary term above threshold."""
+    for candidate in vocabulary:
+        if SequenceMatcher(None, term, candidate).ratio() > threshold:
+            return candidate
+    return None
+
+
+def time_calls(func, queries):
+    timings = []
+    results = []
+    for query in queries:
+        start = time.perf_counter()
+        results.append(func(query))
+        timings.append((time.perf_counter() - start) * 1000)
+    return results, timings
+
+
+def report(name, timings):
+    timings = sorted(timings)
+    p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+    print(f"{name:<14} mean {statistics.mean(timings):9.3f} ms   p50 {statistics.median(timings):9.3f} ms   p99 {p99:9.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--terms", type=int, default=50000)
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--linear-queries", type=int, default=20,
+                        help="queries to time against the linear scan (it is slow at large sizes)")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    vocabulary = synthetic_vocabulary(args.terms, rng)
+    real_terms = load_real_terms()
+    queries = [misspell(rng.choice(real_terms), rng) for _ in range(args.queries)]
+
+    start = time.perf_counter()
+    index = TrigramIndex(vocabulary)
+    print(f"Vocabulary: {len(index)} terms, index built in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    index_results, index_timings = time_calls(lambda q: index.best_match(q)[0], queries)
+    linear_queries = queries[:args.linear_queries]
+    linear_results, linear_timings = time_calls(lambda q: linear_scan(q, vocabulary), linear_queries)
+
+    report("trigram index", index_timings)
+    report("linear difflib", linear_timings)
+    speedup = statistics.mean(linear_timings) / statistics.mean(index_timings)
+    print(f"Speedup: {speedup:.0f}x")
+
+    agree = sum(a == b for a, b in zip(index_results, linear_results))
+    corrected = sum(result is not None for result in index_results)
+    print(f"Corrections found: {corrected}/{len(queries)}; agreement with linear scan on timed subset: {agree}/{len(linear_queries)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,368 @@
+"""Load-test /process against local upstream stand-ins: throughput, tail latency and event-loop lag.
+
+Starts benchmarks/mock_upstreams.py and a uvicorn server pointed at it (or
+uses --target/--mock-url for servers already running), replays a traffic
+mix and reports requests/s, p50/p95/p99 per request kind and the server's
+event-loop lag from /metrics.
+
+Traces are generated from --mix and --seed, so a run is repeatable; save one
+with --save-trace and replay it later with --trace. Write results with
+--output and gate on a previous run with --compare (non-zero exit when a p99
+or the throughput regresses by more than --tolerance).
+
+Usage: python benchmarks/bench_load.py [--mix mixed] [--requests 500] [--concurrency 32] [--rate 0]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+import aiohttp
+
+from mock_upstreams import SYMPTOMS, test_image, upstream_env
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Request kinds and their share of traffic
+MIXES = {
+    "cold": {"text_cold": 1.0},
+    "hot": {"text_hot": 1.0},
+    "followups": {"text_hot": 0.3, "followup": 0.7},
+    "images": {"upload": 0.5, "image_url": 0.5},
+    "mixed": {"text_hot": 0.4, "text_cold": 0.2, "followup": 0.15, "stream": 0.1, "upload": 0.1, "image_url": 0.05},
+}
+HOT_TEXTS = ["I have a headache", "I have a fever", "Does garlic cure a cough?", "my back pain is getting worse",
+             "I feel dizzy when I stand up", "sore throat remedies", "Is a detox cleanse safe?", "hello"]
+OPENERS = ["I have", "I've had", "my son has", "what helps with", "is it normal to have", "how do I treat"]
+DETAILS = ["since yesterday", "every morning", "after running", "at night", "for {n} days", "and it won't stop"]
+FOLLOWUPS = ["what about for kids?", "how long should it last?", "should I see a doctor?", "is ibuprofen ok?",
+             "can I still exercise?", "what if it gets worse?"]
+HOT_IMAGES = 5
+OPENS_CONVERSATION = ("text_hot", "text_cold", "stream")
+
+
+def load_mix(name):
+    if name in MIXES:
+        return MIXES[name]
+    with open(name, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def build_trace(mix, count, seed, rate):
+    """Deterministic list of requests; with rate > 0 each gets a Poisson arrival offset."""
+    rng = random.Random(seed)
+    kinds, weights = zip(*mix.items())
+    trace = []
+    conversations = []
+    at = 0.0
+    for i in range(count):
+        if rate > 0:
+            at += rng.expovariate(rate)
+        kind = rng.choices(kinds, weights)[0]
+        if kind == "followup" and not conversations:
+            kind = "text_cold"
+        entry = {"id": i, "at": round(at, 4), "kind": kind}
+        if kind in ("text_hot", "stream"):
+            entry["text"] = rng.choice(HOT_TEXTS)
+        elif kind == "text_cold":
+            detail = rng.choice(DETAILS).format(n=rng.randint(2, 30))
+            entry["text"] = f"{rng.choice(OPENERS)} {rng.choice(SYMPTOMS)} {detail} ({i})"
+        elif kind == "followup":
+            entry["text"] = rng.choice(FOLLOWUPS)
+            entry["conversation"] = rng.choice(conversations)
+        else:
+            # A few images repeat (cache-hot), the rest are new
+            entry["image"] = rng.randrange(HOT_IMAGES) if rng.random() < 0.5 else 1000 + i
+        if kind in OPENS_CONVERSATION:
+            conversations.append(i)
+        trace.append(entry)
+    return trace
+
+
+def percentile(samples, q):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+
+
+async def watch_lag(samples, interval=0.05):
+    """The harness's own event-loop lag; if it is high, the client is the bottleneck."""
+    while True:
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        samples.append(max(0.0, time.perf_counter() - start - interval))
+
+
+class Runner:
+    def __init__(self, target, mock_url, concurrency, timeout):
+        self.target = target.rstrip("/")
+        self.mock_url = mock_url.rstrip("/")
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.chat_ids = {}
+        self.images = {}
+        self.results = []
+
+    def form(self, entry):
+        data = aiohttp.FormData()
+        if "text" in entry:
+            data.add_field("text", entry["text"])
+        if entry["kind"] == "followup":
+            data.add_field("chat_id", self.chat_ids[entry["conversation"]].result() or "")
+            data.add_field("conversation_context", "true")
+        elif entry["kind"] == "upload":
+            seed = entry["image"]
+            if seed not in self.images:
+                self.images[seed] = test_image(seed)
+            data.add_field("file", self.images[seed], filename=f"{seed}.png", content_type="image/png")
+        elif entry["kind"] == "image_url":
+            data.add_field("image_url", f"{self.mock_url}/images/{entry['image']}.png")
+        return data
+
+    async def send(self, session, entry):
+        path = "/process/stream" if entry["kind"] == "stream" else "/process"
+        start = time.perf_counter()
+        first_byte = None
+        chat_id = None
+        ok = False
+        degraded = False
+        try:
+            async with session.post(self.target + path, data=self.form(entry), timeout=self.timeout) as response:
+                if path == "/process":
+                    body = await response.json(content_type=None)
+                    first_byte = time.perf_counter()
+                    chat_id = body.get("chat_id")
+                    ok = response.status == 200 and not body.get("summary", "").startswith("Sorry")
+                    degraded = bool(body.get("degraded"))
+                else:
+                    async for line in response.content:
+                        if first_byte is None and line.startswith(b"event: token"):
+                            first_byte = time.perf_counter()
+                        if line.startswith(b"data: ") and b'"chat_id"' in line:
+                            data = json.loads(line[6:])
+                            chat_id = data.get("chat_id", chat_id)
+                            degraded = degraded or bool(data.get("degraded"))
+                    ok = response.status == 200
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError):
+            pass
+        end = time.perf_counter()
+        self.results.append({"kind": entry["kind"], "seconds": end - start, "ok": ok, "degraded": degraded,
+                             "first_byte": (first_byte or end) - start})
+        return chat_id
+
+    async def run_one(self, session, entry, t0):
+        future = self.chat_ids.get(entry["id"])
+        chat_id = None
+        try:
+            delay = t0 + entry["at"] - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if entry["kind"] == "followup":
+                # A follow-up can only be sent once its conversation has a chat_id
+                await asyncio.shield(self.chat_ids[entry["conversation"]])
+            async with self.semaphore:
+                chat_id = await self.send(session, entry)
+        finally:
+            if future is not None and not future.done():
+                future.set_result(chat_id)
+
+    async def run(self, trace):
+        loop = asyncio.get_running_loop()
+        for entry in trace:
+            if entry["kind"] in OPENS_CONVERSATION:
+                self.chat_ids[entry["id"]] = loop.create_future()
+        lag = []
+        watcher = asyncio.ensure_future(watch_lag(lag))
+        connector = aiohttp.TCPConnector(limit=0)
+        async with aiohttp.ClientSession(connector=connector) as session:
+            t0 = time.perf_counter()
+            await asyncio.gather(*(self.run_one(session, entry, t0) for entry in trace))
+            elapsed = time.perf_counter() - t0
+        watcher.cancel()
+        return elapsed, lag
+
+
+def scrape_metrics(target):
+    """Server event-loop lag quantiles from /metrics ({} if the endpoint isn't there)."""
+    try:
+        with urllib.request.urlopen(f"{target}/metrics", timeout=5) as response:
+            text = response.read().decode()
+    except (urllib.error.URLError, OSError):
+        return {}
+    lag = {}
+    for line in text.splitlines():
+        if line.startswith("veriguard_event_loop_lag_seconds{quantile="):
+            quantile = line.split('"')[1]
+            lag[f"p{round(float(quantile) * 100)}"] = float(line.rsplit(" ", 1)[1])
+    return lag
+
+
+def fetch_json(url):
+    try:
+        with urllib.request.urlopen(url, timeout=5) as response:
+            return json.load(response)
+    except (urllib.error.URLError, OSError, ValueError):
+        return None
+
+
+def wait_for(url, deadline):
+    while time.perf_counter() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=1) as response:
+                if response.status == 200:
+                    return
+        except (urllib.error.URLError, ConnectionError, OSError):
+            pass
+        time.sleep(0.05)
+    raise TimeoutError(url)
+
+
+def start_servers(args):
+    """Start the mock upstreams and the app; returns (processes, target, mock_url)."""
+    mock_url = f"http://127.0.0.1:{args.mock_port}"
+    target = f"http://127.0.0.1:{args.port}"
+    mock_cmd = [sys.executable, os.path.join(ROOT, "benchmarks", "mock_upstreams.py"),
+                "--port", str(args.mock_port), "--seed", str(args.seed)]
+    if args.profile:
+        mock_cmd += ["--profile", args.profile]
+    mock = subprocess.Popen(mock_cmd, stdout=subprocess.DEVNULL)
+    # Every request comes from this one IP, so per-client limits are off unless CLIENT_RATE is set
+    env = dict({"CLIENT_RATE": "0"}, **os.environ, **upstream_env(mock_url), WARMUP_MODE="blocking",
+               CACHE_BACKEND="memory")
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(args.port), "--workers", str(args.workers),
+         "--log-level", "warning"],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    processes = [server, mock]
+    try:
+        deadline = time.perf_counter() + 60
+        wait_for(f"{mock_url}/stats", deadline)
+        wait_for(f"{target}/readyz", deadline)
+    except TimeoutError:
+        stop(processes)
+        raise
+    return processes, target, mock_url
+
+
+def stop(processes):
+    for process in processes:
+        process.terminate()
+        process.wait()
+
+
+def summarize(results, elapsed, server_lag, client_lag):
+    by_kind = {}
+    for kind in sorted({r["kind"] for r in results}) + ["all"]:
+        rows = [r for r in results if kind in ("all", r["kind"])]
+        seconds = [r["seconds"] for r in rows]
+        by_kind[kind] = {
+            "count": len(rows),
+            "errors": sum(not r["ok"] for r in rows),
+            "degraded": sum(r.get("degraded", False) for r in rows),
+            "p50": percentile(seconds, 0.5),
+            "p95": percentile(seconds, 0.95),
+            "p99": percentile(seconds, 0.99),
+            "first_byte_p50": percentile([r["first_byte"] for r in rows], 0.5),
+        }
+    return {
+        "elapsed": elapsed,
+        "rps": len(results) / elapsed if elapsed else 0.0,
+        "kinds": by_kind,
+        "server_loop_lag": server_lag,
+        "client_loop_lag": {"p50": percentile(client_lag, 0.5), "p99": percentile(client_lag, 0.99),
+                            "max": max(client_lag, default=0.0)},
+    }
+
+
+def report(summary, upstream_calls):
+    print(f"{summary['kinds']['all']['count']} requests in {summary['elapsed']:.1f}s: {summary['rps']:.1f} req/s")
+    print(f"{'kind':<12}{'count':>7}{'errors':>8}{'shed':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'ttfb p50':>10}")
+    for kind, row in summary["kinds"].items():
+        print(f"{kind:<12}{row['count']:>7}{row['errors']:>8}{row['degraded']:>6}{row['p50'] * 1000:>10.0f}{row['p95'] * 1000:>10.0f}"
+              f"{row['p99'] * 1000:>10.0f}{row['first_byte_p50'] * 1000:>10.0f}")
+    lag = summary["server_loop_lag"]
+    if lag:
+        print("server loop lag " + "  ".join(f"{q} {value * 1000:.1f} ms" for q, value in lag.items()))
+    client = summary["client_loop_lag"]
+    print(f"client loop lag p99 {client['p99'] * 1000:.1f} ms  max {client['max'] * 1000:.1f} ms")
+    if upstream_calls:
+        print("upstream calls  " + "  ".join(f"{name} {dict(counts)}" for name, counts in upstream_calls.items()))
+
+
+def regressions(summary, baseline, tolerance):
+    """Human-readable list of metrics worse than baseline by more than tolerance."""
+    found = []
+    if summary["rps"] < baseline["rps"] * (1 - tolerance):
+        found.append(f"throughput {summary['rps']:.1f} req/s vs {baseline['rps']:.1f}")
+    for kind, row in summary["kinds"].items():
+        before = baseline["kinds"].get(kind)
+        if before and row["p99"] > before["p99"] * (1 + tolerance):
+            found.append(f"{kind} p99 {row['p99'] * 1000:.0f} ms vs {before['p99'] * 1000:.0f} ms")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mix", default="mixed", help=f"one of {', '.join(MIXES)} or a JSON file of kind weights")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--rate", type=float, default=0, help="open-loop arrivals per second (0: closed loop)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--trace", help="replay a trace saved with --save-trace instead of generating one")
+    parser.add_argument("--save-trace")
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--target", help="URL of an app already running (skips starting servers)")
+    parser.add_argument("--mock-url", help="URL of the mock upstreams serving images for --target")
+    parser.add_argument("--port", type=int, default=8799)
+    parser.add_argument("--mock-port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--profile", help="upstream latency/error profile for mock_upstreams.py")
+    parser.add_argument("--output", help="write the results as JSON")
+    parser.add_argument("--compare", help="results JSON from an earlier run to gate against")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    if args.trace:
+        with open(args.trace, encoding="utf-8") as f:
+            trace = [json.loads(line) for line in f if line.strip()]
+    else:
+        trace = build_trace(load_mix(args.mix), args.requests, args.seed, args.rate)
+    if args.save_trace:
+        with open(args.save_trace, "w", encoding="utf-8") as f:
+            f.writelines(json.dumps(entry) + "\n" for entry in trace)
+
+    processes = []
+    if args.target:
+        target, mock_url = args.target.rstrip("/"), (args.mock_url or f"http://127.0.0.1:{args.mock_port}")
+    else:
+        processes, target, mock_url = start_servers(args)
+    try:
+        runner = Runner(target, mock_url, args.concurrency, args.timeout)
+        elapsed, client_lag = asyncio.run(runner.run(trace))
+        summary = summarize(runner.results, elapsed, scrape_metrics(target), client_lag)
+        upstream_calls = fetch_json(f"{mock_url}/stats")
+    finally:
+        stop(processes)
+
+    report(summary, upstream_calls)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"mix": args.mix, "requests": len(trace), "concurrency": args.concurrency,
+                       "rate": args.rate, **summary}, f, indent=2)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            found = regressions(summary, json.load(f), args.tolerance)
+        for line in found:
+            print(f"REGRESSION: {line}")
+        if found:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""Measure cold start: import time, time to liveness and readiness, and first-request latency.
+
+Starts a fresh uvicorn process per run so every run is genuinely cold. The
+first request runs the full pipeline against benchmarks/mock_upstreams.py
+with every upstream answering instantly, so its latency is the server's own
+cold-path cost rather than the network's.
+
+Usage: python benchmarks/bench_startup.py [--runs 5] [--port 8799] [--mock-port 8798]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+from mock_upstreams import DEFAULT_PROFILE, upstream_env
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def import_time():
+    """Seconds for a fresh interpreter to import main."""
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "import main"], cwd=ROOT, check=True)
+    return time.perf_counter() - start
+
+
+def wait_for(url, deadline, accept=(200,)):
+    while time.perf_counter() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=1) as response:
+                if response.status in accept:
+                    return time.perf_counter()
+        except (urllib.error.URLError, ConnectionError, OSError):
+            pass
+        time.sleep(0.01)
+    raise TimeoutError(url)
+
+
+def first_request(base_url):
+    """Latency of a first, uncached query through every pipeline stage."""
+    data = urllib.parse.urlencode({"text": "Does garlic cure a cold?"}).encode()
+    start = time.perf_counter()
+    with urllib.request.urlopen(f"{base_url}/process", data=data, timeout=60) as response:
+        response.read()
+    return time.perf_counter() - start
+
+
+def start_mock(port):
+    """Start mock_upstreams.py with zero latency and no errors; returns (process, base_url)."""
+    instant = {"latency": {"dist": "fixed", "value": 0.0}, "error_rate": 0.0, "rate_limit": None}
+    profile = {name: dict(instant, image_latency=None) for name in DEFAULT_PROFILE}
+    with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as f:
+        json.dump(profile, f)
+    mock = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, "benchmarks", "mock_upstreams.py"), "--port", str(port), "--profile", f.name],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    mock_url = f"http://127.0.0.1:{port}"
+    wait_for(f"{mock_url}/stats", time.perf_counter() + 30)
+    os.unlink(f.name)
+    return mock, mock_url
+
+
+def cold_start(port, mode, mock_url):
+    env = dict(os.environ, **upstream_env(mock_url), WARMUP_MODE=mode, CACHE_BACKEND="memory")
+    base_url = f"http://127.0.0.1:{port}"
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT, env=env,
+    )
+    try:
+        deadline = start + 60
+        live = wait_for(f"{base_url}/healthz", deadline) - start
+        ready = wait_for(f"{base_url}/readyz", deadline) - start
+        first = first_request(base_url)
+        return live, ready, first
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def report(name, samples):
+    print(f"{name:<16} p50 {statistics.median(samples) * 1000:8.0f} ms   max {max(samples) * 1000:8.0f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--port", type=int, default=8799)
+    parser.add_argument("--mock-port", type=int, default=8798)
+    parser.add_argument("--mode", default="background", choices=["background", "blocking", "off"],
+                        help="WARMUP_MODE for the server under test")
+    args = parser.parse_args()
+
+    report("import main", [import_time() for _ in range(args.runs)])
+    mock, mock_url = start_mock(args.mock_port)
+    try:
+        runs = [cold_start(args.port, args.mode, mock_url) for _ in range(args.runs)]
+    finally:
+        mock.terminate()
+        mock.wait()
+    report("healthz", [live for live, _, _ in runs])
+    report("readyz", [ready for _, ready, _ in runs])
+    report("first request", [first for _, _, first in runs])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""In-process Redis stand-in speaking RESP2, for testing cache.RedisBackend without a server.
+
+Supports PING, AUTH, SELECT, GET, SET (with EX/PX), DEL and FLUSHDB, keeps
+one keyspace per database number and counts connections and commands, so
+tests can check pooling. fail_next and drop_next inject an error reply or a
+dropped connection for the next matching command.
+
+Usage: python benchmarks/mock_redis.py [--port 6380] [--password secret]
+"""
+import argparse
+import asyncio
+import time
+from collections import Counter, defaultdict
+
+
+class MockRedis:
+    def __init__(self, password=None):
+        self.password = password
+        self.databases = defaultdict(dict)  # db -> key -> (expires_at or None, value bytes)
+        self.connections = 0
+        self.commands = Counter()
+        self.fail_next = {}  # command -> error message
+        self.drop_next = set()  # commands to answer by closing the connection
+        self._server = None
+
+    @property
+    def port(self):
+        return self._server.sockets[0].getsockname()[1]
+
+    @property
+    def url(self):
+        auth = f":{self.password}@" if self.password else ""
+        return f"redis://{auth}127.0.0.1:{self.port}/0"
+
+    async def start(self, host="127.0.0.1", port=0):
+        self._server = await asyncio.start_server(self._serve, host, port)
+        return self
+
+    async def close(self):
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    @staticmethod
+    async def _read_command(reader):
+        line = await reader.readline()
+        if not line:
+            return None
+        if not line.startswith(b"*"):
+            # Inline command, as typed into telnet
+            return line.split()
+        args = []
+        for _ in range(int(line[1:-2])):
+            length = int((await reader.readline())[1:-2])
+            args.append((await reader.readexactly(length + 2))[:-2])
+        return args
+
+    @staticmethod
+    def _bulk(value):
+        return b"$-1\r\n" if value is None else b"$%d\r\n%s\r\n" % (len(value), value)
+
+    def _get(self, db, key):
+        entry = self.databases[db].get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self.databases[db][key]
+            return None
+        return value
+
+    def _execute(self, state, name, args):
+        if self.password and not state["authed"] and name not in ("AUTH", "PING"):
+            return b"-NOAUTH Authentication required.\r\n"
+        if name == "PING":
+            return b"+PONG\r\n"
+        if name == "AUTH":
+            if args[-1].decode() != self.password:
+                return b"-WRONGPASS invalid username-password pair\r\n"
+            state["authed"] = True
+            return b"+OK\r\n"
+        if name == "SELECT":
+            state["db"] = int(args[0])
+            return b"+OK\r\n"
+        keyspace = self.databases[state["db"]]
+        if name == "GET":
+            return self._bulk(self._get(state["db"], args[0]))
+        if name == "SET":
+            key, value, options = args[0], args[1], [arg.upper() for arg in args[2:]]
+            expires_at = None
+            for unit, scale in ((b"EX", 1.0), (b"PX", 0.001)):
+                if unit in options:
+                    expires_at = time.monotonic() + int(args[2 + options.index(unit) + 1]) * scale
+            keyspace[key] = (expires_at, value)
+            return b"+OK\r\n"
+        if name == "DEL":
+            removed = sum(keyspace.pop(key, None) is not None for key in args)
+            return b":%d\r\n" % removed
+        if name == "FLUSHDB":
+            keyspace.clear()
+            return b"+OK\r\n"
+        return f"-ERR unknown command '{name}'\r\n".encode()
+
+    async def _serve(self, reader, writer):
+        self.connections += 1
+        state = {"db": 0, "authed": False}
+        try:
+            while (command := await self._read_command(reader)) is not None:
+                name, args = command[0].decode().upper(), command[1:]
+                self.commands[name] += 1
+                if name in self.drop_next:
+                    self.drop_next.discard(name)
+                    break
+                if name in self.fail_next:
+                    reply = f"-ERR {self.fail_next.pop(name)}\r\n".encode()
+                else:
+                    reply = self._execute(state, name, args)
+                writer.write(reply)
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+async def serve_forever(port, password):
+    server = await MockRedis(password).start(port=port)
+    print(f"Mock Redis listening on {server.url}")
+    await asyncio.Event().wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=6380)
+    parser.add_argument("--password")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve_forever(args.port, args.password))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,267 @@
+"""Local stand-ins for Gemini, OpenRouter, PubMed E-utilities and Google Fact Check.
+
+Each upstream gets a latency distribution, an error rate and an optional rate
+limit, so /process can be load-tested without spending API quota. Point the
+app at it with:
+
+    GEMINI_BASE_URL=http://127.0.0.1:8765/gemini
+    OPENROUTER_BASE_URL=http://127.0.0.1:8765/openrouter
+    PUBMED_BASE_URL=http://127.0.0.1:8765/pubmed
+    FACT_CHECK_BASE_URL=http://127.0.0.1:8765/factcheck
+
+It also serves test images under /images/<seed>.png and per-upstream call
+counts at /stats.
+
+Usage: python benchmarks/mock_upstreams.py [--port 8765] [--profile profile.json] [--seed 0]
+"""
+import argparse
+import asyncio
+import copy
+import hashlib
+import io
+import json
+import math
+import random
+import time
+from collections import Counter
+
+from aiohttp import web
+
+# Latencies roughly as observed from a small cloud instance; override per run with --profile
+DEFAULT_PROFILE = {
+    "gemini": {"latency": {"dist": "lognormal", "median": 0.6, "p99": 2.5}, "error_rate": 0.005,
+               "rate_limit": None, "image_latency": {"dist": "lognormal", "median": 2.0, "p99": 6.0}},
+    "openrouter": {"latency": {"dist": "lognormal", "median": 0.8, "p99": 4.0}, "error_rate": 0.01,
+                   "rate_limit": None, "tokens_per_second": 60},
+    "pubmed": {"latency": {"dist": "lognormal", "median": 0.25, "p99": 1.2}, "error_rate": 0.005,
+               "rate_limit": {"rate": 10, "burst": 10}},
+    "fact_check": {"latency": {"dist": "lognormal", "median": 0.3, "p99": 1.0}, "error_rate": 0.005,
+                   "rate_limit": None},
+}
+
+SYMPTOMS = ["headache", "fever", "cough", "nausea", "back pain", "sore throat", "dizziness", "fatigue",
+            "rash", "chest pain", "migraine", "diarrhea", "stomachache", "joint pain", "runny nose"]
+OCR_TEXTS = ["Drinking lemon water cures a fever overnight", "Garlic is a miracle cure for a cough",
+             "A detox cleanse removes the cause of headaches", "Cold showers cure back pain",
+             "I have had a sore throat and fever for three days"]
+
+
+def load_profile(path=None):
+    """DEFAULT_PROFILE with any per-upstream keys from a JSON file merged over it."""
+    profile = copy.deepcopy(DEFAULT_PROFILE)
+    if path:
+        with open(path, encoding="utf-8") as f:
+            for upstream, settings in json.load(f).items():
+                profile.setdefault(upstream, {}).update(settings)
+    return profile
+
+
+def sample_latency(spec, rng):
+    """Seconds drawn from a {"dist": fixed|uniform|lognormal, ...} spec."""
+    dist = spec.get("dist", "fixed")
+    if dist == "fixed":
+        return spec.get("value", 0.0)
+    if dist == "uniform":
+        return rng.uniform(spec["low"], spec["high"])
+    if dist == "lognormal":
+        # Pick sigma so the 99th percentile lands on spec["p99"] (z = 2.326)
+        sigma = math.log(spec["p99"] / spec["median"]) / 2.326
+        return rng.lognormvariate(math.log(spec["median"]), sigma)
+    raise ValueError(f"Unknown latency distribution: {dist}")
+
+
+class Throttle:
+    """Token bucket that rejects rather than waits, like the real APIs' 429s."""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+class Upstream:
+    """Latency, error and rate-limit behaviour of one mocked service."""
+
+    def __init__(self, name, settings, rng):
+        self.name = name
+        self.settings = settings
+        self.rng = rng
+        limit = settings.get("rate_limit")
+        self.throttle = Throttle(limit["rate"], limit.get("burst", limit["rate"])) if limit else None
+        self.counts = Counter()
+
+    async def enter(self, latency_key="latency"):
+        """Sleep for a sampled latency; return an error response to send instead, or None."""
+        self.counts["calls"] += 1
+        if self.throttle and not self.throttle.take():
+            self.counts["throttled"] += 1
+            return web.json_response({"error": "rate limited"}, status=429, headers={"Retry-After": "1"})
+        await asyncio.sleep(sample_latency(self.settings.get(latency_key) or self.settings["latency"], self.rng))
+        if self.rng.random() < self.settings.get("error_rate", 0.0):
+            self.counts["errors"] += 1
+            return web.json_response({"error": "unavailable"}, status=503)
+        return None
+
+
+def symptom_in(text):
+    text = text.lower()
+    return next((symptom for symptom in SYMPTOMS if symptom in text), "headache")
+
+
+def test_image(seed):
+    """A small PNG whose pixels (and so hash) depend only on seed."""
+    from PIL import Image
+
+    rng = random.Random(seed)
+    image = Image.new("RGB", (320, 200), (255, 255, 255))
+    image.putdata([(rng.randrange(256),) * 3 if rng.random() < 0.05 else (255, 255, 255)
+                   for _ in range(320 * 200)])
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def missing_key(request):
+    """Google APIs take the key in x-goog-api-key; reject calls without it, as they would."""
+    if request.headers.get("x-goog-api-key"):
+        return None
+    return web.json_response({"error": {"code": 403, "message": "API key missing"}}, status=403)
+
+
+def make_app(profile=None, seed=0):
+    profile = profile or load_profile()
+    rng = random.Random(seed)
+    upstreams = {name: Upstream(name, settings, rng) for name, settings in profile.items()}
+    images = {}
+
+    async def gemini(request):
+        if (rejected := missing_key(request)) is not None:
+            return rejected
+        body = await request.json()
+        parts = body["contents"][0]["parts"]
+        prompt = parts[0]["text"]
+        image = next((part["inline_data"]["data"] for part in parts if "inline_data" in part), None)
+        error = await upstreams["gemini"].enter("image_latency" if image else "latency")
+        if error is not None:
+            return error
+        if image:
+            digest = int(hashlib.sha1(image.encode()).hexdigest(), 16)
+            text = OCR_TEXTS[digest % len(OCR_TEXTS)]
+        elif "JSON array of" in prompt:
+            messages = [line.split(". ", 1)[-1] for line in prompt.split("\n\n", 1)[-1].splitlines()]
+            text = json.dumps([symptom_in(message) for message in messages])
+        elif prompt.startswith("Extract the main"):
+            text = symptom_in(prompt.split("from:", 1)[-1])
+        elif "title" in prompt:
+            text = symptom_in(prompt).capitalize() + " help"
+        else:
+            text = "Rest, drink fluids and see a doctor if symptoms last more than a few days."
+        return web.json_response({"candidates": [{"content": {"parts": [{"text": text}]}}]})
+
+    async def openrouter(request):
+        body = await request.json()
+        upstream = upstreams["openrouter"]
+        error = await upstream.enter()
+        if error is not None:
+            return error
+        symptom = symptom_in(body["messages"][-1]["content"])
+        answer = (f"- For {symptom}, rest and stay hydrated.\n- Over-the-counter relief may help.\n"
+                  f"- See a doctor if it worsens or lasts more than a few days.")
+        if not body.get("stream"):
+            return web.json_response({"choices": [{"message": {"content": answer}}]})
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        delay = 1.0 / upstream.settings.get("tokens_per_second", 60)
+        for token in answer.split(" "):
+            chunk = {"choices": [{"delta": {"content": token + " "}}]}
+            await response.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            await asyncio.sleep(delay)
+        await response.write(b"data: [DONE]\n\n")
+        return response
+
+    async def esearch(request):
+        error = await upstreams["pubmed"].enter()
+        if error is not None:
+            return error
+        term = request.query.get("term", "")
+        base = int(hashlib.sha1(term.encode()).hexdigest()[:6], 16)
+        ids = [str(base + i) for i in range(int(request.query.get("retmax", 2)))]
+        return web.json_response({"esearchresult": {"idlist": ids}})
+
+    async def esummary(request):
+        error = await upstreams["pubmed"].enter()
+        if error is not None:
+            return error
+        ids = request.query["id"].split(",")
+        articles = {uid: {"title": f"Clinical management of symptoms ({uid})", "pubdate": "2021",
+                          "authors": [{"name": "Smith J"}, {"name": "Lee K"}]} for uid in ids}
+        return web.json_response({"result": {"uids": ids, **articles}})
+
+    async def einfo(request):
+        return web.json_response({"einforesult": {"dblist": ["pubmed"]}})
+
+    async def fact_check(request):
+        if (rejected := missing_key(request)) is not None:
+            return rejected
+        error = await upstreams["fact_check"].enter()
+        if error is not None:
+            return error
+        query = request.query.get("query", "")
+        claims = [{"text": f"Claim about {query}", "claimReview": [{
+            "publisher": {"name": "Health Feedback"}, "textualRating": "Inaccurate",
+            "url": f"https://example.org/review/{hashlib.sha1(query.encode()).hexdigest()[:8]}"}]}]
+        return web.json_response({"claims": claims})
+
+    async def image(request):
+        seed = int(request.match_info["seed"])
+        if seed not in images:
+            images[seed] = test_image(seed)
+        return web.Response(body=images[seed], content_type="image/png")
+
+    async def stats(request):
+        return web.json_response({name: dict(upstream.counts) for name, upstream in upstreams.items()})
+
+    app = web.Application(client_max_size=32 * 1024 * 1024)
+    app.router.add_post("/gemini/models/{model}", gemini)
+    app.router.add_post("/openrouter/chat/completions", openrouter)
+    app.router.add_get("/pubmed/esearch.fcgi", esearch)
+    app.router.add_get("/pubmed/esummary.fcgi", esummary)
+    app.router.add_get("/pubmed/einfo.fcgi", einfo)
+    app.router.add_get("/factcheck/claims:search", fact_check)
+    app.router.add_get("/images/{seed:\\d+}.png", image)
+    app.router.add_get("/stats", stats)
+    return app
+
+
+def upstream_env(base_url):
+    """Environment variables pointing the app at a mock server at base_url."""
+    return {
+        "GEMINI_BASE_URL": f"{base_url}/gemini",
+        "OPENROUTER_BASE_URL": f"{base_url}/openrouter",
+        "PUBMED_BASE_URL": f"{base_url}/pubmed",
+        "FACT_CHECK_BASE_URL": f"{base_url}/factcheck",
+        "GEMINI_API_KEY": "mock", "OPENAI_API_KEY": "mock", "GOOGLE_API_KEY": "mock",
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--profile", help="JSON file of per-upstream settings merged over the defaults")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    web.run_app(make_app(load_profile(args.profile), args.seed), host="127.0.0.1", port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,480 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlparse
+
+from metrics import record_timing
+
+
+class CacheBackend:
+    """Storage interface for serialized cache entries.
+
+    Backends store opaque bytes with a TTL in seconds; serialization,
+    single-flight and hit accounting live in ResponseCache.
+    """
+
+    name = "base"
+
+    async def get(self, key):
+        raise NotImplementedError
+
+    async def set(self, key, payload, ttl):
+        raise NotImplementedError
+
+    async def delete(self, key):
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+    def stats(self):
+        return {"backend": self.name}
+
+
+class MemoryBackend(CacheBackend):
+    """Per-process LRU store bounded by entry count and total bytes."""
+
+    name = "memory"
+
+    def __init__(self, max_entries=1024, max_bytes=16 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (expires_at, payload bytes)
+        self._bytes = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def _remove(self, key):
+        _, payload = self._entries.pop(key)
+        self._bytes -= len(payload)
+
+    async def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, payload = entry
+        if expires_at <= time.monotonic():
+            self._remove(key)
+            self.expirations += 1
+            return None
+        self._entries.move_to_end(key)
+        return payload
+
+    async def set(self, key, payload, ttl):
+        if len(payload) > self.max_bytes:
+            logging.warning(f"Not caching {key}: {len(payload)} bytes exceeds cache bound")
+            return
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (time.monotonic() + ttl, payload)
+        self._bytes += len(payload)
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    async def delete(self, key):
+        if key in self._entries:
+            self._remove(key)
+
+    def snapshot(self):
+        """Yield (key, payload, remaining ttl) for live entries, least recently used first."""
+        now = time.monotonic()
+        for key, (expires_at, payload) in list(self._entries.items()):
+            if expires_at > now:
+                yield key, payload, expires_at - now
+
+    def stats(self):
+        return {
+            "backend": self.name,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+class SQLiteBackend(CacheBackend):
+    """On-disk store shared by every worker on a node and kept across restarts.
+
+    Uses WAL mode so readers in other processes are not blocked by writers.
+    Queries run in a worker thread to keep disk I/O off the event loop.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path, max_entries=50000):
+        self.path = path
+        self.max_entries = max_entries
+        self.evictions = 0
+        self._writes = 0
+        self._lock = threading.Lock()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=5, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "key TEXT PRIMARY KEY, payload BLOB NOT NULL, "
+            "expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed_at)")
+
+    def _get(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT payload, expires_at FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] <= now:
+                self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+                return None
+            self._conn.execute("UPDATE cache SET accessed_at = ? WHERE key = ?", (now, key))
+            return row[0]
+
+    def _set(self, key, payload, ttl):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, payload, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, payload, now + ttl, now),
+            )
+            self._writes += 1
+            # Trim periodically rather than on every write
+            if self._writes % 100 == 0:
+                self._trim(now)
+
+    def _trim(self, now):
+        self._conn.execute("DELETE FROM cache WHERE expires_at <= ?", (now,))
+        count = self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+        overflow = count - self.max_entries
+        if overflow > 0:
+            self._conn.execute(
+                "DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY accessed_at LIMIT ?)",
+                (overflow,),
+            )
+            self.evictions += overflow
+
+    def _delete(self, key):
+        with self._lock:
+            self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    async def get(self, key):
+        return await asyncio.to_thread(self._get, key)
+
+    async def set(self, key, payload, ttl):
+        await asyncio.to_thread(self._set, key, payload, ttl)
+
+    async def delete(self, key):
+        await asyncio.to_thread(self._delete, key)
+
+    async def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def stats(self):
+        """Counts the whole table under the connection lock; call it in a worker thread."""
+        with self._lock:
+            entries, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(payload)), 0) FROM cache"
+            ).fetchone()
+        return {
+            "backend": self.name,
+            "path": self.path,
+            "entries": entries,
+            "bytes": size,
+            "evictions": self.evictions,
+        }
+
+
+class RedisError(Exception):
+    pass
+
+
+class RedisBackend(CacheBackend):
+    """Minimal RESP2 client over asyncio streams for Redis-compatible servers.
+
+    Eviction is left to the server's maxmemory policy; entries expire via PX.
+    Only GET/SET/DEL (plus AUTH/SELECT on connect) are used, so any server that
+    speaks the Redis protocol works, including a local stand-in for testing.
+    """
+
+    name = "redis"
+
+    def __init__(self, url, prefix="veriguard:", pool_size=8, timeout=2.0):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.password = parsed.password
+        self.db = int(parsed.path.lstrip("/") or 0)
+        self.prefix = prefix
+        self.timeout = timeout
+        self.errors = 0
+        self._pool = asyncio.LifoQueue()
+        self._slots = asyncio.Semaphore(pool_size)
+
+    @staticmethod
+    def _encode(*args):
+        parts = [b"*%d\r\n" % len(args)]
+        for arg in args:
+            if isinstance(arg, str):
+                arg = arg.encode()
+            elif isinstance(arg, int):
+                arg = str(arg).encode()
+            parts.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+        return b"".join(parts)
+
+    @staticmethod
+    async def _read_reply(reader):
+        line = await reader.readline()
+        if not line:
+            # Not a RedisError: the connection is dead and must not go back to the pool
+            raise ConnectionResetError("Connection closed by server")
+        kind, rest = line[:1], line[1:-2]
+        if kind == b"+":
+            return rest.decode()
+        if kind == b"-":
+            raise RedisError(rest.decode())
+        if kind == b":":
+            return int(rest)
+        if kind == b"$":
+            length = int(rest)
+            if length == -1:
+                return None
+            data = await reader.readexactly(length + 2)
+            return data[:-2]
+        if kind == b"*":
+            count = int(rest)
+            if count == -1:
+                return None
+            return [await RedisBackend._read_reply(reader) for _ in range(count)]
+        raise RedisError(f"Unexpected reply: {line!r}")
+
+    async def _connect(self):
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        conn = (reader, writer)
+        if self.password:
+            await self._roundtrip(conn, "AUTH", self.password)
+        if self.db:
+            await self._roundtrip(conn, "SELECT", self.db)
+        return conn
+
+    async def _roundtrip(self, conn, *args):
+        reader, writer = conn
+        writer.write(self._encode(*args))
+        await writer.drain()
+        return await self._read_reply(reader)
+
+    async def execute(self, *args):
+        async with self._slots:
+            conn = self._pool.get_nowait() if not self._pool.empty() else None
+            try:
+                if conn is None:
+                    conn = await asyncio.wait_for(self._connect(), self.timeout)
+                reply = await asyncio.wait_for(self._roundtrip(conn, *args), self.timeout)
+            except RedisError:
+                # Protocol-level error replies leave the connection usable
+                if conn is not None:
+                    self._pool.put_nowait(conn)
+                raise
+            except BaseException:
+                if conn is not None:
+                    conn[1].close()
+                raise
+            self._pool.put_nowait(conn)
+            return reply
+
+    async def get(self, key):
+        try:
+            return await self.execute("GET", self.prefix + key)
+        except Exception as e:
+            self.errors += 1
+            logging.error(f"Redis cache get error: {str(e)}")
+            return None
+
+    async def set(self, key, payload, ttl):
+        try:
+            await self.execute("SET", self.prefix + key, payload, "PX", int(ttl * 1000))
+        except Exception as e:
+            self.errors += 1
+            logging.error(f"Redis cache set error: {str(e)}")
+
+    async def delete(self, key):
+        try:
+            await self.execute("DEL", self.prefix + key)
+        except Exception as e:
+            self.errors += 1
+            logging.error(f"Redis cache delete error: {str(e)}")
+
+    async def close(self):
+        while not self._pool.empty():
+            _, writer = self._pool.get_nowait()
+            writer.close()
+
+    def stats(self):
+        return {
+            "backend": self.name,
+            "host": f"{self.host}:{self.port}",
+            "idle_connections": self._pool.qsize(),
+            "errors": self.errors,
+        }
+
+
+def create_backend(kind=None, max_entries=None, max_bytes=None, sqlite_path=None):
+    """Build the cache backend selected by CACHE_BACKEND (memory, sqlite or redis).
+
+    max_entries, max_bytes and sqlite_path override the RESPONSE_CACHE_* and
+    CACHE_SQLITE_PATH settings, for caches that need a store of their own.
+    """
+    kind = (kind or os.getenv("CACHE_BACKEND", "memory")).lower()
+    if kind == "sqlite":
+        return SQLiteBackend(
+            sqlite_path or os.getenv("CACHE_SQLITE_PATH", "/tmp/veriguard-cache.sqlite3"),
+            max_entries=max_entries or int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "50000")),
+        )
+    if kind == "redis":
+        return RedisBackend(os.getenv("REDIS_URL", "redis://localhost:6379/0"))
+    if kind != "memory":
+        logging.error(f"Unknown CACHE_BACKEND '{kind}', falling back to memory")
+    return MemoryBackend(
+        max_entries=max_entries or int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1024")),
+        max_bytes=max_bytes or int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(16 * 1024 * 1024))),
+    )
+
+
+class ResponseCache:
+    """TTL cache for /process responses over a pluggable backend, with single-flight coalescing.
+
+    Entries are stored as serialized JSON so every read hands out a fresh copy
+    and backends can share them across processes.
+    """
+
+    def __init__(self, backend=None, ttl=3600, name="cache"):
+        self.backend = backend or MemoryBackend()
+        self.ttl = ttl
+        self.name = name
+        self._inflight = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    async def get(self, key):
+        """Return a copy of the cached value, or None if missing or expired."""
+        start = time.perf_counter()
+        payload = await self.backend.get(key)
+        elapsed = time.perf_counter() - start
+        if payload is None:
+            self.misses += 1
+            record_timing(f"cache-{self.name}", elapsed, "miss")
+            return None
+        self.hits += 1
+        record_timing(f"cache-{self.name}", elapsed, "hit")
+        return json.loads(payload)
+
+    async def peek(self, key):
+        """Like get, but without counting towards hit/miss stats or Server-Timing."""
+        payload = await self.backend.get(key)
+        return None if payload is None else json.loads(payload)
+
+    async def set(self, key, value, ttl=None):
+        """Store a JSON-serializable value."""
+        payload = json.dumps(value, separators=(",", ":")).encode()
+        await self.backend.set(key, payload, self.ttl if ttl is None else ttl)
+
+    async def delete(self, key):
+        await self.backend.delete(key)
+
+    async def get_or_compute(self, key, compute, cacheable=None):
+        """Return the cached value for key, running compute() at most once for concurrent misses.
+
+        A computed value is stored unless cacheable(value) is false; concurrent callers still share it.
+        """
+        cached = await self.get(key)
+        if cached is not None:
+            logging.info(f"Cache hit for key: {key}")
+            return cached
+
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._compute_and_store(key, compute, cacheable))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self.coalesced += 1
+            logging.info(f"Coalescing request onto in-flight computation for key: {key}")
+        value = await asyncio.shield(task)
+        return json.loads(json.dumps(value))
+
+    async def _compute_and_store(self, key, compute, cacheable):
+        value = await compute()
+        if cacheable is not None and not cacheable(value):
+            logging.info(f"Not caching value for key: {key}")
+            return value
+        await self.set(key, value)
+        logging.info(f"Cached response for key: {key}")
+        return value
+
+    def computing(self, key):
+        """Whether a get_or_compute for key is in flight (its value isn't stored yet)."""
+        return key in self._inflight
+
+    async def close(self):
+        await self.backend.close()
+
+    def save_snapshot(self, path):
+        """Write live entries to a JSON-lines file; only per-process backends need this.
+
+        Expiry is stored as wall-clock time, so downtime before the next load counts against it.
+        """
+        if not hasattr(self.backend, "snapshot"):
+            return 0
+        count = 0
+        now = time.time()
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for key, payload, ttl in self.backend.snapshot():
+                f.write(json.dumps({"key": key, "expires_at": now + ttl, "value": json.loads(payload)}) + "\n")
+                count += 1
+        os.replace(tmp_path, path)
+        return count
+
+    @staticmethod
+    def _read_snapshot(path):
+        """Entries of a snapshot file still live now, as (key, value, remaining ttl)."""
+        if not os.path.exists(path):
+            return []
+        now = time.time()
+        entries = []
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                entry = json.loads(line)
+                remaining = entry.get("expires_at", 0) - now
+                if remaining > 0:
+                    entries.append((entry["key"], entry["value"], remaining))
+        return entries
+
+    async def load_snapshot(self, path):
+        """Pre-warm the cache from a snapshot written by save_snapshot, reading it off the event loop."""
+        entries = await asyncio.to_thread(self._read_snapshot, path)
+        for key, value, ttl in entries:
+            await self.set(key, value, ttl=ttl)
+        return len(entries)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        stats = self.backend.stats()
+        stats.update({
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "coalesced": self.coalesced,
+            "inflight": len(self._inflight),
+        })
+        return stats
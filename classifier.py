@@ -0,0 +1,117 @@
+import json
+import os
+import re
+from functools import lru_cache
+
+DEFAULT_VOCABULARY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "vocabulary.json")
+
+
+class Classification:
+    """Result of classifying one query; computed once and shared by every stage."""
+
+    __slots__ = ("greeting", "medical_terms", "controversial", "terms")
+
+    def __init__(self, terms):
+        self.terms = terms
+        self.greeting = bool(terms.get("greeting"))
+        self.medical_terms = bool(terms.get("medical"))
+        self.controversial = bool(terms.get("controversial"))
+
+    @property
+    def medical(self):
+        # Greetings and questions about the service take precedence over symptoms
+        return self.medical_terms and not self.greeting
+
+    def to_dict(self):
+        return {
+            "medical": self.medical,
+            "greeting": self.greeting,
+            "controversial": self.controversial,
+            "terms": {category: list(matched) for category, matched in self.terms.items()},
+        }
+
+
+def _trie_pattern(terms):
+    """Compile terms into a regex shaped like a trie, so matching cost doesn't grow with vocabulary size."""
+    trie = {}
+    for term in terms:
+        node = trie
+        for char in term:
+            node = node.setdefault(char, {})
+        node[""] = True
+
+    def build(node):
+        is_end = "" in node
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        pattern = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if is_end:
+            # Optional tail is greedy, so the longest term wins
+            return "(?:" + pattern + ")?"
+        return pattern
+
+    return build(trie)
+
+
+class KeywordClassifier:
+    """Single-pass matcher over every vocabulary category.
+
+    Terms match at a word start. Categories (or individual terms) with match
+    "prefix" also accept inflections (pain -> painful); "word" requires a full
+    word, so "hi" no longer matches inside "this".
+    """
+
+    def __init__(self, categories, version=None):
+        self.version = version
+        self.categories = sorted(categories)
+        # term -> [(category, requires whole word)]
+        self._modes = {}
+        for category, spec in categories.items():
+            default_mode = spec.get("match", "word")
+            for entry in spec["terms"]:
+                if isinstance(entry, dict):
+                    term, mode = entry["term"], entry.get("match", default_mode)
+                else:
+                    term, mode = entry, default_mode
+                term = " ".join(term.lower().split())
+                self._modes.setdefault(term, []).append((category, mode == "word"))
+        self._pattern = re.compile(r"(?<!\w)(" + _trie_pattern(self._modes) + r")(\w*)")
+        self.classify = lru_cache(maxsize=int(os.getenv("CLASSIFIER_CACHE_SIZE", "4096")))(self._classify)
+
+    @classmethod
+    def from_file(cls, path=None):
+        path = path or os.getenv("VOCABULARY_PATH", DEFAULT_VOCABULARY_PATH)
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data["categories"], version=data.get("version"))
+
+    def _classify(self, text):
+        text = " ".join(text.lower().split())
+        found = {category: [] for category in self.categories}
+        for match in self._pattern.finditer(text):
+            term, suffix = match.group(1), match.group(2)
+            for category, whole_word in self._modes[term]:
+                if whole_word and suffix:
+                    continue
+                if term not in found[category]:
+                    found[category].append(term)
+        return Classification({category: tuple(matched) for category, matched in found.items()})
+
+    def __len__(self):
+        return len(self._modes)
+
+
+_default_classifier = None
+
+
+def get_classifier():
+    """Load the default vocabulary once per process."""
+    global _default_classifier
+    if _default_classifier is None:
+        _default_classifier = KeywordClassifier.from_file()
+    return _default_classifier
+
+
+def classify(text):
+    return get_classifier().classify(text)
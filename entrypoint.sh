@@ -3,5 +3,9 @@
 # Check if PORT is set, default to 8000 if not
 PORT=${PORT:-8000}
 
+# Number of uvicorn worker processes; use CACHE_BACKEND=sqlite or redis
+# so workers share cached responses
+WEB_CONCURRENCY=${WEB_CONCURRENCY:-1}
+
 # Run uvicorn with the port
-exec uvicorn main:app --host 0.0.0.0 --port $PORT
\ No newline at end of file
+exec uvicorn main:app --host 0.0.0.0 --port $PORT --workers $WEB_CONCURRENCY
\ No newline at end of file
@@ -0,0 +1,215 @@
+import asyncio
+import logging
+import time
+from collections import Counter
+from contextlib import asynccontextmanager
+
+from metrics import registry, time_upstream
+
+EUTILS_BASE_URL = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils"
+
+
+class MicroBatcher:
+    """Merge concurrent single-key lookups into one multi-key call.
+
+    The first caller opens a batch; keys requested within window seconds (or
+    until max_batch keys are pending) are fetched together by fetch_many,
+    which returns a dict of the keys it found. Keys already pending share the
+    same future, so duplicates cost nothing.
+    """
+
+    def __init__(self, fetch_many, window=0.02, max_batch=200):
+        self.fetch_many = fetch_many
+        self.window = window
+        self.max_batch = max_batch
+        self._pending = {}
+        self._flush_handle = None
+        self.batches = 0
+        self.keys_fetched = 0
+
+    async def get_many(self, keys):
+        """Return {key: value} for the keys fetch_many found."""
+        loop = asyncio.get_running_loop()
+        futures = {}
+        for key in keys:
+            future = self._pending.get(key)
+            if future is None:
+                future = self._pending[key] = loop.create_future()
+            futures[key] = future
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.window, self._flush)
+        results = {}
+        for key, future in futures.items():
+            # Shielded so one cancelled caller doesn't fail the batch for everyone else
+            value = await asyncio.shield(future)
+            if value is not None:
+                results[key] = value
+        return results
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self._pending = self._pending, {}
+        if batch:
+            asyncio.ensure_future(self._run(batch))
+
+    async def _run(self, batch):
+        self.batches += 1
+        self.keys_fetched += len(batch)
+        registry.observe("veriguard_batch_size", len(batch), batch="pubmed_esummary")
+        try:
+            found = await self.fetch_many(list(batch))
+        except Exception as e:
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for key, future in batch.items():
+            if not future.done():
+                future.set_result(found.get(key))
+
+
+class PubMedEvidence:
+    """Symptom -> PMIDs -> article summaries, cached and fetched within NCBI's rate limit.
+
+    esearch results are cached per symptom and summaries per PMID, both with
+    long TTLs since the symptom space is small and repetitive. Every E-utilities
+    call takes a token from one shared bucket; concurrent esummary lookups are
+    merged into a single multi-ID call. A search hit older than refresh_after
+    seconds whose symptom has been asked for at least popular_after times is
+    refreshed in the background, so popular entries rarely expire under load.
+    """
+
+    def __init__(self, session_factory, cache, limiter, api_key=None, base_url=EUTILS_BASE_URL,
+                 timeout=None, retmax=2, search_ttl=7 * 86400, summary_ttl=30 * 86400,
+                 refresh_after=86400, popular_after=3, batch_window=0.02, max_batch=200, policy=None):
+        self.session_factory = session_factory
+        self.policy = policy
+        self.cache = cache
+        self.limiter = limiter
+        self.api_key = api_key
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.retmax = retmax
+        self.search_ttl = search_ttl
+        self.summary_ttl = summary_ttl
+        self.refresh_after = refresh_after
+        self.popular_after = popular_after
+        self.popularity = Counter()
+        self.max_tracked = 10000
+        self._refreshing = set()
+        self.refreshes = 0
+        self.throttled = 0
+        self.summaries = MicroBatcher(self._fetch_summaries, window=batch_window, max_batch=max_batch)
+
+    async def _get(self, endpoint, params):
+        """One rate-limited E-utilities GET, run under the resilience policy when one is set."""
+        params = {**params, "retmode": "json"}
+        if self.api_key:
+            params["api_key"] = self.api_key
+        if self.policy is None:
+            await self.limiter.acquire()
+            return await self._get_once(endpoint, params)
+        # Every attempt (retries and hedges too) waits for a token, outside the policy's timeout
+        return await self.policy.call(lambda: self._get_once(endpoint, params), slot=self._token)
+
+    @asynccontextmanager
+    async def _token(self):
+        await self.limiter.acquire()
+        yield
+
+    async def _get_once(self, endpoint, params):
+        with time_upstream(f"pubmed-{endpoint}"):
+            async with self.session_factory().get(
+                f"{self.base_url}/{endpoint}.fcgi", params=params, timeout=self.timeout
+            ) as response:
+                logging.info(f"PubMed {endpoint} status: {response.status}")
+                if response.status == 429:
+                    self.throttled += 1
+                    retry_after = float(response.headers.get("Retry-After", "1"))
+                    logging.warning(f"PubMed throttled {endpoint}, backing off {retry_after}s")
+                    self.limiter.penalize(retry_after)
+                response.raise_for_status()
+                return await response.json(content_type=None)
+
+    async def _esearch(self, symptom):
+        data = await self._get("esearch", {"db": "pubmed", "term": symptom + " treatment", "retmax": self.retmax})
+        return {"ids": data.get("esearchresult", {}).get("idlist", []), "fetched_at": time.time()}
+
+    async def _fetch_summaries(self, ids):
+        data = await self._get("esummary", {"db": "pubmed", "id": ",".join(ids)})
+        result = data.get("result", {})
+        found = {}
+        for uid in result.get("uids", []):
+            article = result[uid]
+            found[uid] = {
+                "title": article.get("title", "No title available"),
+                "authors": ", ".join([a["name"] for a in article.get("authors", [])]) or "No authors listed",
+                "pubdate": article.get("pubdate", "No date available"),
+                "url": f"https://pubmed.ncbi.nlm.nih.gov/{uid}/"
+            }
+        await asyncio.gather(*(self.cache.set(f"pubmed:summary:{uid}", summary, ttl=self.summary_ttl)
+                               for uid, summary in found.items()))
+        return found
+
+    async def _refresh(self, symptom, key):
+        try:
+            await self.cache.set(key, await self._esearch(symptom), ttl=self.search_ttl)
+            self.refreshes += 1
+            logging.info(f"Refreshed PubMed evidence for: {symptom}")
+        except Exception as e:
+            logging.warning(f"PubMed refresh failed for {symptom}: {str(e)}")
+        finally:
+            self._refreshing.discard(key)
+
+    async def _ids_for(self, symptom):
+        key = f"pubmed:search:{symptom}"
+        self.popularity[symptom] += 1
+        if len(self.popularity) > self.max_tracked:
+            # Keep the most requested half so the counter stays bounded
+            self.popularity = Counter(dict(self.popularity.most_common(self.max_tracked // 2)))
+
+        async def compute():
+            return await self._esearch(symptom)
+
+        entry = await self.cache.get_or_compute(key, compute)
+        age = time.time() - entry.get("fetched_at", 0)
+        if age > self.refresh_after and self.popularity[symptom] >= self.popular_after and key not in self._refreshing:
+            self._refreshing.add(key)
+            asyncio.ensure_future(self._refresh(symptom, key))
+        return entry["ids"]
+
+    async def search(self, symptom):
+        """Return up to retmax article summaries for a symptom, most relevant first."""
+        symptom = " ".join(symptom.lower().split())
+        ids = await self._ids_for(symptom)
+        if not ids:
+            return []
+        cached = await asyncio.gather(*(self.cache.get(f"pubmed:summary:{uid}") for uid in ids))
+        summaries = {uid: summary for uid, summary in zip(ids, cached) if summary is not None}
+        missing = [uid for uid in ids if uid not in summaries]
+        if missing:
+            summaries.update(await self.summaries.get_many(missing))
+        return [summaries[uid] for uid in ids if uid in summaries]
+
+    async def cached(self, symptom):
+        """Article summaries for a symptom from the cache alone; never calls NCBI."""
+        symptom = " ".join(symptom.lower().split())
+        entry = await self.cache.peek(f"pubmed:search:{symptom}")
+        if not entry:
+            return []
+        cached = await asyncio.gather(*(self.cache.peek(f"pubmed:summary:{uid}") for uid in entry["ids"]))
+        return [summary for summary in cached if summary is not None]
+
+    def stats(self):
+        return {
+            "limiter": self.limiter.stats(),
+            "esummary_batches": self.summaries.batches,
+            "esummary_ids": self.summaries.keys_fetched,
+            "refreshes": self.refreshes,
+            "throttled": self.throttled,
+            "popular": self.popularity.most_common(10),
+        }
@@ -0,0 +1,102 @@
+import os
+from difflib import SequenceMatcher
+
+import numpy as np
+
+DEFAULT_SYMPTOMS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "symptoms.txt")
+
+
+def trigrams(text):
+    """Character trigrams of a padded string, in the style of pg_trgm."""
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TrigramIndex:
+    """Approximate string matcher over a large vocabulary.
+
+    Terms are ordered by length, so the length bound implied by a difflib
+    ratio threshold (ratio <= 2 * min(len) / sum(len)) becomes a contiguous
+    id window. An inverted index from trigram to sorted term ids is sliced to
+    that window, and the terms sharing the most trigrams with the query (Dice
+    coefficient, computed for the whole window at once with NumPy) are
+    re-ranked with SequenceMatcher. Thresholds keep their difflib meaning
+    while lookup cost stays flat as the vocabulary grows.
+    """
+
+    def __init__(self, terms, candidates=8):
+        unique = {" ".join(term.lower().split()) for term in terms if term.strip()}
+        self.terms = sorted(unique, key=lambda term: (len(term), term))
+        self._exact = set(self.terms)
+        self._lengths = np.array([len(term) for term in self.terms], dtype=np.int32)
+        self.candidates = candidates
+        postings = {}
+        gram_counts = np.empty(len(self.terms), dtype=np.float32)
+        for term_id, term in enumerate(self.terms):
+            grams = trigrams(term)
+            gram_counts[term_id] = len(grams)
+            for gram in grams:
+                postings.setdefault(gram, []).append(term_id)
+        # Ids are appended in ascending order, so every posting list is sorted
+        self._postings = {gram: np.array(ids, dtype=np.int32) for gram, ids in postings.items()}
+        self._gram_counts = gram_counts
+
+    @classmethod
+    def from_file(cls, path=None, **kwargs):
+        path = path or os.getenv("SYMPTOM_VOCABULARY_PATH", DEFAULT_SYMPTOMS_PATH)
+        with open(path, encoding="utf-8") as f:
+            terms = [line.strip() for line in f if line.strip() and not line.startswith("#")]
+        return cls(terms, **kwargs)
+
+    def __len__(self):
+        return len(self.terms)
+
+    def length_window(self, length, threshold):
+        """Id range of terms long enough and short enough to pass a difflib ratio threshold."""
+        if threshold <= 0:
+            return 0, len(self.terms)
+        low = length * threshold / (2 - threshold)
+        high = length * (2 - threshold) / threshold
+        return (int(np.searchsorted(self._lengths, low, side="left")),
+                int(np.searchsorted(self._lengths, high, side="right")))
+
+    def candidate_ids(self, query, threshold=0.0):
+        """Ids of the terms in the length window with the highest trigram Dice similarity to query."""
+        lo, hi = self.length_window(len(query), threshold)
+        if lo >= hi:
+            return np.empty(0, dtype=np.int32)
+        grams = trigrams(query)
+        hits = []
+        for gram in grams:
+            ids = self._postings.get(gram)
+            if ids is None:
+                continue
+            start, end = np.searchsorted(ids, (lo, hi))
+            if start < end:
+                hits.append(ids[start:end])
+        if not hits:
+            return np.empty(0, dtype=np.int32)
+        shared = np.bincount(np.concatenate(hits) - lo, minlength=hi - lo)
+        # Only terms sharing at least one trigram can rank; skip the rest
+        ids = np.flatnonzero(shared)
+        dice = 2.0 * shared[ids] / (len(grams) + self._gram_counts[ids + lo])
+        if len(ids) > self.candidates:
+            top = np.argpartition(dice, -self.candidates)[-self.candidates:]
+        else:
+            top = np.arange(len(ids))
+        return ids[top[np.argsort(-dice[top])]] + lo
+
+    def best_match(self, query, threshold=0.8):
+        """Return (term, ratio) for the most similar term above threshold, or (None, best ratio)."""
+        query = " ".join(query.lower().split())
+        if query in self._exact:
+            return query, 1.0
+        best_term, best_ratio = None, 0.0
+        for term_id in self.candidate_ids(query, threshold):
+            term = self.terms[term_id]
+            ratio = SequenceMatcher(None, query, term).ratio()
+            if ratio > best_ratio:
+                best_term, best_ratio = term, ratio
+        if best_ratio > threshold:
+            return best_term, best_ratio
+        return None, best_ratio
@@ -0,0 +1,187 @@
+"""Precomputed guidance for the most common symptoms, served without any upstream call.
+
+data/guidance.json holds one entry per curated symptom: title, summary and
+PubMed sources as the full pipeline produced them. Entries are generated
+unreviewed; only entries a clinician has approved are served.
+
+Usage:
+    python guidance.py build [--symptoms headache fever ...] [--force]
+    python guidance.py refresh               # re-fetch PubMed sources, keep reviewed text
+    python guidance.py approve headache fever --by "reviewer name"
+    python guidance.py list
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import time
+
+DEFAULT_GUIDANCE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "guidance.json")
+FORMAT_VERSION = 1
+
+CURATED_SYMPTOMS = ["headache", "fever", "cough", "nausea", "diarrhea", "vomiting", "sore throat", "back pain",
+                    "fatigue", "dizziness", "constipation", "migraine", "runny nose", "stomachache", "muscle pain"]
+
+# Words a plain "I have a headache" style message may contain besides the symptom.
+# Anything else (durations, severity, other symptoms, causes) goes through the full pipeline.
+FILLER_WORDS = {
+    "i", "im", "ive", "me", "my", "have", "has", "had", "having", "got", "get", "a", "an", "the", "some",
+    "what", "how", "do", "should", "can", "to", "for", "with", "of", "about", "is", "it", "there",
+    "help", "treat", "treatment", "treating", "remedy", "remedies", "relief", "manage", "advice",
+    "please", "bad", "mild", "slight", "little", "bit", "again", "today", "now", "feel", "feeling",
+}
+
+_NON_WORD = re.compile(r"[^\w\s]")
+
+
+def normalize(text):
+    return " ".join(_NON_WORD.sub("", text.lower()).split())
+
+
+class GuidanceTable:
+    """Reviewed guidance entries keyed by symptom, loaded once per process.
+
+    match() only answers messages that consist of one curated symptom (or an
+    alias, singular or plural) and filler words, so anything more specific
+    than the generic answer is left to the full pipeline.
+    """
+
+    def __init__(self, entries=None, revision=0, serve_unreviewed=False):
+        self.revision = revision
+        self.entries = {symptom: entry for symptom, entry in (entries or {}).items()
+                        if entry.get("reviewed") or serve_unreviewed}
+        self._phrases = {}
+        for symptom, entry in self.entries.items():
+            for phrase in [symptom, *entry.get("aliases", [])]:
+                phrase = normalize(phrase)
+                self._phrases[phrase] = symptom
+                self._phrases[phrase + "s"] = symptom
+        # Longest first, so "back pain" is found before "pain"
+        self._ordered = sorted(self._phrases, key=len, reverse=True)
+        self.hits = 0
+
+    @classmethod
+    def load(cls, path=DEFAULT_GUIDANCE_PATH, serve_unreviewed=False):
+        """Load a table written by this module's build command; an empty table if there is none."""
+        if not os.path.exists(path):
+            return cls()
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported guidance format {data.get('version')} in {path}")
+        return cls(data["entries"], data.get("revision", 0), serve_unreviewed)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def match(self, text):
+        """Return (symptom, entry) when text is a plain mention of one curated symptom, else None."""
+        if not self.entries:
+            return None
+        remaining = f" {normalize(text)} "
+        found = set()
+        for phrase in self._ordered:
+            if f" {phrase} " in remaining:
+                found.add(self._phrases[phrase])
+                remaining = remaining.replace(f" {phrase} ", " ")
+        if len(found) != 1 or not set(remaining.split()) <= FILLER_WORDS:
+            return None
+        symptom = found.pop()
+        self.hits += 1
+        return symptom, self.entries[symptom]
+
+    def stats(self):
+        return {"revision": self.revision, "entries": len(self.entries), "hits": self.hits}
+
+
+def read_file(path):
+    if not os.path.exists(path):
+        return {"version": FORMAT_VERSION, "revision": 0, "entries": {}}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def write_file(path, data):
+    data["revision"] = data.get("revision", 0) + 1
+    data["updated_at"] = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+async def generate(symptoms):
+    """Run the live pipeline (needs the usual API keys) for each symptom."""
+    import main
+
+    async with main.lifespan(main.app):
+        results = {}
+        for symptom in symptoms:
+            response = await main.analyze_text(f"I have {symptom}", False)
+            if response.get("degraded") or not response["summary"]:
+                print(f"{symptom}: no summary generated, skipped")
+                continue
+            results[symptom] = response
+            print(f"{symptom}: {response['chat_title']}")
+        return results
+
+
+async def refresh_sources(symptoms):
+    import main
+
+    async with main.lifespan(main.app):
+        return {symptom: await main.search_pubmed(symptom) for symptom in symptoms}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--path", default=os.getenv("GUIDANCE_PATH", DEFAULT_GUIDANCE_PATH))
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="generate missing entries (unreviewed)")
+    build.add_argument("--symptoms", nargs="+", default=CURATED_SYMPTOMS)
+    build.add_argument("--force", action="store_true", help="regenerate existing entries too")
+    commands.add_parser("refresh", help="re-fetch PubMed sources for every entry")
+    approve = commands.add_parser("approve", help="mark entries as reviewed")
+    approve.add_argument("symptoms", nargs="+")
+    approve.add_argument("--by", required=True)
+    commands.add_parser("list")
+    args = parser.parse_args()
+
+    data = read_file(args.path)
+    entries = data["entries"]
+    if args.command == "build":
+        todo = [symptom for symptom in args.symptoms if args.force or symptom not in entries]
+        for symptom, response in asyncio.run(generate(todo)).items():
+            # New text needs a new review
+            entries[symptom] = {
+                "title": response["chat_title"],
+                "summary": response["summary"],
+                "pubmed": response["sources"]["pubmed"],
+                "aliases": entries.get(symptom, {}).get("aliases", []),
+                "generated_at": time.strftime("%Y-%m-%d", time.gmtime()),
+                "reviewed": False,
+            }
+    elif args.command == "refresh":
+        for symptom, pubmed in asyncio.run(refresh_sources(list(entries))).items():
+            if pubmed:
+                entries[symptom]["pubmed"] = pubmed
+                entries[symptom]["sources_refreshed_at"] = time.strftime("%Y-%m-%d", time.gmtime())
+    elif args.command == "approve":
+        for symptom in args.symptoms:
+            if symptom not in entries:
+                parser.error(f"no entry for {symptom}")
+            entries[symptom].update(reviewed=True, reviewed_by=args.by,
+                                    reviewed_at=time.strftime("%Y-%m-%d", time.gmtime()))
+    else:
+        print(f"revision {data.get('revision', 0)}, updated {data.get('updated_at', 'never')}")
+        for symptom, entry in sorted(entries.items()):
+            status = f"reviewed by {entry['reviewed_by']}" if entry.get("reviewed") else "UNREVIEWED"
+            print(f"{symptom:<16} {entry['title']:<24} {status}")
+        return
+    write_file(args.path, data)
+    print(f"Wrote revision {data['revision']} with {len(entries)} entries to {args.path}")
+
+
+if __name__ == "__main__":
+    main()
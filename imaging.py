@@ -0,0 +1,86 @@
+import hashlib
+import io
+
+
+class ImageTooLarge(ValueError):
+    pass
+
+
+class PreparedImage:
+    """An image normalized for OCR, plus the pixel hash used to dedupe it."""
+
+    def __init__(self, data, mime_type, pixel_hash, size):
+        self.data = data
+        self.mime_type = mime_type
+        self.pixel_hash = pixel_hash
+        self.size = size
+
+
+def content_hash(data):
+    """Exact hash of the raw upload, checked before any decoding."""
+    return hashlib.sha256(data).hexdigest()
+
+
+async def download_image(session, url, max_bytes, timeout=None):
+    """Stream an image body, aborting as soon as it exceeds max_bytes.
+
+    Returns (status, data); data is None for non-200 responses.
+    """
+    async with session.get(url, timeout=timeout) as response:
+        if response.status != 200:
+            return response.status, None
+        if response.content_length is not None and response.content_length > max_bytes:
+            raise ImageTooLarge(f"Image is {response.content_length} bytes, limit is {max_bytes}")
+        buffer = bytearray()
+        async for chunk in response.content.iter_chunked(64 * 1024):
+            buffer.extend(chunk)
+            if len(buffer) > max_bytes:
+                raise ImageTooLarge(f"Image exceeds {max_bytes} bytes")
+        return response.status, bytes(buffer)
+
+
+async def read_upload(upload, max_bytes):
+    """Read an UploadFile in chunks, aborting as soon as it exceeds max_bytes."""
+    buffer = bytearray()
+    while chunk := await upload.read(64 * 1024):
+        buffer.extend(chunk)
+        if len(buffer) > max_bytes:
+            raise ImageTooLarge(f"Upload exceeds {max_bytes} bytes")
+    return bytes(buffer)
+
+
+def pixel_hash(image):
+    """Hash of decoded, normalized pixels.
+
+    Matches copies of an image that differ only in container, metadata or
+    EXIF rotation. Resized or lossily re-encoded copies decode to different pixels
+    and miss. Deliberately exact: perceptual hashes conflate screenshots that
+    share a layout but not their wording.
+    """
+    digest = hashlib.sha256(f"{image.size[0]}x{image.size[1]}:".encode())
+    digest.update(image.tobytes())
+    return digest.hexdigest()
+
+
+def load_pillow():
+    """Import Pillow ahead of the first decode (run in each image worker by the warm-up task)."""
+    from PIL import Image, ImageOps  # noqa: F401
+
+
+def prepare_image(data, max_side=1600, quality=80):
+    """Decode, apply EXIF orientation, downscale, grayscale and recompress an image for OCR.
+
+    CPU-bound; main.py runs it in a worker process.
+    """
+    # Pillow is imported on first use (or by the warm-up task) to keep startup fast
+    from PIL import Image, ImageOps
+
+    with Image.open(io.BytesIO(data)) as original:
+        # Let the JPEG decoder scale down while decoding instead of materializing every pixel
+        original.draft("L", (max_side, max_side))
+        image = ImageOps.exif_transpose(original)
+        image = image.convert("L")
+    image.thumbnail((max_side, max_side), Image.LANCZOS)
+    output = io.BytesIO()
+    image.save(output, format="JPEG", quality=quality, optimize=True)
+    return PreparedImage(output.getvalue(), "image/jpeg", pixel_hash(image), image.size)
@@ -0,0 +1,182 @@
+import asyncio
+import base64
+import json
+import logging
+
+from metrics import time_upstream
+
+
+class LLMError(Exception):
+    pass
+
+
+class LLMProvider:
+    """Async LLM client over the shared aiohttp session.
+
+    Each provider owns a semaphore so a slow upstream can only tie up its own
+    slots instead of starving the event loop or the default executor. An
+    optional resilience.UpstreamPolicy adds a circuit breaker, adaptive
+    timeouts, budgeted retries and hedging around each call.
+    """
+
+    name = "base"
+
+    def __init__(self, session_factory, api_key, base_url, max_concurrency=16, timeout=None, policy=None):
+        self.session_factory = session_factory
+        self.policy = policy
+        self.api_key = api_key
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.in_flight = 0
+
+    @property
+    def available(self):
+        return bool(self.api_key)
+
+    async def _post_json(self, url, payload, headers=None, params=None, policy=None, hedge=False):
+        if not self.available:
+            raise LLMError(f"{self.name} API key not set")
+        policy = policy or self.policy
+        if policy is None:
+            async with self._semaphore:
+                return await self._post_json_once(url, payload, headers, params)
+        # The semaphore wait sits outside the policy's timeout: queueing here isn't upstream latency
+        return await policy.call(lambda: self._post_json_once(url, payload, headers, params), hedge=hedge,
+                                 slot=lambda: self._semaphore)
+
+    async def _post_json_once(self, url, payload, headers, params):
+        self.in_flight += 1
+        try:
+            with time_upstream(self.name):
+                async with self.session_factory().post(
+                    url, json=payload, headers=headers, params=params, timeout=self.timeout
+                ) as response:
+                    logging.info(f"{self.name} status: {response.status}")
+                    response.raise_for_status()
+                    return await response.json()
+        finally:
+            self.in_flight -= 1
+
+    def stats(self):
+        return {
+            "provider": self.name,
+            "in_flight": self.in_flight,
+            "max_concurrency": self.max_concurrency,
+        }
+
+
+class GeminiClient(LLMProvider):
+    """Gemini generateContent over REST, reusing pooled connections."""
+
+    name = "gemini"
+
+    def __init__(self, session_factory, api_key, model="gemini-1.5-flash",
+                 base_url="https://generativelanguage.googleapis.com/v1beta", image_policy=None, **kwargs):
+        super().__init__(session_factory, api_key, base_url, **kwargs)
+        # Image prompts (OCR) are much slower than text ones, so they get their own latency window
+        self.image_policy = image_policy
+        self.model = model
+        self.url = f"{self.base_url}/models/{model}:generateContent"
+
+    async def generate(self, prompt, image=None, mime_type="image/jpeg", max_tokens=None, temperature=None):
+        """Return the text of the first candidate for a prompt and optional image bytes."""
+        parts = [{"text": prompt}]
+        if image is not None:
+            parts.append({"inline_data": {"mime_type": mime_type, "data": base64.b64encode(image).decode()}})
+        payload = {"contents": [{"parts": parts}]}
+        config = {}
+        if max_tokens is not None:
+            config["maxOutputTokens"] = max_tokens
+        if temperature is not None:
+            config["temperature"] = temperature
+        if config:
+            payload["generationConfig"] = config
+        policy = self.image_policy if image is not None else None
+        # In a header, not ?key=: aiohttp puts the request URL into error messages, and those get logged
+        data = await self._post_json(self.url, payload, headers={"x-goog-api-key": self.api_key}, policy=policy)
+        try:
+            candidate_parts = data["candidates"][0]["content"]["parts"]
+        except (KeyError, IndexError):
+            raise LLMError(f"Gemini returned no candidates: {data.get('promptFeedback', data)}")
+        return "".join(part.get("text", "") for part in candidate_parts).strip()
+
+
+class OpenRouterClient(LLMProvider):
+    """OpenRouter chat completions (OpenAI-compatible) over the shared session."""
+
+    name = "openrouter"
+
+    def __init__(self, session_factory, api_key, model="deepseek/deepseek-chat",
+                 base_url="https://openrouter.ai/api/v1", referer="https://veriguard.onrender.com",
+                 title="VeriGuard", **kwargs):
+        super().__init__(session_factory, api_key, base_url, **kwargs)
+        self.model = model
+        self.url = f"{self.base_url}/chat/completions"
+        self.headers = {
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json",
+            "HTTP-Referer": referer,
+            "X-Title": title,
+        }
+
+    def _payload(self, prompt, max_tokens, temperature):
+        return {
+            "model": self.model,
+            "messages": [{"role": "user", "content": prompt}],
+            "max_tokens": max_tokens,
+            "temperature": temperature,
+        }
+
+    async def stream_chat(self, prompt, max_tokens=150, temperature=0.1):
+        """Yield completion text chunks as they arrive using server-sent events."""
+        if not self.available:
+            raise LLMError(f"{self.name} API key not set")
+        # Take the slot first so the policy's first-chunk timeout only covers the upstream
+        async with self._semaphore:
+            if self.policy is None:
+                chunks = self._stream_chat(prompt, max_tokens, temperature)
+            else:
+                chunks = self.policy.stream(lambda: self._stream_chat(prompt, max_tokens, temperature))
+            async for chunk in chunks:
+                yield chunk
+
+    async def _stream_chat(self, prompt, max_tokens, temperature):
+        payload = self._payload(prompt, max_tokens, temperature)
+        payload["stream"] = True
+        self.in_flight += 1
+        try:
+            # Covers the whole stream, including time the consumer spends between chunks
+            with time_upstream(f"{self.name}-stream"):
+                async with self.session_factory().post(
+                    self.url, json=payload, headers=self.headers, timeout=self.timeout
+                ) as response:
+                    logging.info(f"{self.name} stream status: {response.status}")
+                    response.raise_for_status()
+                    async for raw_line in response.content:
+                        line = raw_line.decode("utf-8").strip()
+                        # Skip blank separators and keep-alive comments
+                        if not line.startswith("data:"):
+                            continue
+                        data = line[len("data:"):].strip()
+                        if data == "[DONE]":
+                            break
+                        chunk = json.loads(data)
+                        if "error" in chunk:
+                            raise LLMError(f"OpenRouter stream error: {chunk['error']}")
+                        for choice in chunk.get("choices", []):
+                            content = choice.get("delta", {}).get("content")
+                            if content:
+                                yield content
+        finally:
+            self.in_flight -= 1
+
+    async def chat(self, prompt, max_tokens=150, temperature=0.1, hedge=False):
+        """Return the completion text for a single user prompt; hedge races a duplicate request if slow."""
+        data = await self._post_json(self.url, self._payload(prompt, max_tokens, temperature), headers=self.headers, hedge=hedge)
+        try:
+            return data["choices"][0]["message"]["content"].strip()
+        except (KeyError, IndexError, AttributeError):
+            raise LLMError(f"OpenRouter returned no choices: {data.get('error', data)}")
+
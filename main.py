@@ -1,23 +1,113 @@
 import os
 import asyncio
 import aiohttp
-from fastapi import FastAPI, UploadFile, Form, HTTPException
+from fastapi import FastAPI, UploadFile, Form, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from PIL import Image
-import io
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
 from dotenv import load_dotenv
-import google.generativeai as genai
 import time
+import threading
+import json
 import logging
 import re
-from difflib import SequenceMatcher
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from functools import lru_cache
 import hashlib
 import uuid
+from collections import Counter, OrderedDict
+from contextlib import asynccontextmanager
+from pydantic import BaseModel
+from cache import ResponseCache, create_backend
+from llm import GeminiClient, LLMError, OpenRouterClient
+from imaging import ImageTooLarge, content_hash, download_image, load_pillow, prepare_image, read_upload
+from pipeline import Stage, run_pipeline
+from classifier import classify, get_classifier
+from evidence import EUTILS_BASE_URL, PubMedEvidence
+from ratelimit import TokenBucket
+from resilience import CircuitBreaker, UpstreamPolicy
+from sessions import SessionStore
+from admission import AdmissionController
+from guidance import DEFAULT_GUIDANCE_PATH, FILLER_WORDS, GuidanceTable
+from ocr_jobs import JobQueue, QueueFull
+from metrics import MetricsMiddleware, observe_stage, record_timing, registry, time_upstream, watch_event_loop_lag
+from profiler import sample_thread
 
 load_dotenv()
 
-app = FastAPI()
+# Outbound HTTP pool settings
+HTTP_POOL_LIMIT = int(os.getenv("HTTP_POOL_LIMIT", "100"))
+HTTP_POOL_LIMIT_PER_HOST = int(os.getenv("HTTP_POOL_LIMIT_PER_HOST", "20"))
+HTTP_KEEPALIVE_TIMEOUT = float(os.getenv("HTTP_KEEPALIVE_TIMEOUT", "60"))
+HTTP_DNS_CACHE_TTL = int(os.getenv("HTTP_DNS_CACHE_TTL", "300"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+SOURCE_TIMEOUT = aiohttp.ClientTimeout(total=float(os.getenv("SOURCE_TIMEOUT", "10")), connect=HTTP_CONNECT_TIMEOUT)
+LLM_TIMEOUT = aiohttp.ClientTimeout(total=float(os.getenv("LLM_TIMEOUT", "15")), connect=HTTP_CONNECT_TIMEOUT)
+
+# App-lifetime HTTP session shared by every outbound call
+http_session = None
+
+def create_http_session():
+    """Create a keep-alive session with per-host connection limits and a DNS cache."""
+    connector = aiohttp.TCPConnector(
+        limit=HTTP_POOL_LIMIT,
+        limit_per_host=HTTP_POOL_LIMIT_PER_HOST,
+        ttl_dns_cache=HTTP_DNS_CACHE_TTL,
+        keepalive_timeout=HTTP_KEEPALIVE_TIMEOUT,
+    )
+    return aiohttp.ClientSession(connector=connector, timeout=SOURCE_TIMEOUT)
+
+def get_http_session():
+    """Return the shared session, creating it if the lifespan hook hasn't run yet."""
+    global http_session
+    if http_session is None or http_session.closed:
+        http_session = create_http_session()
+    return http_session
+
+# Startup: WARMUP_MODE is "background" (serve liveness at once, report ready when warm),
+# "blocking" (finish warm-up before accepting requests) or "off"
+WARMUP_MODE = os.getenv("WARMUP_MODE", "background").lower()
+PREWARM_CONNECTIONS = os.getenv("PREWARM_CONNECTIONS", "false").lower() in ("1", "true", "yes")
+CACHE_SNAPSHOT_PATH = os.getenv("CACHE_SNAPSHOT_PATH")
+warmup_state = {"ready": False, "started_at": time.monotonic(), "ready_after": None, "steps": {}, "errors": {}}
+warmup_task = None
+EVENT_LOOP_LAG_INTERVAL = float(os.getenv("EVENT_LOOP_LAG_INTERVAL", "0.1"))
+
+@asynccontextmanager
+async def lifespan(app):
+    global warmup_task
+    get_http_session()
+    logging.info("Shared HTTP session created")
+    lag_task = asyncio.create_task(watch_event_loop_lag(EVENT_LOOP_LAG_INTERVAL))
+    if WARMUP_MODE == "blocking":
+        await warm_up()
+    elif WARMUP_MODE == "off":
+        mark_ready()
+    else:
+        warmup_task = asyncio.create_task(warm_up())
+    yield
+    lag_task.cancel()
+    if warmup_task and not warmup_task.done():
+        warmup_task.cancel()
+    if CACHE_SNAPSHOT_PATH:
+        try:
+            saved = await asyncio.to_thread(response_cache.save_snapshot, CACHE_SNAPSHOT_PATH)
+            logging.info(f"Saved {saved} cache entries to {CACHE_SNAPSHOT_PATH}")
+        except Exception as e:
+            logging.error(f"Cache snapshot save error: {str(e)}")
+    await ocr_jobs.stop()
+    if image_pool is not None:
+        image_pool.shutdown(wait=False, cancel_futures=True)
+    await http_session.close()
+    await response_cache.close()
+    await pubmed_evidence.cache.close()
+    logging.info("Shared HTTP session closed")
+
+app = FastAPI(lifespan=lifespan)
+
+# Per-request Server-Timing header and latency summaries for /metrics
+app.add_middleware(MetricsMiddleware, route_paths=lambda: known_route_paths())
 
 # CORS
 app.add_middleware(
@@ -26,6 +116,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"],
 )
 
 # Set up logging
@@ -36,203 +127,491 @@ GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 DEEPSEEK_API_KEY = os.getenv("OPENAI_API_KEY")
 
-# Initialize Gemini
-if GEMINI_API_KEY:
-    genai.configure(api_key=GEMINI_API_KEY)
-else:
+# Upstream base URLs; override to point at local stand-ins (see benchmarks/mock_upstreams.py)
+GEMINI_BASE_URL = os.getenv("GEMINI_BASE_URL", "https://generativelanguage.googleapis.com/v1beta")
+OPENROUTER_BASE_URL = os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1")
+PUBMED_BASE_URL = os.getenv("PUBMED_BASE_URL", EUTILS_BASE_URL)
+FACT_CHECK_BASE_URL = os.getenv("FACT_CHECK_BASE_URL", "https://factchecktools.googleapis.com/v1alpha1").rstrip("/")
+
+# Per-provider resilience: the configured timeouts become ceilings for adaptive ones
+def upstream_policy(name, max_timeout):
+    return UpstreamPolicy(
+        name, max_timeout,
+        min_timeout=float(os.getenv("UPSTREAM_MIN_TIMEOUT", "1")),
+        multiplier=float(os.getenv("UPSTREAM_TIMEOUT_MULTIPLIER", "2")),
+        retry_ratio=float(os.getenv("UPSTREAM_RETRY_BUDGET", "0.1")),
+        breaker=CircuitBreaker(
+            failure_ratio=float(os.getenv("CIRCUIT_FAILURE_RATIO", "0.5")),
+            cooldown=float(os.getenv("CIRCUIT_COOLDOWN", "30")),
+        ),
+    )
+
+upstream_policies = {
+    "gemini": upstream_policy("gemini", LLM_TIMEOUT.total),
+    "gemini_vision": upstream_policy("gemini_vision", LLM_TIMEOUT.total),
+    "openrouter": upstream_policy("openrouter", LLM_TIMEOUT.total),
+    "pubmed": upstream_policy("pubmed", SOURCE_TIMEOUT.total),
+    "fact_check": upstream_policy("fact_check", SOURCE_TIMEOUT.total),
+}
+# Race a duplicate summary request when the first runs past the observed p95
+SUMMARY_HEDGING = os.getenv("SUMMARY_HEDGING", "false").lower() in ("1", "true", "yes")
+
+# Async LLM clients, reusing the shared session and bounded per provider
+gemini_client = GeminiClient(
+    get_http_session, GEMINI_API_KEY, base_url=GEMINI_BASE_URL,
+    max_concurrency=int(os.getenv("GEMINI_MAX_CONCURRENCY", "16")), timeout=LLM_TIMEOUT,
+    policy=upstream_policies["gemini"], image_policy=upstream_policies["gemini_vision"],
+)
+openrouter_client = OpenRouterClient(
+    get_http_session, DEEPSEEK_API_KEY, base_url=OPENROUTER_BASE_URL,
+    max_concurrency=int(os.getenv("OPENROUTER_MAX_CONCURRENCY", "16")), timeout=LLM_TIMEOUT,
+    policy=upstream_policies["openrouter"],
+)
+if not GEMINI_API_KEY:
     logging.error("Gemini API key not set during initialization")
 
-# In-memory cache
-response_cache = {}
+# Response cache; CACHE_BACKEND selects memory, sqlite (shared per node) or redis
+response_cache = ResponseCache(create_backend(), ttl=int(os.getenv("RESPONSE_CACHE_TTL", "3600")), name="responses")
+
+# OCR results keyed on image hashes, sharing the response cache's backend
+MAX_IMAGE_BYTES = int(os.getenv("MAX_IMAGE_BYTES", str(10 * 1024 * 1024)))
+OCR_MAX_SIDE = int(os.getenv("OCR_MAX_SIDE", "1600"))
+OCR_JPEG_QUALITY = int(os.getenv("OCR_JPEG_QUALITY", "80"))
+ocr_cache = ResponseCache(response_cache.backend, ttl=int(os.getenv("OCR_CACHE_TTL", "86400")), name="ocr")
+
+# Image decoding runs in worker processes so large images don't hold the GIL while the loop serves text requests
+OCR_PROCESSES = int(os.getenv("OCR_PROCESSES", "2"))
+image_pool = None
+
+def get_image_pool():
+    global image_pool
+    if image_pool is None:
+        # spawn: workers import only imaging.py, not this module and its event-loop state
+        image_pool = ProcessPoolExecutor(OCR_PROCESSES, mp_context=multiprocessing.get_context("spawn"))
+    return image_pool
+
+def reset_image_pool():
+    """Drop a broken pool (a worker died, e.g. out of memory on a huge image); the next call starts a fresh one."""
+    global image_pool
+    logging.error("Image worker pool broke, restarting it")
+    image_pool = None
+
+# Every OCR (inline or submitted via /ocr/jobs) goes through one bounded queue
+ocr_jobs = JobQueue(
+    workers=int(os.getenv("OCR_WORKERS", "4")),
+    max_queued=int(os.getenv("OCR_MAX_QUEUED", "32")),
+    result_ttl=int(os.getenv("OCR_JOB_TTL", "600")),
+)
+OCR_POLL_MAX_WAIT = float(os.getenv("OCR_POLL_MAX_WAIT", "30"))
+
+# PubMed evidence: long-lived cache plus one token bucket for NCBI's limit (3 req/s, 10 with a key),
+# split across uvicorn workers since each process has its own bucket. The cache has its own store so
+# responses and OCR results can't evict week-long evidence entries.
+NCBI_API_KEY = os.getenv("NCBI_API_KEY")
+WEB_CONCURRENCY = max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+NCBI_RATE = float(os.getenv("NCBI_RATE", str((10 if NCBI_API_KEY else 3) / WEB_CONCURRENCY)))
+PUBMED_SEARCH_TTL = int(os.getenv("PUBMED_SEARCH_TTL", str(7 * 86400)))
+pubmed_evidence = PubMedEvidence(
+    get_http_session,
+    ResponseCache(create_backend(
+        max_entries=int(os.getenv("EVIDENCE_CACHE_MAX_ENTRIES", "20000")),
+        max_bytes=int(os.getenv("EVIDENCE_CACHE_MAX_BYTES", str(32 * 1024 * 1024))),
+        sqlite_path=os.getenv("EVIDENCE_SQLITE_PATH", "/tmp/veriguard-evidence.sqlite3"),
+    ), ttl=PUBMED_SEARCH_TTL, name="evidence"),
+    TokenBucket(NCBI_RATE, burst=max(1.0, NCBI_RATE)),
+    api_key=NCBI_API_KEY,
+    base_url=PUBMED_BASE_URL,
+    timeout=SOURCE_TIMEOUT,
+    search_ttl=PUBMED_SEARCH_TTL,
+    summary_ttl=int(os.getenv("PUBMED_SUMMARY_TTL", str(30 * 86400))),
+    refresh_after=int(os.getenv("PUBMED_REFRESH_AFTER", "86400")),
+    batch_window=float(os.getenv("PUBMED_BATCH_WINDOW", "0.02")),
+    policy=upstream_policies["pubmed"],
+)
 
 def get_cache_key(text):
     """Generate a cache key from input text."""
     return hashlib.md5(text.lower().strip().encode()).hexdigest()
 
-@lru_cache(maxsize=100)
+# Second-tier cache: paraphrases of a recently answered query reuse its response.
+# Built on first use or by the warm-up task, since it pulls in numpy.
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+semantic_cache = None
+NEGATIONS = {"no", "not", "without", "never", "dont", "doesnt", "isnt", "cant", "nor", "stopped"}
+# Words that don't change what is being asked; any other word has to match for two queries to share an answer
+SIGNATURE_FILLER = FILLER_WORDS | {"does", "did", "are", "am", "was", "be", "will", "would", "could", "this", "that",
+                                   "and", "or", "in", "on", "at", "you", "any", "really", "true", "when", "why"}
+
+def get_semantic_cache():
+    global semantic_cache
+    if semantic_cache is None:
+        from semantic_cache import SemanticCache
+        semantic_cache = SemanticCache(
+            capacity=int(os.getenv("SEMANTIC_CACHE_SIZE", "1024")),
+            dim=int(os.getenv("SEMANTIC_CACHE_DIM", "2048")),
+            threshold=float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.6")),
+        )
+    return semantic_cache
+
+def _singular(word):
+    return word[:-1] if len(word) > 3 and word.endswith("s") else word
+
+def semantic_signature(text):
+    """Queries can only share a response if they match the same vocabulary terms, negations and content words.
+
+    Numbers, durations and qualifiers count as content words, so "I have a
+    headache for 3 weeks" never reuses the generic answer to "I have a headache".
+    """
+    classification = classify(text)
+    words = set(re.sub(r"[^\w\s]", "", normalize_query_text(text)).split())
+    matched = {_singular(word) for terms in classification.terms.values() for term in terms for word in term.split()}
+    content = {_singular(word) for word in words - NEGATIONS - SIGNATURE_FILLER} - matched
+    return (classification.greeting,
+            tuple(sorted(classification.terms.get("medical", ()))),
+            tuple(sorted(classification.terms.get("controversial", ()))),
+            tuple(sorted(words & NEGATIONS)),
+            tuple(sorted(content)))
+
+async def semantic_lookup(text):
+    """Return the cached response of a near-duplicate query, or None."""
+    if not SEMANTIC_CACHE_ENABLED:
+        return None
+    index = get_semantic_cache()
+    key, similarity = index.nearest(text, semantic_signature(text))
+    if key is None:
+        return None
+    response = await response_cache.peek(key)
+    if response is None:
+        if not response_cache.computing(key):
+            index.discard(key)
+        return None
+    index.record_hit(similarity)
+    record_timing("cache-semantic", 0, f"hit {similarity:.2f}")
+    logging.info(f"Semantic cache hit for '{text}' (similarity {similarity:.2f})")
+    return response
+
+def remember_semantic(text):
+    """Index a query whose response is now in the response cache."""
+    if SEMANTIC_CACHE_ENABLED:
+        get_semantic_cache().add(text, get_cache_key(text), semantic_signature(text))
+
+def is_cacheable(response):
+    """Degraded responses (fallback output or the shed path) are served once, never stored."""
+    return not response.get("degraded")
+
+async def analyze_or_reuse(text):
+    """Compute a new-conversation response: reuse a paraphrase's, or run the pipeline."""
+    response = await semantic_lookup(text)
+    if response is None:
+        response = await analyze_text(text, False)
+        # get_or_compute stores it next; lookups in between see computing() and keep the entry
+        if is_cacheable(response):
+            remember_semantic(text)
+    return response
+
+# Indexed symptom vocabulary for typo correction, built on first use or by the warm-up task
+symptom_index = None
+
+def get_symptom_index():
+    global symptom_index
+    if symptom_index is None:
+        from fuzzy import TrigramIndex
+        symptom_index = TrigramIndex.from_file()
+    return symptom_index
+
+@lru_cache(maxsize=int(os.getenv("TERM_CORRECTION_CACHE_SIZE", "8192")))
 def correct_medical_term(term):
     """Correct common typos in medical terms using similarity matching."""
-    medical_terms = [
-        "stomachache", "headache", "fever", "cough", "nausea", "diarrhea",
-        "vomiting", "abdominal pain", "chest pain", "fatigue", "sore throat",
-        "back pain", "muscle pain", "joint pain", "dizziness", "constipation"
-    ]
     term = term.lower().strip()
-    for correct_term in medical_terms:
-        similarity = SequenceMatcher(None, term, correct_term).ratio()
-        if similarity > 0.8:
-            logging.info(f"Corrected '{term}' to '{correct_term}'")
-            return correct_term
+    correct_term, similarity = get_symptom_index().best_match(term, threshold=0.8)
+    if correct_term and correct_term != term:
+        logging.info(f"Corrected '{term}' to '{correct_term}' (similarity {similarity:.2f})")
+        return correct_term
     return term
 
 def is_medical_query(text):
     """Check if the text is actually a medical query."""
-    medical_keywords = [
-        'pain', 'ache', 'hurt', 'sick', 'fever', 'cough', 'nausea', 'dizzy', 'bleeding',
-        'infection', 'swelling', 'rash', 'symptom', 'disease', 'condition', 'medical',
-        'doctor', 'hospital', 'medicine', 'treatment', 'cure', 'heal', 'injury',
-        'broken', 'cut', 'wound', 'burn', 'bite', 'sting', 'allergy', 'asthma'
-    ]
-    greeting_keywords = ['hi', 'hello', 'hey', 'what are you', 'who are you', 'about', 'help']
-    
-    text_lower = text.lower().strip()
-    
-    # Check if it's a greeting or general question about the service
-    if any(keyword in text_lower for keyword in greeting_keywords):
-        return False
-    
-    # Check if it contains medical keywords
-    return any(keyword in text_lower for keyword in medical_keywords)
+    return classify(text).medical
+
+# Reviewed guidance for plain mentions of common symptoms (see guidance.py), served without upstream calls
+GUIDANCE_ENABLED = os.getenv("GUIDANCE_ENABLED", "true").lower() in ("1", "true", "yes")
+GUIDANCE_PATH = os.getenv("GUIDANCE_PATH", DEFAULT_GUIDANCE_PATH)
+guidance_table = None
+
+def get_guidance_table():
+    global guidance_table
+    if guidance_table is None:
+        guidance_table = GuidanceTable.load(GUIDANCE_PATH)
+        logging.info(f"Loaded guidance revision {guidance_table.revision} with {len(guidance_table)} reviewed entries")
+    return guidance_table
+
+def guidance_response(text):
+    """Precomputed response for a plain, non-controversial mention of a curated symptom, or None."""
+    if not GUIDANCE_ENABLED:
+        return None
+    start = time.perf_counter()
+    classification = classify(text)
+    if not classification.medical or classification.controversial:
+        return None
+    match = get_guidance_table().match(text)
+    if match is None:
+        return None
+    symptom, entry = match
+    # Follow-ups and later extractions of the same text see the symptom as if Gemini had extracted it
+    remember_extraction(normalize_query_text(text), symptom)
+    record_timing("guidance", time.perf_counter() - start, symptom)
+    return {
+        "summary": entry["summary"],
+        "sources": {"pubmed": entry["pubmed"], "fact_checks": []},
+        "chat_title": entry["title"],
+    }
+
+# Cross-request memo of extracted symptoms, keyed on normalized text
+EXTRACTION_MEMO_SIZE = int(os.getenv("EXTRACTION_MEMO_SIZE", "4096"))
+extraction_memo = OrderedDict()
+extraction_inflight = {}
 
-def extract_query(text):
-    """Extract key medical term using Gemini, with typo correction and fallback."""
-    text = text.lower().strip()
+def normalize_query_text(text):
+    """Normalize text so trivially different queries share one extraction."""
+    return " ".join(text.lower().split())
+
+def fallback_extract_query(text):
+    """Rule-based symptom extraction used when Gemini is unavailable."""
+    non_medical = ['i', 'im', 'ive', 'having', 'have', 'a', 'an', 'the', 'and', 'or', 'something', 'what', 'to', 'do', 'so', 'now']
+    cleaned = re.sub(r'[^\w\s]', '', text)
+    words = [w for w in cleaned.split() if w not in non_medical][:2]
+    query = " ".join(words)
+    query = correct_medical_term(query)
+    logging.info(f"Fallback query: {query}")
+    return query
+
+async def gemini_extract_query(text):
+    """Gemini call extracting the main symptom from a medical query."""
+    prompt = f"Extract the main health symptom from: '{text}'. Return only the symptom (e.g., 'fever')."
+    response = await gemini_client.generate(prompt)
+    return correct_medical_term(response)
+
+async def extract_query(text, classification=None):
+    """Extract key medical term once per distinct query, with typo correction and fallback."""
+    text = normalize_query_text(text)
     logging.info(f"Extracting query from text: {text}")
-    
+
     # If not a medical query, return the original text
-    if not is_medical_query(text):
+    classification = classification or classify(text)
+    if not classification.medical:
         return text
-    
+
+    if text in extraction_memo:
+        extraction_memo.move_to_end(text)
+        logging.info(f"Extraction memo hit: {text}")
+        return extraction_memo[text]
+
+    # Coalesce concurrent extractions of the same text onto one Gemini call
+    task = extraction_inflight.get(text)
+    if task is None:
+        task = asyncio.ensure_future(_extract_medical_query(text))
+        extraction_inflight[text] = task
+        task.add_done_callback(lambda _: extraction_inflight.pop(text, None))
+    return await asyncio.shield(task)
+
+async def _extract_medical_query(text):
+    """Run the Gemini extraction and memoize successful results."""
     try:
-        model = genai.GenerativeModel('gemini-1.5-flash')
-        prompt = f"Extract the main health symptom from: '{text}'. Return only the symptom (e.g., 'fever')."
-        response = model.generate_content(prompt)
-        query = response.text.strip()
-        query = correct_medical_term(query)
-        logging.info(f"Gemini extracted query: {query}")
-        return query
+        query = await gemini_extract_query(text)
     except Exception as e:
         logging.error(f"Gemini query extraction error: {str(e)}")
-        non_medical = ['i', 'im', 'ive', 'having', 'have', 'a', 'an', 'the', 'and', 'or', 'something', 'what', 'to', 'do', 'so', 'now']
-        cleaned = re.sub(r'[^\w\s]', '', text)
-        words = [w for w in cleaned.split() if w not in non_medical][:2]
-        query = " ".join(words)
-        query = correct_medical_term(query)
-        logging.info(f"Fallback query: {query}")
-        return query
-
-def perform_ai_ocr(image_file):
-    """Gemini for OCR (free tier)."""
+        # Fallbacks are not memoized so a transient outage doesn't stick
+        return fallback_extract_query(text)
+    logging.info(f"Gemini extracted query: {query}")
+    remember_extraction(text, query)
+    return query
+
+def remember_extraction(text, query):
+    extraction_memo[text] = query
+    if len(extraction_memo) > EXTRACTION_MEMO_SIZE:
+        extraction_memo.popitem(last=False)
+
+# Claims per Gemini prompt when extracting symptoms for a batch
+BATCH_EXTRACT_SIZE = int(os.getenv("BATCH_EXTRACT_SIZE", "20"))
+
+async def gemini_extract_queries(texts):
+    """One Gemini call extracting the main symptom for each of several queries, in order."""
+    claims = "\n".join(f"{i + 1}. {text}" for i, text in enumerate(texts))
+    prompt = (f"Extract the main health symptom from each numbered message below. "
+              f"Return only a JSON array of {len(texts)} strings in the same order (e.g., [\"fever\", \"back pain\"]).\n\n{claims}")
+    response = await gemini_client.generate(prompt)
+    cleaned = response.strip().removeprefix("```json").removeprefix("```").removesuffix("```").strip()
+    symptoms = json.loads(cleaned)
+    if not isinstance(symptoms, list) or len(symptoms) != len(texts) or not all(isinstance(s, str) for s in symptoms):
+        raise ValueError(f"Expected {len(texts)} symptoms, got: {cleaned[:200]}")
+    return symptoms
+
+async def _extract_from_batch(batch_task, index, text):
+    """Pick one query's symptom out of a batched extraction, falling back to a single call."""
+    try:
+        query = correct_medical_term((await batch_task)[index])
+    except Exception as e:
+        logging.warning(f"Batched extraction failed, extracting individually: {str(e)}")
+        return await _extract_medical_query(text)
+    remember_extraction(text, query)
+    return query
+
+async def admitted_extract_queries(texts):
+    """gemini_extract_queries under an admission slot; when shed, each query falls back to its own extraction."""
+    async with admission.slot() as ticket:
+        if ticket is None:
+            raise RuntimeError("Batched extraction shed by admission control")
+        return await gemini_extract_queries(texts)
+
+def prefetch_extractions(texts):
+    """Start batched Gemini extractions for medical queries not yet memoized or in flight.
+
+    Each query gets an entry in extraction_inflight, so the query stage of its
+    pipeline coalesces onto the batch instead of making its own call.
+    """
+    pending = []
+    for text in dict.fromkeys(normalize_query_text(text) for text in texts):
+        if text in extraction_memo or text in extraction_inflight or not classify(text).medical:
+            continue
+        pending.append(text)
+    for start in range(0, len(pending), BATCH_EXTRACT_SIZE):
+        chunk = pending[start:start + BATCH_EXTRACT_SIZE]
+        batch_task = asyncio.ensure_future(admitted_extract_queries(chunk))
+        # Retrieved by every per-query task; avoids "exception never retrieved" noise when all fall back
+        batch_task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        for index, text in enumerate(chunk):
+            task = asyncio.ensure_future(_extract_from_batch(batch_task, index, text))
+            extraction_inflight[text] = task
+            task.add_done_callback(lambda _, text=text: extraction_inflight.pop(text, None))
+    return len(pending)
+
+async def perform_ai_ocr(image_data):
+    """Gemini for OCR (free tier) on a downscaled grayscale copy, deduped by image hash.
+
+    Failures raise HTTPException with a generic detail; an error message is never returned as text.
+    """
     if not GEMINI_API_KEY:
         logging.error("Gemini API key not set")
-        return "Gemini API key not set."
+        raise HTTPException(503, detail="Text extraction from images is unavailable")
+
+    # Identical bytes skip decoding entirely
+    raw_key = f"ocr:sha256:{content_hash(image_data)}"
+    cached = await ocr_cache.get(raw_key)
+    if cached is not None:
+        logging.info(f"OCR cache hit for key: {raw_key}")
+        return cached["text"]
+
+    start = time.perf_counter()
     try:
-        model = genai.GenerativeModel('gemini-1.5-flash')
-        if hasattr(image_file, 'read'):
-            image_data = image_file.read()
-            image = Image.open(io.BytesIO(image_data))
-        else:
-            image = image_file
+        prepared = await asyncio.get_running_loop().run_in_executor(
+            get_image_pool(), prepare_image, image_data, OCR_MAX_SIDE, OCR_JPEG_QUALITY)
+    except BrokenProcessPool:
+        reset_image_pool()
+        raise HTTPException(503, detail="Image processing unavailable, please retry")
+    except Exception as e:
+        logging.error(f"Image decode error: {str(e)}")
+        raise HTTPException(400, detail="Unsupported or corrupt image")
+    observe_stage("prepare_image", time.perf_counter() - start)
+    logging.info(f"Prepared image for OCR: {len(image_data)} -> {len(prepared.data)} bytes, {prepared.size[0]}x{prepared.size[1]}")
+
+    async def run_ocr():
         prompt = "Extract health-related text from this image. Output only the text."
-        response = model.generate_content([prompt, image])
-        return response.text.strip()
+        text = await gemini_client.generate(prompt, image=prepared.data, mime_type=prepared.mime_type)
+        return {"text": text}
+
+    try:
+        # Copies differing only in container, metadata or size share a pixel hash
+        result = await ocr_cache.get_or_compute(f"ocr:pixels:{prepared.pixel_hash}", run_ocr)
     except Exception as e:
         logging.error(f"OCR Error: {str(e)}")
-        return f"OCR Error: {str(e)}"
+        raise HTTPException(502, detail="Could not extract text from the image, please retry")
+    await ocr_cache.set(raw_key, result)
+    return result["text"]
 
-async def search_pubmed(query):
-    """Free PubMed search via NCBI EUtils."""
-    simplified_query = extract_query(query)
+async def search_pubmed(simplified_query):
+    """Free PubMed search via NCBI EUtils for an already-extracted symptom."""
     logging.info(f"Searching PubMed with query: {simplified_query}")
     try:
-        async with aiohttp.ClientSession() as session:
-            esearch_url = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/esearch.fcgi"
-            params = {"db": "pubmed", "term": simplified_query + " treatment", "retmax": 2, "retmode": "json"}
-            async with session.get(esearch_url, params=params, timeout=10) as response:
-                logging.info(f"PubMed esearch status: {response.status}")
-                response.raise_for_status()
-                data = await response.json()
-                ids = data.get("esearchresult", {}).get("idlist", [])
-                if not ids:
-                    logging.info("No PubMed results found")
-                    return []
-                esummary_url = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/esummary.fcgi"
-                params = {"db": "pubmed", "id": ",".join(ids), "retmode": "json"}
-                async with session.get(esummary_url, params=params, timeout=10) as response:
-                    logging.info(f"PubMed esummary status: {response.status}")
-                    response.raise_for_status()
-                    data = await response.json()
-                    results = []
-                    for uid in data.get("result", {}).get("uids", []):
-                        article = data["result"][uid]
-                        results.append({
-                            "title": article.get("title", "No title available"),
-                            "authors": ", ".join([a["name"] for a in article.get("authors", [])]) or "No authors listed",
-                            "pubdate": article.get("pubdate", "No date available"),
-                            "url": f"https://pubmed.ncbi.nlm.nih.gov/{uid}/"
-                        })
-                    logging.info(f"PubMed results: {len(results)} found")
-                    return results
+        results = await pubmed_evidence.search(simplified_query)
+        logging.info(f"PubMed results: {len(results)} found")
+        return results
     except Exception as e:
         logging.error(f"PubMed error: {str(e)}")
         return []
 
-async def search_fact_check(query):
+async def search_fact_check(query, simplified_query, session=None, classification=None):
     """Free Google Fact Check Tools API - only for controversial claims."""
     # Only search for fact-checks if query contains controversial keywords
-    controversial_keywords = ['cure', 'miracle', 'detox', 'cleanse', 'natural remedy', 'conspiracy']
-    if not any(keyword in query.lower() for keyword in controversial_keywords):
+    classification = classification or classify(query)
+    if not classification.controversial:
         return []
     
-    simplified_query = extract_query(query)
     logging.info(f"Searching fact check with query: {simplified_query}")
     if not GOOGLE_API_KEY:
         logging.error("Google API key not set")
         return []
-    try:
-        async with aiohttp.ClientSession() as session:
-            url = "https://factchecktools.googleapis.com/v1alpha1/claims:search"
-            params = {"query": simplified_query, "key": GOOGLE_API_KEY, "pageSize": 2}
-            async with session.get(url, params=params, timeout=10) as response:
+    session = session or get_http_session()
+
+    async def fetch():
+        with time_upstream("fact_check"):
+            url = f"{FACT_CHECK_BASE_URL}/claims:search"
+            params = {"query": simplified_query, "pageSize": 2}
+            # Key in a header so it never appears in the URL of a logged error
+            headers = {"x-goog-api-key": GOOGLE_API_KEY}
+            async with session.get(url, params=params, headers=headers, timeout=SOURCE_TIMEOUT) as response:
                 logging.info(f"Fact check status: {response.status}")
                 response.raise_for_status()
-                data = await response.json()
-                claims = data.get("claims", [])
-                results = []
-                for claim in claims:
-                    for review in claim.get("claimReview", []):
-                        results.append({
-                            "claim": claim.get("text", "No claim text"),
-                            "rating": review.get("textualRating", "No rating"),
-                            "publisher": review.get("publisher", {}).get("name", "No publisher"),
-                            "url": review.get("url", "No URL")
-                        })
-                logging.info(f"Fact check results: {len(results)} found")
-                return results
+                return await response.json()
+
+    try:
+        # An open circuit raises straight away, landing in the empty-list fallback below
+        data = await upstream_policies["fact_check"].call(fetch)
+        claims = data.get("claims", [])
+        results = []
+        for claim in claims:
+            for review in claim.get("claimReview", []):
+                results.append({
+                    "claim": claim.get("text", "No claim text"),
+                    "rating": review.get("textualRating", "No rating"),
+                    "publisher": review.get("publisher", {}).get("name", "No publisher"),
+                    "url": review.get("url", "No URL")
+                })
+        logging.info(f"Fact check results: {len(results)} found")
+        return results
     except Exception as e:
         logging.error(f"Fact check error: {str(e)}")
         return []
 
-def analyze_with_gemini(text):
-    """Gemini for medical analysis - focused and concise."""
+async def analyze_with_gemini(text):
+    """Gemini for medical analysis - focused and concise. Raises on failure, so the stage falls back."""
     if not GEMINI_API_KEY:
-        logging.error("Gemini API key not set")
-        return "Analysis unavailable"
+        raise LLMError("Gemini API key not set")
     try:
-        model = genai.GenerativeModel('gemini-1.5-flash')
         prompt = f"Provide brief medical guidance for: {text}. Focus on immediate care steps and when to see a doctor. Keep under 100 words."
-        response = model.generate_content(prompt)
-        return response.text.strip()
+        return await gemini_client.generate(prompt)
     except Exception as e:
         logging.error(f"Gemini analysis error: {str(e)}")
-        return "Analysis unavailable"
+        raise
 
-async def summarize_with_deepseek(text, pubmed, fact_checks, gemini_analysis):
-    """DeepSeek for concise medical summary or service introduction."""
+async def complete_summary(prompt, max_tokens, on_token=None):
+    """Run an OpenRouter completion, streaming chunks to on_token when given."""
+    if on_token is None:
+        return await openrouter_client.chat(prompt, max_tokens=max_tokens, temperature=0.1, hedge=SUMMARY_HEDGING)
+    parts = []
+    async for chunk in openrouter_client.stream_chat(prompt, max_tokens=max_tokens, temperature=0.1):
+        parts.append(chunk)
+        await on_token(chunk)
+    return "".join(parts).strip()
+
+async def summarize_with_deepseek(text, pubmed, fact_checks, gemini_analysis, simplified_query, on_token=None, classification=None):
+    """DeepSeek for concise medical summary or service introduction. Raises on failure, so the stage falls back."""
+    classification = classification or classify(text)
     if not DEEPSEEK_API_KEY:
-        logging.error("DeepSeek API key not set")
-        return "Summary unavailable"
+        raise LLMError("DeepSeek API key not set")
     
     try:
-        headers = {
-            "Authorization": f"Bearer {DEEPSEEK_API_KEY}",
-            "Content-Type": "application/json",
-            "HTTP-Referer": "https://veriguard.onrender.com",
-            "X-Title": "VeriGuard"
-        }
-        
         # Check if this is a general inquiry about the service
-        if not is_medical_query(text):
+        if not classification.medical:
             prompt = f"""
             The user asked: {text}
             
@@ -253,7 +632,7 @@ async def summarize_with_deepseek(text, pubmed, fact_checks, gemini_analysis):
             # Create concise prompt focused on practical medical advice
             fact_check_info = ""
             if fact_checks:
-                fact_check_info = f" Note: Some claims about {extract_query(text)} may be misleading."
+                fact_check_info = f" Note: Some claims about {simplified_query} may be misleading."
             
             pubmed_info = ""
             if pubmed:
@@ -271,60 +650,38 @@ async def summarize_with_deepseek(text, pubmed, fact_checks, gemini_analysis):
             Based on: {gemini_analysis}
             """
         
-        payload = {
-            "model": "deepseek/deepseek-chat",
-            "messages": [{"role": "user", "content": prompt}],
-            "max_tokens": 150,
-            "temperature": 0.1
-        }
-        
-        async with aiohttp.ClientSession() as session:
-            async with session.post(
-                "https://openrouter.ai/api/v1/chat/completions",
-                headers=headers,
-                json=payload,
-                timeout=15
-            ) as response:
-                logging.info(f"DeepSeek status: {response.status}")
-                response.raise_for_status()
-                data = await response.json()
-                return data["choices"][0]["message"]["content"].strip()
+        return await complete_summary(prompt, 150, on_token)
     except Exception as e:
         logging.error(f"DeepSeek error: {str(e)}")
-        # Fallback for non-medical queries
-        if not is_medical_query(text):
-            return "I'm VeriGuard, a MediFact Checker - An AI tool for verifying health misinformation and helping with health queries. Ask me about any health concern!"
-        return f"Summary unavailable: {str(e)}"
+        raise
+
+VERIGUARD_INTRO = "I'm VeriGuard, a MediFact Checker - An AI tool for verifying health misinformation and helping with health queries. Ask me about any health concern!"
 
-def analyze_with_gemini_context(text):
-    """Gemini for medical analysis - context-aware for continuing conversations."""
+def fallback_summary(classification):
+    """Summary stage fallback: the service introduction for non-medical queries."""
+    return "Summary unavailable" if classification.medical else VERIGUARD_INTRO
+
+async def analyze_with_gemini_context(text, context=""):
+    """Gemini for medical analysis - context-aware for continuing conversations. Raises on failure."""
     if not GEMINI_API_KEY:
-        logging.error("Gemini API key not set")
-        return "Analysis unavailable"
+        raise LLMError("Gemini API key not set")
     try:
-        model = genai.GenerativeModel('gemini-1.5-flash')
-        prompt = f"Continue the medical conversation. User asks: {text}. Provide specific medical advice, acknowledging this is a follow-up question. Keep under 100 words."
-        response = model.generate_content(prompt)
-        return response.text.strip()
+        history = f"Conversation so far:\n{context}\n\n" if context else ""
+        prompt = f"{history}Continue the medical conversation. User asks: {text}. Provide specific medical advice, acknowledging this is a follow-up question. Keep under 100 words."
+        return await gemini_client.generate(prompt)
     except Exception as e:
         logging.error(f"Gemini context analysis error: {str(e)}")
-        return "Context analysis unavailable"
+        raise
 
-async def summarize_with_context(text, pubmed, fact_checks, gemini_analysis):
-    """DeepSeek for context-aware responses in continuing conversations."""
+async def summarize_with_context(text, pubmed, fact_checks, gemini_analysis, on_token=None, context=""):
+    """DeepSeek for context-aware responses in continuing conversations. Raises on failure."""
     if not DEEPSEEK_API_KEY:
-        logging.error("DeepSeek API key not set")
-        return "Context response unavailable"
+        raise LLMError("DeepSeek API key not set")
     
     try:
-        headers = {
-            "Authorization": f"Bearer {DEEPSEEK_API_KEY}",
-            "Content-Type": "application/json",
-            "HTTP-Referer": "https://veriguard.onrender.com",
-            "X-Title": "VeriGuard"
-        }
-        
-        prompt = f"""
+        # History goes first so the prompt prefix stays the same from one turn to the next
+        history = f"Conversation so far:\n{context}\n" if context else ""
+        prompt = f"""{history}
         This is a follow-up question in an ongoing medical conversation: {text}
         
         Provide a specific, direct answer that acknowledges this is continuing the previous discussion.
@@ -336,103 +693,227 @@ async def summarize_with_context(text, pubmed, fact_checks, gemini_analysis):
         Do NOT introduce yourself again or explain what VeriGuard is.
         """
         
-        payload = {
-            "model": "deepseek/deepseek-chat",
-            "messages": [{"role": "user", "content": prompt}],
-            "max_tokens": 120,
-            "temperature": 0.1
-        }
-        
-        async with aiohttp.ClientSession() as session:
-            async with session.post(
-                "https://openrouter.ai/api/v1/chat/completions",
-                headers=headers,
-                json=payload,
-                timeout=15
-            ) as response:
-                logging.info(f"DeepSeek context status: {response.status}")
-                response.raise_for_status()
-                data = await response.json()
-                return data["choices"][0]["message"]["content"].strip()
+        return await complete_summary(prompt, 120, on_token)
     except Exception as e:
         logging.error(f"DeepSeek context error: {str(e)}")
-        return f"Follow-up response unavailable: {str(e)}"
+        raise
 
-def generate_chat_title(text):
+async def generate_chat_title(text):
     """Generate a natural chat title like other AI assistants."""
     try:
-        model = genai.GenerativeModel('gemini-1.5-flash')
         prompt = f"Create a short 2-3 word title for this medical query: '{text}'. Examples: 'Fever treatment', 'Back pain', 'Headache help'. Return ONLY the title, nothing else."
-        response = model.generate_content(prompt)
-        title = response.text.strip().strip('"').strip("'")
+        response = await gemini_client.generate(prompt)
+        title = response.strip().strip('"').strip("'")
         # Take only first line if multiple suggestions
         title = title.split('\n')[0].strip()
         logging.info(f"Generated chat title: {title}")
         return title
     except Exception as e:
         logging.error(f"Gemini title generation error: {str(e)}")
-        # Fallback to natural title generation
-        words = text.lower().strip().split()
-        if not words:
-            return "New Chat"
-        
-        # Common medical terms and their natural titles
-        medical_mappings = {
-            'headache': 'Headache help',
-            'fever': 'Fever treatment', 
-            'cough': 'Cough remedy',
-            'pain': 'Pain relief',
-            'nausea': 'Nausea help',
-            'diarrhea': 'Stomach issues',
-            'fatigue': 'Fatigue help',
-            'dizzy': 'Dizziness help',
-            'antibiotic': 'Antibiotic question',
-            'medicine': 'Medicine advice'
-        }
-        
-        for word in words:
-            if word in medical_mappings:
-                return medical_mappings[word]
-        
-        # Generic fallback - take first 2 meaningful words
-        meaningful_words = [w for w in words if len(w) > 2 and w not in ['the', 'and', 'but', 'for', 'are', 'with', 'can', 'you', 'have', 'say', 'true', 'false']]
-        title = ' '.join(meaningful_words[:2])
-        return title.capitalize() if title else "Medical question"
-    """Generate a natural chat title like other AI assistants."""
+        return fallback_chat_title(text)
+
+def fallback_chat_title(text):
+    """Rule-based chat title used when Gemini is unavailable."""
+    words = text.lower().strip().split()
+    if not words:
+        return "New Chat"
+    
+    # Common medical terms and their natural titles
+    medical_mappings = {
+        'headache': 'Headache help',
+        'fever': 'Fever treatment', 
+        'cough': 'Cough remedy',
+        'pain': 'Pain relief',
+        'nausea': 'Nausea help',
+        'diarrhea': 'Stomach issues',
+        'fatigue': 'Fatigue help',
+        'dizzy': 'Dizziness help',
+        'antibiotic': 'Antibiotic question',
+        'medicine': 'Medicine advice'
+    }
+    
+    for word in words:
+        if word in medical_mappings:
+            return medical_mappings[word]
+    
+    # Generic fallback - take first 2 meaningful words
+    meaningful_words = [w for w in words if len(w) > 2 and w not in ['the', 'and', 'but', 'for', 'are', 'with', 'can', 'you', 'have', 'say', 'true', 'false']]
+    title = ' '.join(meaningful_words[:2])
+    return title.capitalize() if title else "Medical question"
+
+# Per-stage deadlines (seconds); a stage that overruns resolves to its fallback
+STAGE_TIMEOUTS = {
+    "query": float(os.getenv("STAGE_TIMEOUT_QUERY", "6")),
+    "pubmed": float(os.getenv("STAGE_TIMEOUT_PUBMED", "8")),
+    "fact_checks": float(os.getenv("STAGE_TIMEOUT_FACT_CHECKS", "4")),
+    "analysis": float(os.getenv("STAGE_TIMEOUT_ANALYSIS", "10")),
+    "title": float(os.getenv("STAGE_TIMEOUT_TITLE", "3")),
+    "summary": float(os.getenv("STAGE_TIMEOUT_SUMMARY", "20")),
+}
+
+# Conversation history for follow-up turns, keyed by chat_id
+session_store = SessionStore(
+    max_sessions=int(os.getenv("SESSION_MAX", "2000")),
+    max_bytes=int(os.getenv("SESSION_MAX_BYTES", str(32 * 1024 * 1024))),
+    idle_ttl=int(os.getenv("SESSION_IDLE_TTL", str(6 * 3600))),
+    max_turns=int(os.getenv("SESSION_MAX_TURNS", "20")),
+    spill_dir=os.getenv("SESSION_SPILL_DIR"),
+)
+SESSION_CONTEXT_TOKENS = int(os.getenv("SESSION_CONTEXT_TOKENS", "600"))
+
+async def extract_followup_query(text, classification, session):
+    """Follow-ups like "what about for kids?" name no symptom; they stay on the previous turn's."""
+    if not classification.medical and session and session.last_symptom:
+        return session.last_symptom
+    return await extract_query(text, classification)
+
+async def search_sources(kind, query, session, search):
+    """Reuse the sources an earlier turn fetched for the same symptom instead of querying again."""
+    earlier = session.sources_for(query) if session else None
+    if earlier is not None:
+        logging.info(f"Reusing {kind} from earlier turn for: {query}")
+        return earlier[kind]
+    return await search()
+
+def record_turn(chat_id, text, response, session=None):
+    """Store a compact record of an answered message for later follow-ups."""
+    normalized = normalize_query_text(text)
+    symptom = extraction_memo.get(normalized)
+    if symptom is None and session is not None and not classify(text).medical:
+        symptom = session.last_symptom
+    session_store.record_turn(chat_id, text, symptom or normalized, response["summary"],
+                              response["sources"]["pubmed"], response["sources"]["fact_checks"])
+
+async def load_session(chat_id, first_message=None):
+    """The chat's session; chats begun at GET /verify, which records no turns, are seeded from first_message."""
+    session = session_store.get(chat_id)
+    if session is not None or not first_message:
+        return session
+    text = " ".join(first_message.split())
+    response = await response_cache.peek(get_cache_key(text)) or guidance_response(text)
+    if response is None:
+        # The answer has left the cache; the topic still carries over
+        response = {"summary": "", "sources": {"pubmed": [], "fact_checks": []}}
+    record_turn(chat_id, text, response)
+    return session_store.get(chat_id)
+
+def build_stages(is_continuing_conversation, on_token=None, session=None):
+    """Declare the /process pipeline as a DAG; the summary waits only on what it uses."""
+    stages = [
+        # Extract the symptom once per request and share it with every source
+        Stage("query", lambda text, classification: extract_followup_query(text, classification, session), deps=["text", "classification"],
+              timeout=STAGE_TIMEOUTS["query"], fallback=lambda text, classification: fallback_extract_query(normalize_query_text(text))),
+        Stage("pubmed", lambda query: search_sources("pubmed", query, session, lambda: search_pubmed(query)), deps=["query"],
+              timeout=STAGE_TIMEOUTS["pubmed"], fallback=[]),
+        Stage("fact_checks", lambda text, query, classification: search_sources(
+                  "fact_checks", query, session, lambda: search_fact_check(text, query, classification=classification)),
+              deps=["text", "query", "classification"],
+              timeout=STAGE_TIMEOUTS["fact_checks"], fallback=[]),
+    ]
+    if is_continuing_conversation:
+        # Use conversation-aware prompts; no new title for continuing conversations
+        context = session_store.build_context(session, SESSION_CONTEXT_TOKENS) if session else ""
+        stages += [
+            Stage("analysis", lambda text: analyze_with_gemini_context(text, context), deps=["text"],
+                  timeout=STAGE_TIMEOUTS["analysis"], fallback="Context analysis unavailable"),
+            Stage("summary", lambda text: summarize_with_context(text, [], [], "Context-aware response", on_token, context), deps=["text"],
+                  timeout=STAGE_TIMEOUTS["summary"], fallback="Context-aware response unavailable"),
+        ]
+    else:
+        stages += [
+            Stage("analysis", lambda text: analyze_with_gemini(text), deps=["text"],
+                  timeout=STAGE_TIMEOUTS["analysis"], fallback="Analysis unavailable"),
+            Stage("title", lambda text: generate_chat_title(text), deps=["text"],
+                  timeout=STAGE_TIMEOUTS["title"], fallback=lambda text: fallback_chat_title(text)),
+            Stage("summary", lambda text, pubmed, fact_checks, analysis, query, classification: summarize_with_deepseek(text, pubmed, fact_checks, analysis, query, on_token, classification),
+                  deps=["text", "pubmed", "fact_checks", "analysis", "query", "classification"],
+                  timeout=STAGE_TIMEOUTS["summary"],
+                  fallback=lambda text, pubmed, fact_checks, analysis, query, classification: fallback_summary(classification)),
+        ]
+    return stages
+
+def build_response(result, is_continuing_conversation):
+    """Assemble the /process response body (without chat_id) from pipeline results."""
+    summary = result["summary"]
+    if not summary or summary == "Summary unavailable":
+        summary = result["analysis"] if not is_continuing_conversation else "Unable to provide context-aware response."
+
+    return {
+        "summary": summary,
+        "sources": {
+            "pubmed": result["pubmed"],
+            "fact_checks": result["fact_checks"]
+        },
+        "chat_title": None if is_continuing_conversation else result["title"]  # None for continuing conversations
+    }
+
+async def analyze_text(extracted_text, is_continuing_conversation, on_complete=None, on_token=None, session=None):
+    """Run the source lookups, analysis and summary for one query; returns a response without chat_id."""
+    result = await run_pipeline(build_stages(is_continuing_conversation, on_token, session), inputs={"text": extracted_text, "classification": classify(extracted_text)}, on_complete=on_complete)
+    for name, seconds in result.timings.items():
+        observe_stage(name, seconds, result.statuses[name])
+    timings = ", ".join(f"{name}={seconds:.2f}s" for name, seconds in result.timings.items())
+    logging.info(f"Stage timings: {timings}")
+    response = build_response(result, is_continuing_conversation)
+    if result.degraded():
+        # Partly fallback output: served, but never cached or recorded as a turn
+        logging.warning(f"Degraded stages: {', '.join(result.degraded())}")
+        response["degraded"] = True
+    return response
+
+def load_imaging():
+    """Start an image worker process and import Pillow in it ahead of the first image request."""
+    get_image_pool().submit(load_pillow).result()
+
+# Upstream origins whose TLS connections are opened ahead of the first request
+PREWARM_URLS = [
+    f"{pubmed_evidence.base_url}/einfo.fcgi",
+    FACT_CHECK_BASE_URL,
+    gemini_client.base_url,
+    openrouter_client.base_url,
+]
+
+async def prewarm_connection(url):
+    # Any response will do; the point is the pooled connection left behind
+    async with get_http_session().head(url, timeout=SOURCE_TIMEOUT, allow_redirects=False):
+        pass
+
+def mark_ready():
+    warmup_state["ready"] = True
+    warmup_state["ready_after"] = round(time.monotonic() - warmup_state["started_at"], 3)
+
+async def run_warmup_step(name, func):
+    start = time.perf_counter()
     try:
-        model = genai.GenerativeModel('gemini-1.5-flash')
-        prompt = f"Create a natural 2-4 word title for this query: '{text}'. Examples: 'Headache relief', 'Fever treatment', 'Back pain help'. Don't use 'Issues with'."
-        response = model.generate_content(prompt)
-        title = response.text.strip().strip('"').strip("'")
-        logging.info(f"Generated chat title: {title}")
-        return title
+        result = await func()
+        warmup_state["steps"][name] = round(time.perf_counter() - start, 3)
+        return result
     except Exception as e:
-        logging.error(f"Gemini title generation error: {str(e)}")
-        # Fallback to natural title generation
-        words = text.lower().strip().split()
-        if not words:
-            return "New Chat"
-        
-        # Common medical terms and their natural titles
-        medical_mappings = {
-            'headache': 'Headache relief',
-            'fever': 'Fever treatment', 
-            'cough': 'Cough remedy',
-            'pain': 'Pain management',
-            'nausea': 'Nausea help',
-            'diarrhea': 'Stomach issues',
-            'fatigue': 'Fatigue concerns',
-            'dizzy': 'Dizziness help'
-        }
-        
-        for word in words:
-            if word in medical_mappings:
-                return medical_mappings[word]
-        
-        # Generic fallback - take first 3 meaningful words
-        meaningful_words = [w for w in words if len(w) > 2 and w not in ['the', 'and', 'but', 'for', 'are', 'with', 'can', 'you', 'have']]
-        title = ' '.join(meaningful_words[:3])
-        return title.capitalize() if title else "New Chat"
+        warmup_state["errors"][name] = str(e)
+        logging.warning(f"Warm-up step {name} failed: {str(e)}")
+
+async def warm_up():
+    """Load vocabularies and heavy modules off the event loop, then optionally pre-warm connections and caches.
+
+    Readiness is reported once the local steps finish; connection and snapshot
+    pre-warming run afterwards and only affect latency.
+    """
+    # Sequential: importing numpy from two threads at once can fail half-initialized
+    steps = [("classifier", get_classifier), ("symptom_index", get_symptom_index), ("guidance", get_guidance_table),
+             ("imaging", load_imaging)]
+    if SEMANTIC_CACHE_ENABLED:
+        steps.append(("semantic_cache", get_semantic_cache))
+    for name, func in steps:
+        await run_warmup_step(name, lambda func=func: asyncio.to_thread(func))
+    optional = []
+    if CACHE_SNAPSHOT_PATH:
+        optional.append(run_warmup_step("cache_snapshot", lambda: response_cache.load_snapshot(CACHE_SNAPSHOT_PATH)))
+    if PREWARM_CONNECTIONS:
+        optional.extend(run_warmup_step(f"connect:{url}", lambda url=url: prewarm_connection(url)) for url in PREWARM_URLS)
+    mark_ready()
+    logging.info(f"Ready after {warmup_state['ready_after']}s: {warmup_state['steps']}")
+    if optional:
+        await asyncio.gather(*optional)
 
 @app.get("/")
 async def root():
@@ -442,13 +923,211 @@ async def root():
 async def head_root():
     return {"message": "VeriGuard Backend is running."}
 
+@app.get("/healthz")
+async def healthz():
+    """Liveness: the process is up and serving."""
+    return {"status": "ok"}
+
+@app.get("/readyz")
+async def readyz():
+    """Readiness: warm-up finished, so the first query won't pay for loading."""
+    body = {"ready": warmup_state["ready"], "ready_after": warmup_state["ready_after"],
+            "steps": warmup_state["steps"], "errors": warmup_state["errors"]}
+    if not warmup_state["ready"]:
+        return JSONResponse(body, status_code=503)
+    return body
+
+@app.get("/cache/stats")
+async def cache_stats():
+    # The SQLite backend counts its table for these, so they run in worker threads
+    responses, ocr, evidence = await asyncio.gather(
+        *(asyncio.to_thread(cache.stats) for cache in (response_cache, ocr_cache, pubmed_evidence.cache)))
+    return {"responses": responses, "ocr": ocr, "evidence": evidence,
+            "pubmed": pubmed_evidence.stats(), "semantic": semantic_stats(), "sessions": session_store.stats(),
+            "guidance": get_guidance_table().stats(), "ocr_jobs": ocr_jobs.stats()}
+
+@app.get("/admission")
+async def admission_stats():
+    """Slots in use, queue depth and how many requests were shed to the degraded path."""
+    return {**admission.stats(), "degraded": dict(degraded_counts)}
+
+@app.get("/upstreams")
+async def upstream_stats():
+    """Circuit state, current adaptive timeout and retry budget per provider."""
+    return {name: policy.stats() for name, policy in upstream_policies.items()}
+
+def semantic_stats():
+    """Semantic cache stats, with the hit rate it adds on top of exact-match lookups."""
+    exact_lookups = response_cache.hits + response_cache.misses
+    stats = semantic_cache.stats() if semantic_cache else {"entries": 0, "lookups": 0, "hits": 0}
+    stats["enabled"] = SEMANTIC_CACHE_ENABLED
+    stats["added_hit_rate"] = round(stats["hits"] / exact_lookups, 4) if exact_lookups else 0.0
+    return stats
+
+_route_paths = None
+
+def known_route_paths():
+    """Paths of the registered routes, used to label request metrics."""
+    global _route_paths
+    if _route_paths is None:
+        _route_paths = {route.path for route in app.routes}
+    return _route_paths
+
+def cache_metrics():
+    caches = (response_cache, ocr_cache, pubmed_evidence.cache)
+    semantic = semantic_stats()
+    return [
+        ("veriguard_cache_hits_total", "counter", [({"cache": c.name}, c.hits) for c in caches]),
+        ("veriguard_cache_misses_total", "counter", [({"cache": c.name}, c.misses) for c in caches]),
+        ("veriguard_semantic_cache_hits_total", "counter", [({}, semantic["hits"])]),
+        ("veriguard_semantic_cache_lookups_total", "counter", [({}, semantic["lookups"])]),
+        ("veriguard_semantic_cache_entries", "gauge", [({}, semantic["entries"])]),
+        ("veriguard_cache_coalesced_total", "counter", [({"cache": c.name}, c.coalesced) for c in caches]),
+        ("veriguard_extraction_memo_entries", "gauge", [({}, len(extraction_memo))]),
+        ("veriguard_circuit_open", "gauge", [({"upstream": name}, int(policy.breaker.state != "closed"))
+                                             for name, policy in upstream_policies.items()]),
+        ("veriguard_upstream_timeout_seconds", "gauge", [({"upstream": name}, round(policy.timeout(), 3))
+                                                         for name, policy in upstream_policies.items()]),
+        ("veriguard_admission_in_flight", "gauge", [({}, admission.in_flight)]),
+        ("veriguard_admission_queued", "gauge", [({}, admission.queued)]),
+        ("veriguard_degraded_responses_total", "counter", [({"source": source}, count)
+                                                           for source, count in degraded_counts.items()]),
+        ("veriguard_guidance_hits_total", "counter", [({}, guidance_table.hits if guidance_table else 0)]),
+        ("veriguard_ocr_jobs_queued", "gauge", [({}, ocr_jobs.queued)]),
+        ("veriguard_ocr_jobs_running", "gauge", [({}, ocr_jobs.running)]),
+        ("veriguard_ocr_jobs_rejected_total", "counter", [({}, ocr_jobs.rejected)]),
+        ("veriguard_sessions", "gauge", [({}, len(session_store))]),
+        ("veriguard_session_bytes", "gauge", [({}, session_store.bytes)]),
+        ("veriguard_session_evictions_total", "counter", [({}, session_store.evictions)]),
+        ("veriguard_llm_in_flight", "gauge", [({"provider": client.name}, client.in_flight)
+                                              for client in (gemini_client, openrouter_client)]),
+    ]
+
+registry.add_collector(cache_metrics)
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus text exposition of request, stage, upstream and cache metrics for this worker."""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+# Opt-in: samples the event loop thread's stack, so keep it off the public internet
+PROFILER_ENABLED = os.getenv("PROFILER_ENABLED", "false").lower() in ("1", "true", "yes")
+PROFILER_MAX_SECONDS = float(os.getenv("PROFILER_MAX_SECONDS", "30"))
+
+@app.get("/debug/profile")
+async def debug_profile(seconds: float = Query(10.0, gt=0), interval: float = Query(0.005, gt=0)):
+    """Sample the event loop thread and return collapsed stacks (feed to flamegraph.pl or speedscope)."""
+    if not PROFILER_ENABLED:
+        raise HTTPException(404, detail="Not Found")
+    loop_thread = threading.get_ident()
+    sampler = await asyncio.to_thread(sample_thread, loop_thread, min(seconds, PROFILER_MAX_SECONDS), interval)
+    return PlainTextResponse(sampler.collapsed(), headers={"X-Profile-Samples": str(sampler.total)})
+
+async def fetch_image(image_url):
+    try:
+        with time_upstream("image_download"):
+            status, image_data = await download_image(get_http_session(), image_url, MAX_IMAGE_BYTES, timeout=SOURCE_TIMEOUT)
+    except ImageTooLarge as e:
+        raise HTTPException(413, detail=str(e))
+    if status != 200:
+        raise HTTPException(400, detail="Failed to load image from URL")
+    return image_data
+
+async def read_image_upload(file):
+    try:
+        return await read_upload(file, MAX_IMAGE_BYTES)
+    except ImageTooLarge as e:
+        raise HTTPException(413, detail=str(e))
+
+def submit_ocr(file_data, image_url):
+    """Queue OCR of uploaded bytes or an image URL; raises the busy 503 when the queue is full."""
+    async def run():
+        image_data = file_data if file_data is not None else await fetch_image(image_url)
+        return {"text": await perform_ai_ocr(image_data)}
+
+    try:
+        return ocr_jobs.submit(run)
+    except QueueFull:
+        raise busy_error()
+
+async def extract_input_text(file, image_url, text):
+    """Return the query text from an upload (OCR), an image URL (OCR) or the text field."""
+    if not file and not image_url:
+        return text.strip() if text else ""
+    start = time.perf_counter()
+    job = submit_ocr(await read_image_upload(file) if file else None, image_url)
+    await job.wait()
+    if job.exception is not None:
+        raise job.exception
+    observe_stage("ocr", time.perf_counter() - start)
+    return job.result["text"]
+
+# Admission control: requests beyond these limits get the degraded response below instead of queueing
+admission = AdmissionController(
+    max_in_flight=int(os.getenv("ADMISSION_MAX_IN_FLIGHT", "64")),
+    max_queue=int(os.getenv("ADMISSION_MAX_QUEUE", "128")),
+    queue_timeout=float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "2")),
+    client_rate=float(os.getenv("CLIENT_RATE", "1")),
+    client_burst=float(os.getenv("CLIENT_BURST", "10")),
+)
+degraded_counts = Counter()
+BUSY_RETRY_AFTER = os.getenv("BUSY_RETRY_AFTER", "5")
+
+def client_key(request):
+    """Key for per-client limits, always the IP since chat_id is caller-chosen; uvicorn resolves
+    request.client from X-Forwarded-For for FORWARDED_ALLOW_IPS."""
+    return f"ip:{request.client.host}" if request.client else None
+
+async def degraded_response(text, cache_key, is_continuing_conversation):
+    """Answer without any upstream call: the cached or a paraphrase's response, else rule-based output."""
+    if cache_key:
+        cached = await response_cache.peek(cache_key)
+        source = "cache"
+        if cached is None:
+            cached = await semantic_lookup(text)
+            source = "semantic"
+        if cached is not None:
+            degraded_counts[source] += 1
+            return cached
+    degraded_counts["fallback"] += 1
+    classification = classify(text)
+    query = fallback_extract_query(normalize_query_text(text)) if classification.medical else None
+    pubmed = await pubmed_evidence.cached(query) if query else []
+    summary = "VeriGuard is handling a lot of requests right now, so this answer skips the AI analysis. "
+    if pubmed:
+        summary += f"The PubMed articles below are about {query}. "
+    summary += "Please try again in a minute, and contact a healthcare professional if your symptoms are severe."
+    return {
+        "summary": summary,
+        "sources": {"pubmed": pubmed, "fact_checks": []},
+        "chat_title": None if is_continuing_conversation else fallback_chat_title(text),
+        "degraded": True,
+    }
+
+def busy_error():
+    """For shed requests that can't be answered without an upstream call: OCR, and batches over their client's rate."""
+    return HTTPException(503, detail="Server is busy, please retry shortly", headers={"Retry-After": BUSY_RETRY_AFTER})
+
+def error_response(request_chat_id, is_continuing_conversation):
+    return {
+        "chat_id": request_chat_id,
+        "summary": f"Sorry, I'm unable to process your request right now. Please try again later.",
+        "sources": {
+            "pubmed": [],
+            "fact_checks": []
+        },
+        "chat_title": "Error Processing Request" if not is_continuing_conversation else None
+    }
+
 @app.post("/process")
 async def process_input(
+    request: Request,
     file: UploadFile = None, 
     image_url: str = Form(None), 
     text: str = Form(None),
     chat_id: str = Form(None),
-    conversation_context: str = Form(None)
+    conversation_context: str = Form(None),
+    first_message: str = Form(None)
 ):
     start_time = time.time()
     request_chat_id = chat_id or str(uuid.uuid4())
@@ -457,97 +1136,34 @@ async def process_input(
     logging.info(f"Starting /process request with chat_id: {request_chat_id}, text: {text}, continuing_conversation: {is_continuing_conversation}")
     
     try:
-        cache_key = None
-        if file:
-            extracted_text = perform_ai_ocr(file.file)
-        elif image_url:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(image_url, timeout=10) as response:
-                    if response.status != 200:
-                        raise HTTPException(400, detail="Failed to load image from URL")
-                    image = Image.open(io.BytesIO(await response.read()))
-                    extracted_text = perform_ai_ocr(image)
-        else:
-            extracted_text = text.strip() if text else ""
-            # Only use cache for new conversations, not continuing ones
-            if not is_continuing_conversation:
+        guidance = guidance_response(text) if text and not file and not image_url and not is_continuing_conversation else None
+        if guidance is not None:
+            record_turn(request_chat_id, text.strip(), guidance)
+            return {"chat_id": request_chat_id, **guidance}
+
+        async with admission.slot(client_key(request)) as ticket:
+            if ticket is None and (file or image_url):
+                raise busy_error()
+            extracted_text = await extract_input_text(file, image_url, text)
+            # Only use cache for typed text in new conversations, not continuing ones
+            cache_key = None
+            if not file and not image_url and not is_continuing_conversation and extracted_text:
                 cache_key = get_cache_key(extracted_text)
-                if cache_key in response_cache:
-                    logging.info(f"Cache hit for key: {cache_key}")
-                    cached = response_cache[cache_key]
-                    cached["chat_id"] = request_chat_id
-                    logging.info(f"Total request time: {time.time() - start_time:.2f} seconds")
-                    return cached
-
-        logging.info(f"Text extraction took {time.time() - start_time:.2f} seconds")
-        if not extracted_text:
-            raise HTTPException(400, detail="No text extracted or provided")
 
-        # For continuing conversations, provide context-aware responses
-        if is_continuing_conversation:
-            # Run tasks with conversation context
-            pubmed_task = search_pubmed(extracted_text)
-            fact_check_task = search_fact_check(extracted_text)
-            
-            # Use conversation-aware prompts
-            loop = asyncio.get_running_loop()
-            gemini_task = loop.run_in_executor(None, analyze_with_gemini_context, extracted_text)
-            title_task = loop.run_in_executor(None, lambda: None)  # Don't generate new title
-            
-            # Generate context-aware summary
-            summary_task = summarize_with_context(extracted_text, [], [], "Context-aware response")
-        else:
-            # Regular new conversation flow
-            pubmed_task = search_pubmed(extracted_text)
-            fact_check_task = search_fact_check(extracted_text)
-            
-            loop = asyncio.get_running_loop()
-            gemini_task = loop.run_in_executor(None, analyze_with_gemini, extracted_text)
-            title_task = loop.run_in_executor(None, generate_chat_title, extracted_text)
-        
-        # Wait for results
-        if is_continuing_conversation:
-            results = await asyncio.gather(
-                pubmed_task, fact_check_task, gemini_task, title_task, summary_task,
-                return_exceptions=True
-            )
-            summary = results[4] if not isinstance(results[4], Exception) else "Context-aware response unavailable"
-        else:
-            results = await asyncio.gather(
-                pubmed_task, fact_check_task, gemini_task, title_task,
-                return_exceptions=True
-            )
-            
-            pubmed_results = results[0] if not isinstance(results[0], Exception) else []
-            fact_checks = results[1] if not isinstance(results[1], Exception) else []
-            gemini_analysis = results[2] if not isinstance(results[2], Exception) else "Analysis unavailable"
-            chat_title = results[3] if not isinstance(results[3], Exception) else generate_chat_title(extracted_text)
-            
-            # Generate final summary
-            summary = await summarize_with_deepseek(extracted_text, pubmed_results, fact_checks, gemini_analysis)
-        
-        # Handle results for continuing conversation
-        if is_continuing_conversation:
-            pubmed_results = results[0] if not isinstance(results[0], Exception) else []
-            fact_checks = results[1] if not isinstance(results[1], Exception) else []
-            chat_title = None  # Don't return new title for continuing conversations
-        
-        if not summary or summary == "Summary unavailable":
-            summary = gemini_analysis if not is_continuing_conversation else "Unable to provide context-aware response."
-
-        response = {
-            "chat_id": request_chat_id,
-            "summary": summary,
-            "sources": {
-                "pubmed": pubmed_results,
-                "fact_checks": fact_checks
-            },
-            "chat_title": chat_title  # Will be None for continuing conversations
-        }
-
-        if cache_key and not is_continuing_conversation:
-            response_cache[cache_key] = response.copy()
-            logging.info(f"Cached response for key: {cache_key}")
+            logging.info(f"Text extraction took {time.time() - start_time:.2f} seconds")
+            if not extracted_text:
+                raise HTTPException(400, detail="No text extracted or provided")
+
+            session = await load_session(request_chat_id, first_message) if is_continuing_conversation else None
+            if ticket is None:
+                response = await degraded_response(extracted_text, cache_key, is_continuing_conversation)
+            elif cache_key:
+                response = await response_cache.get_or_compute(cache_key, lambda: analyze_or_reuse(extracted_text), is_cacheable)
+            else:
+                response = await analyze_text(extracted_text, is_continuing_conversation, session=session)
+        if not response.get("degraded"):
+            record_turn(request_chat_id, extracted_text, response, session)
+        response = {"chat_id": request_chat_id, **response}
 
         logging.info(f"Total request time: {time.time() - start_time:.2f} seconds")
         return response
@@ -557,12 +1173,289 @@ async def process_input(
         raise
     except Exception as e:
         logging.error(f"Error in /process: {str(e)}")
-        return {
-            "chat_id": request_chat_id,
-            "summary": f"Sorry, I'm unable to process your request right now. Please try again later.",
-            "sources": {
-                "pubmed": [],
-                "fact_checks": []
-            },
-            "chat_title": "Error Processing Request" if not is_continuing_conversation else None
-        }
\ No newline at end of file
+        return error_response(request_chat_id, is_continuing_conversation)
+
+# GET /verify: HTTP-cacheable answers for typed first messages
+VERIFY_MAX_AGE = int(os.getenv("VERIFY_MAX_AGE", "600"))
+VERIFY_STALE_WHILE_REVALIDATE = int(os.getenv("VERIFY_STALE_WHILE_REVALIDATE", "86400"))
+VERIFY_MAX_CHARS = int(os.getenv("VERIFY_MAX_CHARS", "1000"))
+
+def etag_matches(if_none_match, etag):
+    """Weak comparison of an If-None-Match header against an ETag, as RFC 9110 asks for GET."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+@app.get("/verify")
+async def verify(request: Request, q: str = Query(..., min_length=1, max_length=VERIFY_MAX_CHARS)):
+    """Idempotent /process for a typed first message, cacheable by browsers, CDNs and the service worker.
+
+    The body carries no chat_id, so identical queries get byte-identical
+    answers and a stable content-hash ETag; conditional requests get a 304.
+    Degraded answers and errors are marked no-store.
+    """
+    text = " ".join(q.split())
+    if not text:
+        raise HTTPException(400, detail="No text provided")
+    try:
+        response = guidance_response(text)
+        if response is None:
+            cache_key = get_cache_key(text)
+            async with admission.slot(client_key(request)) as ticket:
+                if ticket is None:
+                    response = await degraded_response(text, cache_key, False)
+                else:
+                    response = await response_cache.get_or_compute(cache_key, lambda: analyze_or_reuse(text), is_cacheable)
+    except Exception as e:
+        logging.error(f"Error in /verify: {str(e)}")
+        raise HTTPException(503, detail="Unable to verify right now", headers={"Cache-Control": "no-store"})
+
+    body = json.dumps(response, sort_keys=True, separators=(",", ":")).encode()
+    etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+    if response.get("degraded"):
+        cache_control = "no-store"
+    else:
+        cache_control = f"public, max-age={VERIFY_MAX_AGE}, stale-while-revalidate={VERIFY_STALE_WHILE_REVALIDATE}"
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
+
+@app.post("/ocr/jobs", status_code=202)
+async def submit_ocr_job(file: UploadFile = None, image_url: str = Form(None)):
+    """Queue OCR of an upload or image URL; poll GET /ocr/jobs/{job_id} for the text."""
+    if not file and not image_url:
+        raise HTTPException(400, detail="No file or image_url provided")
+    job = submit_ocr(await read_image_upload(file) if file else None, image_url)
+    return {**job.to_dict(), "poll": f"/ocr/jobs/{job.id}"}
+
+@app.get("/ocr/jobs/{job_id}")
+async def ocr_job_status(job_id: str, wait: float = Query(0, ge=0)):
+    """Status of an OCR job; with wait > 0, long-polls up to that many seconds for it to finish."""
+    job = ocr_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(404, detail="Unknown or expired job")
+    if wait and not job.finished:
+        await job.wait(min(wait, OCR_POLL_MAX_WAIT))
+    return job.to_dict()
+
+def sse_event(event, data):
+    """Format one server-sent event with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.post("/process/stream")
+async def process_input_stream(
+    request: Request,
+    file: UploadFile = None, 
+    image_url: str = Form(None), 
+    text: str = Form(None),
+    chat_id: str = Form(None),
+    conversation_context: str = Form(None),
+    first_message: str = Form(None)
+):
+    """Streaming /process: emits sources and title as they resolve, then summary tokens."""
+    start_time = time.time()
+    request_chat_id = chat_id or str(uuid.uuid4())
+    is_continuing_conversation = conversation_context == "true" and chat_id is not None
+
+    logging.info(f"Starting /process/stream request with chat_id: {request_chat_id}, text: {text}, continuing_conversation: {is_continuing_conversation}")
+
+    guidance = guidance_response(text) if text and not file and not image_url and not is_continuing_conversation else None
+    if guidance is not None:
+        record_turn(request_chat_id, text.strip(), guidance)
+
+        async def guidance_stream():
+            yield sse_event("meta", {"chat_id": request_chat_id})
+            for name in ("pubmed", "fact_checks"):
+                yield sse_event(name, guidance["sources"][name])
+            yield sse_event("title", guidance["chat_title"])
+            yield sse_event("done", {"chat_id": request_chat_id, **guidance})
+
+        return StreamingResponse(guidance_stream(), media_type="text/event-stream",
+                                 headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+    # The slot is held until produce() finishes, not just until the response starts
+    ticket = await admission.acquire(client_key(request))
+    try:
+        if ticket is None and (file or image_url):
+            raise busy_error()
+        extracted_text = await extract_input_text(file, image_url, text)
+        if not extracted_text:
+            raise HTTPException(400, detail="No text extracted or provided")
+    except BaseException:
+        if ticket is not None:
+            ticket.release()
+        raise
+    cache_key = None
+    if not file and not image_url and not is_continuing_conversation:
+        cache_key = get_cache_key(extracted_text)
+
+    session = await load_session(request_chat_id, first_message) if is_continuing_conversation else None
+    queue = asyncio.Queue()
+
+    async def on_complete(name, value):
+        if name in ("pubmed", "fact_checks", "title"):
+            queue.put_nowait(sse_event(name, value))
+
+    async def on_token(chunk):
+        queue.put_nowait(sse_event("token", {"text": chunk}))
+
+    async def produce():
+        try:
+            if ticket is None:
+                response = await degraded_response(extracted_text, cache_key, is_continuing_conversation)
+            else:
+                response = await response_cache.get(cache_key) if cache_key else None
+                if response is None and cache_key:
+                    response = await semantic_lookup(extracted_text)
+                    if response is not None:
+                        await response_cache.set(cache_key, response)
+            if response is not None:
+                for name in ("pubmed", "fact_checks"):
+                    queue.put_nowait(sse_event(name, response["sources"][name]))
+                queue.put_nowait(sse_event("title", response["chat_title"]))
+            else:
+                response = await analyze_text(extracted_text, is_continuing_conversation, on_complete, on_token, session)
+                if cache_key and is_cacheable(response):
+                    await response_cache.set(cache_key, response)
+                    remember_semantic(extracted_text)
+            if not response.get("degraded"):
+                record_turn(request_chat_id, extracted_text, response, session)
+            queue.put_nowait(sse_event("done", {"chat_id": request_chat_id, **response}))
+        except Exception as e:
+            logging.error(f"Error in /process/stream: {str(e)}")
+            queue.put_nowait(sse_event("done", error_response(request_chat_id, is_continuing_conversation)))
+        finally:
+            if ticket is not None:
+                ticket.release()
+            logging.info(f"Total stream time: {time.time() - start_time:.2f} seconds")
+            queue.put_nowait(None)
+
+    async def event_stream():
+        task = asyncio.ensure_future(produce())
+        try:
+            yield sse_event("meta", {"chat_id": request_chat_id})
+            while (event := await queue.get()) is not None:
+                yield event
+        finally:
+            # Stop upstream work if the client went away mid-stream
+            task.cancel()
+            if ticket is not None:
+                ticket.release()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+# Bulk verification
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "1000"))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))
+
+class BatchRequest(BaseModel):
+    texts: list[str]
+
+async def run_batch(texts):
+    """Yield (index, item) for each text as its result becomes available.
+
+    Texts are deduplicated on their cache key and answered from the response
+    cache where possible. Symptom extraction for the rest is packed into a few
+    Gemini prompts, PubMed esummary lookups from concurrent pipelines are merged
+    by the evidence layer, and at most BATCH_CONCURRENCY pipelines run at once.
+    Each pipeline and extraction prompt takes an admission slot like any other
+    request; items shed by admission get the degraded response.
+    """
+    groups = OrderedDict()
+    for index, text in enumerate(texts):
+        text = text.strip()
+        if not text:
+            yield index, {"index": index, "error": "No text provided"}
+            continue
+        groups.setdefault(get_cache_key(text), (text, []))[1].append(index)
+
+    for key, (text, indices) in list(groups.items()):
+        guidance = guidance_response(text)
+        if guidance is not None:
+            del groups[key]
+            for index in indices:
+                yield index, {"index": index, **guidance}
+
+    keys = list(groups)
+    cached = await asyncio.gather(*(response_cache.get(key) for key in keys))
+    uncached = []
+    for key, response in zip(keys, cached):
+        text, indices = groups[key]
+        if response is None:
+            uncached.append(key)
+            continue
+        for index in indices:
+            yield index, {"index": index, "cached": True, **response}
+
+    prefetch_extractions(groups[key][0] for key in uncached)
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+    async def run_one(key):
+        text = groups[key][0]
+        async with semaphore:
+            try:
+                async with admission.slot() as ticket:
+                    if ticket is None:
+                        return key, await degraded_response(text, key, False), None
+                    return key, await response_cache.get_or_compute(key, lambda: analyze_or_reuse(text), is_cacheable), None
+            except Exception as e:
+                logging.error(f"Batch item failed: {str(e)}")
+                return key, None, str(e)
+
+    tasks = [asyncio.ensure_future(run_one(key)) for key in uncached]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            key, response, error = await next_done
+            for index in groups[key][1]:
+                if error is not None:
+                    yield index, {"index": index, "error": error}
+                else:
+                    yield index, {"index": index, "cached": False, **response}
+    finally:
+        # Stop remaining work if the client disconnected mid-batch
+        for task in tasks:
+            task.cancel()
+
+def check_batch(request, batch):
+    """Reject oversized batches, and count a batch as one request against its client's rate."""
+    if len(batch.texts) > BATCH_MAX_ITEMS:
+        raise HTTPException(413, detail=f"Batch has {len(batch.texts)} items, limit is {BATCH_MAX_ITEMS}")
+    if not admission.check_client(client_key(request)):
+        raise busy_error()
+
+@app.post("/process/batch")
+async def process_batch(request: Request, batch: BatchRequest):
+    """Verify many texts at once; results are returned in input order."""
+    check_batch(request, batch)
+    start_time = time.time()
+    results = [None] * len(batch.texts)
+    async for index, item in run_batch(batch.texts):
+        results[index] = item
+    logging.info(f"Batch of {len(results)} items took {time.time() - start_time:.2f} seconds")
+    return {
+        "results": results,
+        "stats": {
+            "items": len(results),
+            "cached": sum(1 for item in results if item.get("cached")),
+            "errors": sum(1 for item in results if "error" in item),
+            "degraded": sum(1 for item in results if item.get("degraded")),
+        },
+    }
+
+@app.post("/process/batch/stream")
+async def process_batch_stream(request: Request, batch: BatchRequest):
+    """Verify many texts at once, streaming one JSON line per item as it completes."""
+    check_batch(request, batch)
+
+    async def lines():
+        async for _, item in run_batch(batch.texts):
+            yield json.dumps(item) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson", headers={"X-Accel-Buffering": "no"})
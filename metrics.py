@@ -0,0 +1,221 @@
+import asyncio
+import bisect
+import contextvars
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# Timings recorded while handling the current request, for its Server-Timing header
+_request_timings = contextvars.ContextVar("request_timings", default=None)
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    pairs = ",".join(f'{key}="{_escape(value)}"' for key, value in labels)
+    return "{" + pairs + "}"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Summary:
+    """Latency quantiles over a sliding window of recent observations, plus running sum and count.
+
+    A sorted copy of the window keeps quantile reads cheap; the deque keeps
+    insertion order so the oldest sample can be found and dropped.
+    """
+
+    def __init__(self, window=1024):
+        self.window = window
+        self._recent = deque()
+        self._sorted = []
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.total += value
+        self._recent.append(value)
+        bisect.insort(self._sorted, value)
+        if len(self._recent) > self.window:
+            oldest = self._recent.popleft()
+            del self._sorted[bisect.bisect_left(self._sorted, oldest)]
+
+    def quantile(self, q):
+        if not self._sorted:
+            return 0.0
+        return self._sorted[min(len(self._sorted) - 1, int(q * len(self._sorted)))]
+
+
+class MetricsRegistry:
+    """In-process counters and latency summaries rendered in Prometheus text format.
+
+    Each worker process keeps its own registry; scrape every worker (or run a
+    single worker) for complete numbers.
+    """
+
+    def __init__(self, window=1024):
+        self.window = window
+        self._lock = threading.Lock()
+        self._summaries = {}
+        self._counters = {}
+        self._help = {}
+        self._collectors = []
+
+    def describe(self, name, help_text):
+        self._help[name] = help_text
+
+    def observe(self, name, seconds, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            summary = self._summaries.get(key)
+            if summary is None:
+                summary = self._summaries[key] = Summary(self.window)
+            summary.observe(seconds)
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def add_collector(self, collector):
+        """Register a callable returning [(name, type, [(labels dict, value)])], read at scrape time."""
+        self._collectors.append(collector)
+
+    def render(self):
+        lines = []
+        seen = set()
+
+        def header(name, kind):
+            if name in seen:
+                return
+            seen.add(name)
+            if name in self._help:
+                lines.append(f"# HELP {name} {self._help[name]}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        with self._lock:
+            for (name, labels), summary in sorted(self._summaries.items()):
+                header(name, "summary")
+                for q in QUANTILES:
+                    lines.append(f"{name}{_format_labels(labels + (('quantile', q),))} {summary.quantile(q):.6f}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {summary.total:.6f}")
+                lines.append(f"{name}_count{_format_labels(labels)} {summary.count}")
+            for (name, labels), value in sorted(self._counters.items()):
+                header(name, "counter")
+                lines.append(f"{name}{_format_labels(labels)} {value}")
+        for collector in self._collectors:
+            for name, kind, samples in collector():
+                header(name, kind)
+                for labels, value in samples:
+                    lines.append(f"{name}{_format_labels(tuple(sorted(labels.items())))} {value}")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry(window=int(os.getenv("METRICS_WINDOW", "1024")))
+registry.describe("veriguard_request_seconds", "End-to-end request latency by route.")
+registry.describe("veriguard_stage_seconds", "Pipeline stage latency, including OCR.")
+registry.describe("veriguard_upstream_seconds", "Latency of calls to external services.")
+registry.describe("veriguard_stage_status_total", "Pipeline stage outcomes (ok, timeout, error).")
+registry.describe("veriguard_upstream_errors_total", "Failed calls to external services.")
+registry.describe("veriguard_requests_total", "Requests by route, method and status code.")
+registry.describe("veriguard_batch_size", "Keys per merged upstream call.")
+registry.describe("veriguard_upstream_policy_events_total", "Retries, hedges, timeouts and short circuits per upstream.")
+registry.describe("veriguard_event_loop_lag_seconds", "How late the event loop woke a periodic timer.")
+
+
+def record_timing(name, seconds, desc=None):
+    """Add an entry to the current request's Server-Timing header, if one is being collected."""
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.append((name, seconds, desc))
+
+
+def observe_stage(stage, seconds, status="ok"):
+    registry.observe("veriguard_stage_seconds", seconds, stage=stage)
+    registry.inc("veriguard_stage_status_total", stage=stage, status=status)
+    record_timing(stage, seconds)
+
+
+@contextmanager
+def time_upstream(upstream):
+    """Time one call to an external service; errors are counted and re-raised."""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        registry.inc("veriguard_upstream_errors_total", upstream=upstream)
+        raise
+    finally:
+        seconds = time.perf_counter() - start
+        registry.observe("veriguard_upstream_seconds", seconds, upstream=upstream)
+        record_timing(f"upstream-{upstream}", seconds)
+
+
+async def watch_event_loop_lag(interval=0.1):
+    """Sample event-loop lag: how much later than asked a sleep(interval) wakes up."""
+    while True:
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        registry.observe("veriguard_event_loop_lag_seconds", max(0.0, time.perf_counter() - start - interval))
+
+
+def server_timing_header(timings):
+    entries = []
+    for name, seconds, desc in timings:
+        entry = f"{name};dur={seconds * 1000:.1f}"
+        if desc:
+            entry += f';desc="{desc}"'
+        entries.append(entry)
+    return ", ".join(entries)
+
+
+class MetricsMiddleware:
+    """ASGI middleware timing every request and attaching a Server-Timing header.
+
+    Streaming responses send headers first, so their Server-Timing only covers
+    work done before the first byte (input extraction and OCR).
+    """
+
+    def __init__(self, app, route_paths=None):
+        self.app = app
+        # Unmatched paths share one label so scanners can't blow up cardinality
+        self.route_paths = route_paths
+
+    def _route_label(self, scope):
+        paths = self.route_paths() if callable(self.route_paths) else self.route_paths
+        path = scope.get("path", "")
+        return path if paths is None or path in paths else "other"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        timings = []
+        token = _request_timings.set(timings)
+        start = time.perf_counter()
+        status = {"code": 500}
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                entries = timings + [("total", time.perf_counter() - start, None)]
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", server_timing_header(entries).encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _request_timings.reset(token)
+            route = self._route_label(scope)
+            registry.observe("veriguard_request_seconds", time.perf_counter() - start,
+                             route=route, method=scope.get("method", ""))
+            registry.inc("veriguard_requests_total", route=route, method=scope.get("method", ""),
+                         status=str(status["code"]))
@@ -0,0 +1,156 @@
+import asyncio
+import logging
+import time
+import uuid
+from collections import OrderedDict
+
+from metrics import registry
+
+registry.describe("veriguard_ocr_job_wait_seconds", "Time OCR jobs spent queued before a worker picked them up.")
+
+
+class QueueFull(Exception):
+    """Raised by JobQueue.submit when max_queued jobs are already waiting."""
+
+
+class Job:
+    """One queued call; result is the dict the call returned, error a message if it raised."""
+
+    __slots__ = ("id", "status", "result", "error", "exception", "created_at", "finished_at", "_func", "_done")
+
+    def __init__(self, func):
+        self.id = uuid.uuid4().hex
+        self.status = "queued"
+        self.result = None
+        self.error = None
+        self.exception = None
+        self.created_at = time.time()
+        self.finished_at = None
+        self._func = func
+        self._done = asyncio.Event()
+
+    @property
+    def finished(self):
+        return self._done.is_set()
+
+    async def wait(self, timeout=None):
+        """Wait until the job has finished, or timeout seconds; returns whether it finished."""
+        try:
+            await asyncio.wait_for(self._done.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        return self.finished
+
+    def to_dict(self):
+        body = {"job_id": self.id, "status": self.status}
+        if self.result is not None:
+            body.update(self.result)
+        if self.error is not None:
+            body["error"] = self.error
+        return body
+
+
+class JobQueue:
+    """Bounded FIFO of async jobs run by a fixed number of worker tasks.
+
+    At most workers jobs run at once and at most max_queued wait; submit
+    raises QueueFull beyond that so callers can push back instead of piling
+    up work. Finished jobs stay pollable for result_ttl seconds (and at most
+    max_jobs are remembered). Workers start on the first submit.
+    """
+
+    def __init__(self, workers=2, max_queued=32, result_ttl=600, max_jobs=1000):
+        self.workers = workers
+        self.max_queued = max_queued
+        self.result_ttl = result_ttl
+        self.max_jobs = max_jobs
+        self._queue = None
+        self._tasks = []
+        self._jobs = OrderedDict()
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+
+    @property
+    def queued(self):
+        return self._queue.qsize() if self._queue else 0
+
+    def _start(self):
+        if self._queue is None:
+            self._queue = asyncio.Queue(self.max_queued)
+        if not self._tasks:
+            self._tasks = [asyncio.ensure_future(self._work()) for _ in range(self.workers)]
+
+    def _prune(self):
+        cutoff = time.time() - self.result_ttl
+        # Oldest first; stop at the first job still running or not yet expired
+        while self._jobs:
+            job = next(iter(self._jobs.values()))
+            expired = job.finished and job.finished_at < cutoff
+            if not expired and len(self._jobs) <= self.max_jobs:
+                break
+            if not job.finished:
+                break
+            self._jobs.popitem(last=False)
+
+    def submit(self, func):
+        """Queue await func() and return its Job; raises QueueFull when the queue is at capacity."""
+        self._start()
+        self._prune()
+        job = Job(func)
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise QueueFull(f"{self.max_queued} jobs already queued")
+        self._jobs[job.id] = job
+        return job
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    async def _work(self):
+        while True:
+            job = await self._queue.get()
+            registry.observe("veriguard_ocr_job_wait_seconds", time.time() - job.created_at)
+            job.status = "running"
+            self.running += 1
+            try:
+                job.result = await job._func()
+                job.status = "done"
+                self.completed += 1
+            except asyncio.CancelledError:
+                job.status = "failed"
+                job.error = "cancelled"
+                raise
+            except Exception as e:
+                logging.error(f"Job {job.id} failed: {str(e)}")
+                job.status = "failed"
+                job.error = str(getattr(e, "detail", e))
+                job.exception = e
+                self.failed += 1
+            finally:
+                self.running -= 1
+                job.finished_at = time.time()
+                job._func = None
+                job._done.set()
+                self._queue.task_done()
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def stats(self):
+        return {
+            "workers": self.workers,
+            "running": self.running,
+            "queued": self.queued,
+            "max_queued": self.max_queued,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "tracked": len(self._jobs),
+        }
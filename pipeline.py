@@ -0,0 +1,90 @@
+import asyncio
+import logging
+import time
+
+
+class Stage:
+    """One node of the /process pipeline.
+
+    func is a coroutine function called with the results of its dependencies
+    as keyword arguments. If it raises or runs past timeout seconds, the stage
+    resolves to fallback instead (called with the same arguments if callable),
+    so downstream stages are never blocked by a failed dependency.
+    """
+
+    def __init__(self, name, func, deps=(), timeout=None, fallback=None):
+        self.name = name
+        self.func = func
+        self.deps = tuple(deps)
+        self.timeout = timeout
+        self.fallback = fallback
+
+    def resolve_fallback(self, kwargs):
+        return self.fallback(**kwargs) if callable(self.fallback) else self.fallback
+
+
+class PipelineResult:
+    def __init__(self, results, timings, statuses):
+        self.results = results
+        self.timings = timings
+        self.statuses = statuses
+
+    def __getitem__(self, name):
+        return self.results[name]
+
+    def degraded(self):
+        return [name for name, status in self.statuses.items() if status != "ok"]
+
+
+async def run_pipeline(stages, inputs=None, on_complete=None):
+    """Run stages as a DAG, starting each one as soon as all of its dependencies resolve.
+
+    stages are given in topological order. inputs are pre-resolved values stages
+    may depend on by name. on_complete, if given, is awaited with (name, value)
+    as each stage finishes.
+    """
+    loop = asyncio.get_running_loop()
+    futures = {}
+    for name, value in (inputs or {}).items():
+        futures[name] = loop.create_future()
+        futures[name].set_result(value)
+    # Stages must be listed after their dependencies, which also rules out cycles
+    for stage in stages:
+        if stage.name in futures:
+            raise ValueError(f"Duplicate pipeline stage: {stage.name}")
+        missing = [dep for dep in stage.deps if dep not in futures]
+        if missing:
+            raise ValueError(f"Stage {stage.name} depends on undeclared stages: {missing}")
+        futures[stage.name] = loop.create_future()
+
+    timings = {}
+    statuses = {}
+
+    async def run_stage(stage):
+        kwargs = {dep: await futures[dep] for dep in stage.deps}
+        start = time.perf_counter()
+        try:
+            value = await asyncio.wait_for(stage.func(**kwargs), stage.timeout)
+            statuses[stage.name] = "ok"
+        except asyncio.TimeoutError:
+            logging.warning(f"Stage {stage.name} exceeded {stage.timeout}s deadline, using fallback")
+            value = stage.resolve_fallback(kwargs)
+            statuses[stage.name] = "timeout"
+        except Exception as e:
+            logging.error(f"Stage {stage.name} failed: {str(e)}")
+            value = stage.resolve_fallback(kwargs)
+            statuses[stage.name] = "error"
+        timings[stage.name] = time.perf_counter() - start
+        futures[stage.name].set_result(value)
+        if on_complete:
+            await on_complete(stage.name, value)
+
+    tasks = [asyncio.ensure_future(run_stage(stage)) for stage in stages]
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    results = {stage.name: futures[stage.name].result() for stage in stages}
+    return PipelineResult(results, timings, statuses)
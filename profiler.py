@@ -0,0 +1,48 @@
+import sys
+import threading
+import time
+from collections import Counter
+
+
+class StackSampler:
+    """Sampling profiler for one thread, producing collapsed stacks for flame graphs.
+
+    A background thread reads the target thread's current frame every interval
+    seconds, so overhead is bounded by the sampling rate rather than by how much
+    Python code runs. Point it at the event loop thread to see what blocks it.
+    """
+
+    def __init__(self, thread_id, interval=0.005, max_depth=64):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.max_depth = max_depth
+        self.samples = Counter()
+        self.total = 0
+
+    def _stack(self, frame):
+        stack = []
+        while frame is not None and len(stack) < self.max_depth:
+            code = frame.f_code
+            stack.append(f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{frame.f_lineno})")
+            frame = frame.f_back
+        return ";".join(reversed(stack))
+
+    def run(self, seconds):
+        """Sample for the given duration; blocking, so call it from a worker thread."""
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.samples[self._stack(frame)] += 1
+                self.total += 1
+            time.sleep(self.interval)
+        return self
+
+    def collapsed(self):
+        """Brendan Gregg's collapsed format: one 'frame;frame;frame count' line per stack."""
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+
+def sample_thread(thread_id=None, seconds=10.0, interval=0.005):
+    thread_id = thread_id or threading.main_thread().ident
+    return StackSampler(thread_id, interval=interval).run(seconds)
@@ -0,0 +1,54 @@
+import asyncio
+import time
+
+
+class TokenBucket:
+    """Async token bucket: sustained rate tokens per second with bursts up to burst.
+
+    Callers queue on a lock and sleep until their token is due, so requests
+    are spread out instead of being rejected. One bucket is shared by every
+    request in the process; across N workers give each rate / N.
+    """
+
+    def __init__(self, rate, burst=1):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+        self.waited = 0.0
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self):
+        """Wait until a token is available and take it; returns the seconds spent waiting."""
+        async with self._lock:
+            self._refill()
+            wait = 0.0
+            if self._tokens < 1:
+                wait = (1 - self._tokens) / self.rate
+                await asyncio.sleep(wait)
+                self._refill()
+            self._tokens -= 1
+            self.waited += wait
+            return wait
+
+    def try_acquire(self):
+        """Take a token if one is available right now, without waiting."""
+        self._refill()
+        if self._tokens < 1:
+            return False
+        self._tokens -= 1
+        return True
+
+    def penalize(self, seconds):
+        """Drain the bucket for seconds after the upstream signalled throttling (e.g. Retry-After)."""
+        self._tokens = min(self._tokens, -seconds * self.rate)
+
+    def stats(self):
+        self._refill()
+        return {"rate": self.rate, "burst": self.burst, "tokens": round(self._tokens, 2),
+                "waited_seconds": round(self.waited, 3)}
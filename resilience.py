@@ -0,0 +1,278 @@
+import asyncio
+import logging
+import time
+from collections import deque
+
+import aiohttp
+
+from metrics import registry
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a provider whose circuit is open."""
+
+
+def is_retryable(error):
+    """Transient failures worth another attempt: timeouts, dropped connections, 429 and 5xx."""
+    if isinstance(error, aiohttp.ClientResponseError):
+        return error.status == 429 or error.status >= 500
+    return isinstance(error, (asyncio.TimeoutError, aiohttp.ClientConnectionError))
+
+
+def is_failure(error):
+    """Errors that say the provider is unhealthy; 4xx other than 429 are our fault, not theirs."""
+    if isinstance(error, aiohttp.ClientResponseError):
+        return error.status == 429 or error.status >= 500
+    return True
+
+
+class LatencyWindow:
+    """Recent call latencies, for percentile-based timeouts and hedge delays."""
+
+    def __init__(self, size=200):
+        self._samples = deque(maxlen=size)
+
+    def __len__(self):
+        return len(self._samples)
+
+    def add(self, seconds):
+        self._samples.append(seconds)
+
+    def percentile(self, q):
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class CircuitBreaker:
+    """Closed -> open after too many failures in the recent window -> half-open probe after cooldown.
+
+    While open, calls fail immediately so callers drop to their fallbacks
+    instead of waiting out a timeout against an upstream that is down.
+    """
+
+    def __init__(self, window=20, min_calls=10, failure_ratio=0.5, cooldown=30.0):
+        self.window = window
+        self.min_calls = min_calls
+        self.failure_ratio = failure_ratio
+        self.cooldown = cooldown
+        self._outcomes = deque(maxlen=window)
+        self.state = "closed"
+        self._opened_at = 0.0
+        self._probing = False
+
+    def allow(self):
+        if self.state == "open":
+            if time.monotonic() - self._opened_at < self.cooldown:
+                return False
+            self.state = "half_open"
+        if self.state == "half_open":
+            # One probe at a time decides whether to close again
+            if self._probing:
+                return False
+            self._probing = True
+        return True
+
+    def record(self, success):
+        if self.state == "half_open":
+            self._probing = False
+            if success:
+                self.state = "closed"
+                self._outcomes.clear()
+            else:
+                self._open()
+            return
+        self._outcomes.append(success)
+        failures = self._outcomes.count(False)
+        if len(self._outcomes) >= self.min_calls and failures / len(self._outcomes) >= self.failure_ratio:
+            self._open()
+
+    def release(self):
+        """Give up a half-open probe slot without an outcome (the call was cancelled)."""
+        self._probing = False
+
+    def _open(self):
+        self.state = "open"
+        self._opened_at = time.monotonic()
+        self._outcomes.clear()
+
+
+class RetryBudget:
+    """Retries (and hedges) may add at most ratio extra calls per first attempt.
+
+    Each first attempt deposits ratio tokens, each retry withdraws one, so when
+    a provider fails wholesale the extra load is capped at ratio instead of
+    multiplying with every caller's retry loop.
+    """
+
+    def __init__(self, ratio=0.1, max_tokens=10.0):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self._tokens = max_tokens
+
+    @property
+    def tokens(self):
+        return self._tokens
+
+    def deposit(self):
+        self._tokens = min(self.max_tokens, self._tokens + self.ratio)
+
+    def withdraw(self):
+        if self._tokens < 1:
+            return False
+        self._tokens -= 1
+        return True
+
+
+class UpstreamPolicy:
+    """Circuit breaker, adaptive timeout, retry budget and optional hedging for one provider.
+
+    The timeout is multiplier x observed p99 (clamped to [min_timeout,
+    max_timeout]) once min_samples calls have completed, and max_timeout until
+    then. A hedged call starts a duplicate when the first attempt has run past
+    the observed p95 and returns whichever finishes first. A slot (say a
+    semaphore or rate-limit token) is acquired before each attempt's clock
+    starts, so local queueing never counts as upstream latency or failure.
+    """
+
+    def __init__(self, name, max_timeout, min_timeout=1.0, multiplier=2.0, min_samples=20,
+                 max_attempts=2, retry_ratio=0.1, breaker=None):
+        self.name = name
+        self.max_timeout = max_timeout
+        self.min_timeout = min_timeout
+        self.multiplier = multiplier
+        self.min_samples = min_samples
+        self.max_attempts = max_attempts
+        self.latencies = LatencyWindow()
+        self.breaker = breaker or CircuitBreaker()
+        self.budget = RetryBudget(retry_ratio)
+
+    def timeout(self):
+        if len(self.latencies) < self.min_samples:
+            return self.max_timeout
+        adaptive = self.latencies.percentile(0.99) * self.multiplier
+        return min(self.max_timeout, max(self.min_timeout, adaptive))
+
+    def hedge_delay(self):
+        if len(self.latencies) < self.min_samples:
+            return None
+        return max(0.05, self.latencies.percentile(0.95))
+
+    def _event(self, event):
+        registry.inc("veriguard_upstream_policy_events_total", upstream=self.name, event=event)
+
+    async def _attempt(self, func, timeout, slot=None):
+        if slot is not None:
+            async with slot():
+                return await self._attempt(func, timeout)
+        start = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(func(), timeout)
+        except asyncio.TimeoutError:
+            # Censored sample: the call took at least this long
+            self.latencies.add(timeout)
+            self._event("timeout")
+            raise
+        self.latencies.add(time.perf_counter() - start)
+        return result
+
+    async def _hedged(self, func, timeout, slot=None):
+        delay = self.hedge_delay()
+        first = asyncio.ensure_future(self._attempt(func, timeout, slot))
+        if delay is None or delay >= timeout:
+            return await first
+        try:
+            done, _ = await asyncio.wait({first}, timeout=delay)
+        except asyncio.CancelledError:
+            first.cancel()
+            raise
+        if done or not self.budget.withdraw():
+            return await first
+        self._event("hedge")
+        second = asyncio.ensure_future(self._attempt(func, timeout, slot))
+        pending = {first, second}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is second:
+                            self._event("hedge_win")
+                        return task.result()
+            # Both failed: surface the original attempt's error
+            return first.result()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def call(self, func, hedge=False, slot=None):
+        """Await func() under this policy; raises CircuitOpenError when the circuit is open.
+
+        slot, if given, returns an async context manager entered around each
+        attempt outside its timeout.
+        """
+        if not self.breaker.allow():
+            self._event("short_circuit")
+            raise CircuitOpenError(f"{self.name} circuit open")
+        self.budget.deposit()
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                timeout = self.timeout()
+                result = await (self._hedged(func, timeout, slot) if hedge else self._attempt(func, timeout, slot))
+            except asyncio.CancelledError:
+                self.breaker.release()
+                raise
+            except Exception as e:
+                failure = is_failure(e)
+                if failure and attempt < self.max_attempts and is_retryable(e) and self.budget.withdraw():
+                    self._event("retry")
+                    logging.warning(f"{self.name} call failed ({type(e).__name__}: {e}), retrying")
+                    continue
+                self.breaker.record(not failure)
+                raise
+            self.breaker.record(True)
+            return result
+
+    async def stream(self, factory):
+        """Iterate the async generator factory() under the breaker, with the timeout applied to its first item.
+
+        Streams are never retried or hedged: chunks may already have reached the client.
+        """
+        if not self.breaker.allow():
+            self._event("short_circuit")
+            raise CircuitOpenError(f"{self.name} circuit open")
+        agen = factory()
+        outcome = None
+        try:
+            try:
+                first = await asyncio.wait_for(agen.__anext__(), self.timeout())
+            except StopAsyncIteration:
+                outcome = True
+                return
+            except asyncio.TimeoutError:
+                self._event("timeout")
+                raise
+            yield first
+            async for item in agen:
+                yield item
+            outcome = True
+        except Exception as e:
+            outcome = not is_failure(e)
+            raise
+        finally:
+            if outcome is None:
+                # Cancelled or abandoned by the consumer: no verdict on the provider
+                self.breaker.release()
+            else:
+                self.breaker.record(outcome)
+            await agen.aclose()
+
+    def stats(self):
+        return {
+            "state": self.breaker.state,
+            "timeout": round(self.timeout(), 3),
+            "hedge_delay": self.hedge_delay(),
+            "samples": len(self.latencies),
+            "retry_tokens": round(self.budget.tokens, 2),
+        }
@@ -0,0 +1,171 @@
+import math
+import re
+import time
+import zlib
+
+import numpy as np
+
+_NON_WORD = re.compile(r"[^\w\s]")
+
+
+def normalize(text):
+    return " ".join(_NON_WORD.sub(" ", text.lower()).split())
+
+
+class HashedNgramVectorizer:
+    """Hashed character n-gram and word counts, so no vocabulary or model has to be shipped.
+
+    Character n-grams are taken inside padded words, which makes "headache" and
+    "headaches" or "i've" and "ive" land close together. crc32 keeps bucket
+    assignment stable across processes and restarts.
+    """
+
+    def __init__(self, dim=2048, ngram_range=(3, 5)):
+        self.dim = dim
+        self.ngram_range = ngram_range
+
+    def features(self, text):
+        grams = []
+        for word in normalize(text).split():
+            grams.append("w:" + word)
+            padded = f" {word} "
+            for n in range(self.ngram_range[0], self.ngram_range[1] + 1):
+                grams.extend(padded[i:i + n] for i in range(len(padded) - n + 1))
+        return grams
+
+    def transform(self, text):
+        """Sublinear term frequencies (1 + log tf) over hashed buckets."""
+        counts = {}
+        for gram in self.features(text):
+            bucket = zlib.crc32(gram.encode()) % self.dim
+            counts[bucket] = counts.get(bucket, 0) + 1
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for bucket, count in counts.items():
+            vector[bucket] = 1.0 + math.log(count)
+        return vector
+
+
+class SemanticCache:
+    """Second-tier cache index: paraphrased queries reuse the response of a cached neighbour.
+
+    Stores TF-IDF vectors of recently computed queries in a fixed-size matrix
+    and answers a lookup with the response-cache key of the most similar query
+    above threshold (cosine). Document frequencies are updated online and the
+    weighted matrix is re-fit every refit_every inserts. A neighbour must also
+    carry the same signature (the caller passes the matched medical terms), so
+    "headache" never answers "heartache" however close the spelling. When full,
+    the least recently used entry is evicted. Responses themselves stay in the
+    response cache; entries whose response has expired are dropped on lookup.
+    """
+
+    def __init__(self, capacity=1024, dim=2048, threshold=0.6, refit_every=128, candidates=5):
+        self.vectorizer = HashedNgramVectorizer(dim)
+        self.capacity = capacity
+        self.threshold = threshold
+        self.refit_every = refit_every
+        self.candidates = candidates
+        self._tf = np.zeros((capacity, dim), dtype=np.float32)
+        self._weighted = np.zeros((capacity, dim), dtype=np.float32)
+        self._df = np.zeros(dim, dtype=np.float32)
+        self._idf = np.ones(dim, dtype=np.float32)
+        self._last_used = np.zeros(capacity, dtype=np.float64)
+        self._keys = [None] * capacity
+        self._signatures = [None] * capacity
+        self._rows = {}
+        self._free = list(range(capacity - 1, -1, -1))
+        self._since_refit = 0
+        self.lookups = 0
+        self.hits = 0
+        self.similarity_sum = 0.0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._rows)
+
+    def _refit(self):
+        n = len(self._rows)
+        self._idf = (np.log((1.0 + n) / (1.0 + self._df)) + 1.0).astype(np.float32)
+        np.multiply(self._tf, self._idf, out=self._weighted)
+        norms = np.linalg.norm(self._weighted, axis=1, keepdims=True)
+        np.divide(self._weighted, norms, out=self._weighted, where=norms > 0)
+        self._since_refit = 0
+
+    def _weigh(self, tf):
+        weighted = tf * self._idf
+        norm = np.linalg.norm(weighted)
+        return weighted / norm if norm > 0 else weighted
+
+    def _remove_row(self, row):
+        self._df -= self._tf[row] > 0
+        self._tf[row] = 0
+        self._weighted[row] = 0
+        self._last_used[row] = 0
+        del self._rows[self._keys[row]]
+        self._keys[row] = None
+        self._signatures[row] = None
+        self._free.append(row)
+
+    def add(self, text, key, signature=None):
+        """Index text as a query whose response is stored under key."""
+        if key in self._rows:
+            self._last_used[self._rows[key]] = time.monotonic()
+            return
+        if not self._free:
+            # _last_used is 0 only for free rows, and there are none here
+            self._remove_row(int(np.argmin(self._last_used)))
+            self.evictions += 1
+        row = self._free.pop()
+        tf = self.vectorizer.transform(text)
+        self._tf[row] = tf
+        self._df += tf > 0
+        self._keys[row] = key
+        self._signatures[row] = signature
+        self._rows[key] = row
+        self._last_used[row] = time.monotonic()
+        self._since_refit += 1
+        if self._since_refit >= self.refit_every or len(self._rows) <= self.refit_every:
+            # Refit on every insert while small, when idf is still moving quickly
+            self._refit()
+        else:
+            self._weighted[row] = self._weigh(tf)
+
+    def nearest(self, text, signature=None):
+        """Return (key, similarity) of the best indexed neighbour above threshold, or (None, best similarity)."""
+        self.lookups += 1
+        if not self._rows:
+            return None, 0.0
+        query = self._weigh(self.vectorizer.transform(text))
+        scores = self._weighted @ query
+        k = min(self.candidates, self.capacity)
+        top = np.argpartition(scores, -k)[-k:]
+        best = 0.0
+        for row in top[np.argsort(-scores[top])]:
+            score = float(scores[row])
+            best = max(best, score)
+            if score < self.threshold:
+                break
+            if self._keys[row] is not None and self._signatures[row] == signature:
+                self._last_used[row] = time.monotonic()
+                return self._keys[row], score
+        return None, best
+
+    def record_hit(self, similarity):
+        self.hits += 1
+        self.similarity_sum += similarity
+
+    def discard(self, key):
+        row = self._rows.get(key)
+        if row is not None:
+            self._remove_row(row)
+
+    def stats(self):
+        return {
+            "entries": len(self._rows),
+            "capacity": self.capacity,
+            "threshold": self.threshold,
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "hit_rate": round(self.hits / self.lookups, 4) if self.lookups else 0.0,
+            "mean_similarity": round(self.similarity_sum / self.hits, 4) if self.hits else 0.0,
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,222 @@
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+
+
+def estimate_tokens(text):
+    """Rough token count (about four characters per token in English)."""
+    return len(text) // 4 + 1
+
+
+def source_id(kind, source):
+    """Stable id for a PubMed article or fact-check review."""
+    url = source.get("url", "")
+    if kind == "pubmed" and "pubmed.ncbi.nlm.nih.gov/" in url:
+        return "pmid:" + url.rstrip("/").rsplit("/", 1)[-1]
+    return f"{kind}:{hashlib.sha1(url.encode()).hexdigest()[:12]}"
+
+
+class Session:
+    """Compact history of one chat: per-turn records plus the sources they cited, stored once."""
+
+    __slots__ = ("chat_id", "turns", "sources", "last_active", "size")
+
+    def __init__(self, chat_id, turns=None, sources=None, last_active=None):
+        self.chat_id = chat_id
+        self.turns = turns or []
+        self.sources = sources or {}
+        self.last_active = last_active or time.time()
+        self.size = self._measure()
+
+    def _measure(self):
+        return len(json.dumps(self.to_dict(), separators=(",", ":")))
+
+    def to_dict(self):
+        return {"chat_id": self.chat_id, "turns": self.turns, "sources": self.sources,
+                "last_active": self.last_active}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["chat_id"], data["turns"], data["sources"], data["last_active"])
+
+    def sources_for(self, symptom):
+        """PubMed and fact-check results already fetched for symptom in an earlier turn, or None."""
+        for turn in reversed(self.turns):
+            if turn["symptom"] == symptom:
+                return {kind: [self.sources[sid] for sid in turn["sources"][kind] if sid in self.sources]
+                        for kind in ("pubmed", "fact_checks")}
+        return None
+
+    @property
+    def last_symptom(self):
+        return self.turns[-1]["symptom"] if self.turns else None
+
+
+class SessionStore:
+    """Memory-bounded conversation store keyed by chat_id.
+
+    Sessions live in an LRU ordered by last use. Past max_sessions or
+    max_bytes (measured on the compact JSON form) the least recently used are
+    evicted, spilling to spill_dir when one is set; sessions idle longer than
+    idle_ttl are dropped (spilled ones when next looked up). Turns keep the message, the
+    extracted symptom, the answer (each truncated) and source ids; the
+    sources themselves are stored once per session.
+
+    Each worker process has its own store, so follow-ups need sticky routing
+    (or a single worker) unless the spill directory is shared.
+    """
+
+    def __init__(self, max_sessions=2000, max_bytes=32 * 1024 * 1024, idle_ttl=6 * 3600,
+                 max_turns=20, max_chars=600, context_block=4, spill_dir=None):
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.idle_ttl = idle_ttl
+        self.max_turns = max_turns
+        self.max_chars = max_chars
+        self.context_block = context_block
+        self.spill_dir = spill_dir
+        if spill_dir:
+            os.makedirs(spill_dir, exist_ok=True)
+        self._sessions = OrderedDict()
+        self.bytes = 0
+        self.evictions = 0
+        self.spills = 0
+        self.restores = 0
+        self.expirations = 0
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def _spill_path(self, chat_id):
+        return os.path.join(self.spill_dir, hashlib.sha256(chat_id.encode()).hexdigest() + ".json")
+
+    def _spill(self, session):
+        if not self.spill_dir:
+            return
+        try:
+            path = self._spill_path(session.chat_id)
+            with open(path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump(session.to_dict(), f, separators=(",", ":"))
+            os.replace(path + ".tmp", path)
+            self.spills += 1
+        except OSError as e:
+            logging.warning(f"Session spill failed: {str(e)}")
+
+    def _restore(self, chat_id):
+        if not self.spill_dir:
+            return None
+        path = self._spill_path(chat_id)
+        try:
+            with open(path, encoding="utf-8") as f:
+                session = Session.from_dict(json.load(f))
+            os.remove(path)
+        except (OSError, ValueError, KeyError):
+            return None
+        if time.time() - session.last_active > self.idle_ttl:
+            self.expirations += 1
+            return None
+        self.restores += 1
+        return session
+
+    def _remove(self, chat_id):
+        session = self._sessions.pop(chat_id)
+        self.bytes -= session.size
+        return session
+
+    def _enforce_limits(self):
+        now = time.time()
+        # Oldest first, so idle sessions are all at the front
+        while self._sessions:
+            chat_id, session = next(iter(self._sessions.items()))
+            if now - session.last_active > self.idle_ttl:
+                self._remove(chat_id)
+                self.expirations += 1
+            elif len(self._sessions) > self.max_sessions or self.bytes > self.max_bytes:
+                self._spill(self._remove(chat_id))
+                self.evictions += 1
+            else:
+                break
+
+    def get(self, chat_id):
+        """Return the session for chat_id from memory or spill, or None."""
+        session = self._sessions.get(chat_id)
+        if session is None:
+            session = self._restore(chat_id)
+            if session is None:
+                return None
+            self._sessions[chat_id] = session
+            self.bytes += session.size
+        elif time.time() - session.last_active > self.idle_ttl:
+            self._remove(chat_id)
+            self.expirations += 1
+            return None
+        session.last_active = time.time()
+        self._sessions.move_to_end(chat_id)
+        return session
+
+    def record_turn(self, chat_id, text, symptom, summary, pubmed=(), fact_checks=()):
+        """Append a compact record of one answered message to the chat's session."""
+        session = self.get(chat_id) or Session(chat_id)
+        turn_sources = {"pubmed": [], "fact_checks": []}
+        for kind, items in (("pubmed", pubmed), ("fact_checks", fact_checks)):
+            for item in items:
+                sid = source_id(kind, item)
+                session.sources[sid] = item
+                turn_sources[kind].append(sid)
+        session.turns.append({
+            "n": session.turns[-1]["n"] + 1 if session.turns else 1,
+            "text": text[:self.max_chars],
+            "symptom": symptom,
+            "summary": (summary or "")[:self.max_chars],
+            "sources": turn_sources,
+        })
+        if len(session.turns) > self.max_turns:
+            del session.turns[:len(session.turns) - self.max_turns]
+            cited = {sid for turn in session.turns for ids in turn["sources"].values() for sid in ids}
+            session.sources = {sid: item for sid, item in session.sources.items() if sid in cited}
+        session.last_active = time.time()
+        if chat_id in self._sessions:
+            self.bytes -= self._sessions[chat_id].size
+        session.size = session._measure()
+        self._sessions[chat_id] = session
+        self._sessions.move_to_end(chat_id)
+        self.bytes += session.size
+        self._enforce_limits()
+        return session
+
+    def build_context(self, session, token_budget=600):
+        """Render earlier turns for a follow-up prompt within token_budget.
+
+        The rendering is append-only: a new turn only adds lines at the end,
+        so the prompt prefix stays identical across turns and upstream prompt
+        caches keep hitting. When the budget is exceeded the window start
+        moves forward in blocks of context_block turns rather than one turn
+        per message, so the prefix changes rarely. Window starts are aligned
+        to turn numbers, so trimming old turns doesn't move them either.
+        """
+        lines = [self._render_turn(turn) for turn in session.turns]
+        costs = [estimate_tokens(line) for line in lines]
+        start = len(lines) - 1
+        for i, turn in enumerate(session.turns):
+            if (turn["n"] - 1) % self.context_block == 0 and sum(costs[i:]) <= token_budget:
+                start = i
+                break
+        return "\n".join(lines[max(start, 0):])
+
+    @staticmethod
+    def _render_turn(turn):
+        return f"Turn {turn['n']} - user: {turn['text']} | topic: {turn['symptom'] or 'general'} | answer: {turn['summary']}"
+
+    def stats(self):
+        return {
+            "sessions": len(self._sessions),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "evictions": self.evictions,
+            "spills": self.spills,
+            "restores": self.restores,
+            "expirations": self.expirations,
+        }
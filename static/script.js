@@ -23,6 +23,15 @@ document.addEventListener("DOMContentLoaded", () => {
   let currentChatId = null;
   let isInConversation = false;
 
+  // Must match VERIFY_MAX_CHARS on the backend and VERIFY_CACHE_NAME in service-worker.js
+  const VERIFY_MAX_CHARS = 1000;
+  const VERIFY_CACHE_NAME = "veriguard-verify-v1";
+
+  // Wake a sleeping instance while the user is still typing
+  fetch("https://veriguard.onrender.com/readyz", { cache: "no-store" }).catch(
+    () => {}
+  );
+
   // Create loading spinner
   const loadingSpinner = document.createElement("div");
   loadingSpinner.className = "loading-spinner";
@@ -388,6 +397,92 @@ document.addEventListener("DOMContentLoaded", () => {
     updateURL("/");
   }
 
+  // Whether the service worker already holds a /verify answer for url
+  async function hasCachedAnswer(url) {
+    if (!("caches" in window)) return false;
+    try {
+      return Boolean(await caches.match(url, { cacheName: VERIFY_CACHE_NAME }));
+    } catch (e) {
+      return false;
+    }
+  }
+
+  // A chat begun at GET /verify has no server-side session yet; its first
+  // message lets the backend seed one from the cached answer
+  function appendFirstMessage(formData) {
+    const chat = chatHistory.find((c) => c.chat_id === currentChatId);
+    if (chat && chat.first_message) {
+      formData.append("first_message", chat.first_message);
+    }
+  }
+
+  // Read a text/event-stream response, dispatching each event to its handler.
+  // Resolves with the payload of the final "done" event.
+  async function readEventStream(response, handlers) {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = "";
+    let result = null;
+
+    const dispatch = (block) => {
+      let eventName = "message";
+      const dataLines = [];
+      block.split("\n").forEach((line) => {
+        if (line.startsWith("event:")) eventName = line.slice(6).trim();
+        else if (line.startsWith("data:")) dataLines.push(line.slice(5).trim());
+      });
+      if (dataLines.length === 0) return;
+      const payload = JSON.parse(dataLines.join("\n"));
+      if (eventName === "done") {
+        result = payload;
+      } else if (handlers[eventName]) {
+        handlers[eventName](payload);
+      }
+    };
+
+    while (true) {
+      const { value, done } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+      let boundary;
+      while ((boundary = buffer.indexOf("\n\n")) !== -1) {
+        dispatch(buffer.slice(0, boundary));
+        buffer = buffer.slice(boundary + 2);
+      }
+    }
+    if (buffer.trim()) dispatch(buffer);
+
+    if (!result) throw new Error("Stream ended before the response completed");
+    return result;
+  }
+
+  // Append a list of source links under a reply
+  function renderSources(container, heading, items) {
+    if (!items || items.length === 0) return;
+
+    const section = document.createElement("div");
+    section.style.marginTop = "0.25rem";
+
+    const title = document.createElement("div");
+    title.textContent = `${heading}:`;
+    title.style.fontWeight = "bold";
+    section.appendChild(title);
+
+    items.forEach((item) => {
+      const link = document.createElement("a");
+      link.href = item.url;
+      link.target = "_blank";
+      link.rel = "noopener noreferrer";
+      link.textContent = item.title || item.claim || item.url;
+      link.style.display = "block";
+      link.style.color = "#93C5FD";
+      section.appendChild(link);
+    });
+
+    container.appendChild(section);
+    chatArea.scrollTop = chatArea.scrollHeight;
+  }
+
   // Handle file upload click
   if (document.querySelector(".upload-icon")) {
     document.querySelector(".upload-icon").addEventListener("click", () => {
@@ -435,6 +530,7 @@ document.addEventListener("DOMContentLoaded", () => {
       if (currentChatId) {
         formData.append("chat_id", currentChatId);
         formData.append("conversation_context", "true");
+        appendFirstMessage(formData);
       }
 
       if (file) {
@@ -475,6 +571,33 @@ document.addEventListener("DOMContentLoaded", () => {
       // Scroll to bottom
       chatArea.scrollTop = chatArea.scrollHeight;
 
+      // A typed first message the service worker already has an answer for goes through
+      // the cacheable GET /verify and shows at once; anything else streams from
+      // /process/stream, and its answer is then fetched into the /verify cache
+      const typedText =
+        !currentChatId && !file && formData.has("text")
+          ? inputText.trim().replace(/\s+/g, " ")
+          : null;
+      const verifyUrl =
+        typedText && typedText.length <= VERIFY_MAX_CHARS
+          ? `https://veriguard.onrender.com/verify?q=${encodeURIComponent(
+              typedText
+            )}`
+          : null;
+      const verifyText =
+        verifyUrl && (await hasCachedAnswer(verifyUrl)) ? typedText : null;
+      const sendRequest = (body, signal) =>
+        verifyText
+          ? fetch(verifyUrl, { signal })
+          : fetch("https://veriguard.onrender.com/process/stream", {
+              method: "POST",
+              body,
+              signal,
+              headers: {
+                "Cache-Control": "no-cache",
+              },
+            });
+
       // Set up timeout with retry logic for cold starts
       const controller = new AbortController();
       let timeoutId;
@@ -496,17 +619,7 @@ document.addEventListener("DOMContentLoaded", () => {
           console.log(
             `${isRetry ? "Retrying" : "Making initial"} request to backend...`
           );
-          const response = await fetch(
-            "https://veriguard.onrender.com/process",
-            {
-              method: "POST",
-              body: formData,
-              signal: controller.signal,
-              headers: {
-                "Cache-Control": "no-cache",
-              },
-            }
-          );
+          const response = await sendRequest(formData, controller.signal);
 
           clearTimeout(timeoutId);
           console.log("Backend response status:", response.status);
@@ -516,7 +629,7 @@ document.addEventListener("DOMContentLoaded", () => {
             throw new Error(`HTTP ${response.status}: ${errorText}`);
           }
 
-          return await response.json();
+          return response;
         } catch (error) {
           clearTimeout(timeoutId);
 
@@ -558,6 +671,7 @@ document.addEventListener("DOMContentLoaded", () => {
             if (currentChatId) {
               retryFormData.append("chat_id", currentChatId);
               retryFormData.append("conversation_context", "true");
+              appendFirstMessage(retryFormData);
             }
 
             if (fileValue) {
@@ -577,16 +691,9 @@ document.addEventListener("DOMContentLoaded", () => {
             }, 30000);
 
             try {
-              const retryResponse = await fetch(
-                "https://veriguard.onrender.com/process",
-                {
-                  method: "POST",
-                  body: retryFormData,
-                  signal: retryController.signal,
-                  headers: {
-                    "Cache-Control": "no-cache",
-                  },
-                }
+              const retryResponse = await sendRequest(
+                retryFormData,
+                retryController.signal
               );
 
               clearTimeout(retryTimeout);
@@ -599,7 +706,7 @@ document.addEventListener("DOMContentLoaded", () => {
               // Remove retry message
               retryContainer.remove();
 
-              return await retryResponse.json();
+              return retryResponse;
             } catch (retryError) {
               clearTimeout(retryTimeout);
               // Remove retry message
@@ -613,10 +720,9 @@ document.addEventListener("DOMContentLoaded", () => {
       };
 
       try {
-        const data = await makeRequest();
-        console.log("Backend response data:", data);
+        const response = await makeRequest();
 
-        // Create reply message with label
+        // Create reply message with label; it fills in as events arrive
         const replyContainer = document.createElement("div");
         replyContainer.style.marginBottom = "1rem";
 
@@ -628,21 +734,68 @@ document.addEventListener("DOMContentLoaded", () => {
         replyLabel.style.fontSize = "0.9rem";
 
         const reply = document.createElement("div");
-        const summaryText = data.summary || "No summary provided by backend";
-
-        try {
-          reply.innerHTML = marked.parse(summaryText);
-        } catch (e) {
-          console.error("Markdown parsing error:", e);
-          reply.textContent = summaryText;
-        }
+        reply.className = "chat-message reply";
 
-        reply.className = `chat-message reply ${data.summary ? "" : "error"}`;
+        const sourcesContainer = document.createElement("div");
+        sourcesContainer.style.marginTop = "0.5rem";
+        sourcesContainer.style.fontSize = "0.8rem";
+        sourcesContainer.style.color = "#9CA3AF";
 
         replyContainer.appendChild(replyLabel);
         replyContainer.appendChild(reply);
+        replyContainer.appendChild(sourcesContainer);
         chatArea.appendChild(replyContainer);
-        chatArea.scrollTop = chatArea.scrollHeight;
+        loadingSpinner.style.display = "none";
+
+        const renderSummary = (summaryText) => {
+          try {
+            reply.innerHTML = marked.parse(summaryText);
+          } catch (e) {
+            console.error("Markdown parsing error:", e);
+            reply.textContent = summaryText;
+          }
+          chatArea.scrollTop = chatArea.scrollHeight;
+        };
+
+        let streamedSummary = "";
+        const data = verifyText
+          ? await response.json()
+          : await readEventStream(response, {
+              token: (event) => {
+                streamedSummary += event.text;
+                renderSummary(streamedSummary);
+              },
+              pubmed: (items) =>
+                renderSources(sourcesContainer, "PubMed", items),
+              fact_checks: (items) =>
+                renderSources(sourcesContainer, "Fact checks", items),
+            });
+        if (verifyText) {
+          renderSources(sourcesContainer, "PubMed", data.sources?.pubmed);
+          renderSources(
+            sourcesContainer,
+            "Fact checks",
+            data.sources?.fact_checks
+          );
+        }
+        console.log("Backend response data:", data);
+
+        const summaryText = data.summary || "No summary provided by backend";
+        renderSummary(summaryText);
+        reply.className = `chat-message reply ${data.summary ? "" : "error"}`;
+
+        // Fetch the streamed answer into the /verify cache so asking again skips the
+        // backend. Only when whitespace normalization left the text unchanged, so the
+        // server's response cache answers it instead of the AI pipeline
+        if (
+          verifyUrl &&
+          !verifyText &&
+          data.summary &&
+          !data.degraded &&
+          typedText === inputText.trim()
+        ) {
+          fetch(verifyUrl).catch(() => {});
+        }
 
         // Save or update chat in history
         let existingChatIndex = -1;
@@ -671,6 +824,11 @@ document.addEventListener("DOMContentLoaded", () => {
               : Date.now(),
           updated_at: Date.now(),
           title: chatTitle, // Keep original title, don't update it
+          // GET /verify keeps no session, so follow-ups send this to seed one
+          first_message:
+            existingChatIndex >= 0
+              ? chatHistory[existingChatIndex].first_message
+              : verifyText || undefined,
           messages:
             existingChatIndex >= 0
               ? [
@@ -1,4 +1,6 @@
 const CACHE_NAME = "veriguard-cache-v1";
+const VERIFY_CACHE_NAME = "veriguard-verify-v1";
+const VERIFY_CACHE_MAX_ENTRIES = 200;
 const urlsToCache = [
   "/",
   "index.html",
@@ -6,16 +8,112 @@ const urlsToCache = [
   "https://cdn.jsdelivr.net/npm/tailwindcss@2.2.19/dist/tailwind.min.css",
 ];
 
+// Network fetches of /verify in progress, keyed by URL, so identical queries share one request
+const inflight = new Map();
+
 self.addEventListener("install", (event) => {
   event.waitUntil(
     caches.open(CACHE_NAME).then((cache) => cache.addAll(urlsToCache))
   );
 });
 
+self.addEventListener("activate", (event) => {
+  const keep = [CACHE_NAME, VERIFY_CACHE_NAME];
+  event.waitUntil(
+    caches
+      .keys()
+      .then((names) =>
+        Promise.all(
+          names
+            .filter((name) => !keep.includes(name))
+            .map((name) => caches.delete(name))
+        )
+      )
+  );
+});
+
+// max-age and stale-while-revalidate (seconds) from a Cache-Control header
+function cacheLifetimes(cacheControl) {
+  const directive = (name) => {
+    const match = new RegExp(`${name}=(\\d+)`).exec(cacheControl || "");
+    return match ? Number(match[1]) : 0;
+  };
+  return {
+    maxAge: directive("max-age"),
+    staleWhileRevalidate: directive("stale-while-revalidate"),
+  };
+}
+
+async function trimCache(cache) {
+  const keys = await cache.keys();
+  // Keys come back in insertion order, oldest first
+  await Promise.all(
+    keys
+      .slice(0, Math.max(0, keys.length - VERIFY_CACHE_MAX_ENTRIES))
+      .map((key) => cache.delete(key))
+  );
+}
+
+// Fetch a /verify answer from the network and store it; concurrent calls for one URL share a fetch
+function fetchVerify(request) {
+  const key = request.url;
+  if (!inflight.has(key)) {
+    const pending = fetch(request)
+      .then(async (response) => {
+        const cacheControl = response.headers.get("Cache-Control") || "";
+        if (response.ok && !cacheControl.includes("no-store")) {
+          // Record when it was fetched, since the cache API keeps no age of its own
+          const headers = new Headers(response.headers);
+          headers.set("X-SW-Fetched-At", String(Date.now()));
+          const stored = new Response(await response.clone().blob(), {
+            status: response.status,
+            statusText: response.statusText,
+            headers,
+          });
+          const cache = await caches.open(VERIFY_CACHE_NAME);
+          await cache.put(key, stored);
+          await trimCache(cache);
+        }
+        return response;
+      })
+      .finally(() => inflight.delete(key));
+    inflight.set(key, pending);
+  }
+  return inflight.get(key).then((response) => response.clone());
+}
+
+// Stale-while-revalidate for GET /verify: fresh answers never leave the device, stale ones are
+// served at once and refreshed in the background, expired ones wait for the network
+async function handleVerify(event) {
+  const cache = await caches.open(VERIFY_CACHE_NAME);
+  const cached = await cache.match(event.request.url);
+  if (!cached) {
+    return fetchVerify(event.request);
+  }
+  const { maxAge, staleWhileRevalidate } = cacheLifetimes(
+    cached.headers.get("Cache-Control")
+  );
+  const age =
+    (Date.now() - Number(cached.headers.get("X-SW-Fetched-At") || 0)) / 1000;
+  if (age < maxAge) {
+    return cached;
+  }
+  if (age < maxAge + staleWhileRevalidate) {
+    event.waitUntil(fetchVerify(event.request).catch(() => {}));
+    return cached;
+  }
+  return fetchVerify(event.request).catch(() => cached);
+}
+
 self.addEventListener("fetch", (event) => {
+  const url = new URL(event.request.url);
+  if (event.request.method === "GET" && url.pathname === "/verify") {
+    event.respondWith(handleVerify(event));
+    return;
+  }
   event.respondWith(
     caches
       .match(event.request)
       .then((response) => response || fetch(event.request))
   );
-});
\ No newline at end of file
+});
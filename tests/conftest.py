@@ -0,0 +1,7 @@
+import os
+import sys
+
+# The app modules live at the repository root rather than in a package; the local
+# stand-ins for upstreams and Redis live in benchmarks/
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "benchmarks")]
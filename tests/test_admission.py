@@ -0,0 +1,45 @@
+import asyncio
+
+from fastapi.testclient import TestClient
+
+import main
+from admission import AdmissionController
+
+ANSWER = {"summary": "- No evidence supports this.", "sources": {"pubmed": [], "fact_checks": []}, "chat_title": "Claim"}
+
+
+def test_client_limit_ignores_chat_id(monkeypatch):
+    async def analyze_or_reuse(text):
+        return ANSWER
+
+    monkeypatch.setattr(main, "admission", AdmissionController(client_rate=0.001, client_burst=2))
+    monkeypatch.setattr(main, "analyze_or_reuse", analyze_or_reuse)
+    client = TestClient(main.app)
+    responses = [client.post("/process", data={"text": f"Is claim {i} true?", "chat_id": f"random-{i}"}).json()
+                 for i in range(3)]
+    assert [bool(response.get("degraded")) for response in responses] == [False, False, True]
+
+
+def test_batch_items_take_admission_slots(monkeypatch):
+    admission = AdmissionController(max_in_flight=2, max_queue=0, client_rate=0)
+    in_flight = []
+
+    async def analyze_or_reuse(text):
+        in_flight.append(admission.in_flight)
+        await asyncio.sleep(0.05)
+        return ANSWER
+
+    monkeypatch.setattr(main, "admission", admission)
+    monkeypatch.setattr(main, "analyze_or_reuse", analyze_or_reuse)
+    body = TestClient(main.app).post("/process/batch", json={"texts": [f"Is batch claim {i} true?" for i in range(6)]}).json()
+    assert in_flight and all(count >= 1 for count in in_flight)
+    assert body["stats"]["degraded"] == 6 - len(in_flight)
+    assert admission.in_flight == 0
+
+
+def test_batch_counts_once_against_client_rate(monkeypatch):
+    monkeypatch.setattr(main, "admission", AdmissionController(client_rate=0.001, client_burst=1))
+    client = TestClient(main.app)
+    assert client.post("/process/batch", json={"texts": []}).status_code == 200
+    response = client.post("/process/batch", json={"texts": []})
+    assert response.status_code == 503 and response.headers["Retry-After"]
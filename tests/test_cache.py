@@ -0,0 +1,66 @@
+import asyncio
+import time
+
+from fastapi.testclient import TestClient
+
+import main
+from cache import MemoryBackend, ResponseCache, SQLiteBackend
+
+
+def test_responses_do_not_evict_evidence():
+    async def run():
+        evidence = main.pubmed_evidence.cache
+        await evidence.set("pubmed:search:headache", {"ids": ["1"], "fetched_at": 0})
+        for i in range(main.response_cache.backend.max_entries + 1):
+            await main.response_cache.set(f"response-{i}", {"summary": "x"})
+        return await evidence.peek("pubmed:search:headache")
+
+    assert asyncio.run(run()) == {"ids": ["1"], "fetched_at": 0}
+
+
+def test_snapshot_downtime_counts_against_ttl(tmp_path, monkeypatch):
+    path = str(tmp_path / "snapshot.jsonl")
+
+    async def save():
+        cache = ResponseCache(MemoryBackend())
+        await cache.set("short", {"summary": "a"}, ttl=60)
+        await cache.set("long", {"summary": "b"}, ttl=600)
+        return cache.save_snapshot(path)
+
+    assert asyncio.run(save()) == 2
+
+    # Restarted two minutes later: "short" expired while the process was down
+    now = time.time() + 120
+    monkeypatch.setattr(time, "time", lambda: now)
+
+    async def load():
+        cache = ResponseCache(MemoryBackend())
+        loaded = await cache.load_snapshot(path)
+        (_, _, remaining), = cache.backend.snapshot()
+        return loaded, await cache.peek("short"), await cache.peek("long"), remaining
+
+    loaded, short, long, remaining = asyncio.run(load())
+    assert (loaded, short, long) == (1, None, {"summary": "b"})
+    assert 470 < remaining <= 480
+
+
+def test_sqlite_stats_are_counted_off_the_event_loop(tmp_path, monkeypatch):
+    backend = SQLiteBackend(str(tmp_path / "cache.sqlite3"))
+    on_event_loop = []
+    count = backend.stats
+
+    def stats():
+        try:
+            asyncio.get_running_loop()
+            on_event_loop.append(True)
+        except RuntimeError:
+            on_event_loop.append(False)
+        return count()
+
+    monkeypatch.setattr(backend, "stats", stats)
+    monkeypatch.setattr(main, "response_cache", ResponseCache(backend, name="responses"))
+    asyncio.run(main.response_cache.set("key", {"summary": "x"}))
+
+    body = TestClient(main.app).get("/cache/stats").json()
+    assert body["responses"]["backend"] == "sqlite" and body["responses"]["entries"] == 1
+    assert on_event_loop == [False]
@@ -0,0 +1,33 @@
+import asyncio
+
+import aiohttp
+import pytest
+from aiohttp.test_utils import TestServer
+
+from llm import GeminiClient
+from mock_upstreams import load_profile, make_app
+
+KEY = "SECRET-GEMINI-KEY"
+
+
+async def call_gemini(error_rate):
+    profile = load_profile()
+    profile["gemini"].update(latency={"dist": "fixed", "value": 0.0}, error_rate=error_rate)
+    server = TestServer(make_app(profile))
+    await server.start_server()
+    try:
+        async with aiohttp.ClientSession() as session:
+            client = GeminiClient(lambda: session, KEY, base_url=str(server.make_url("/gemini")))
+            return await client.generate("Extract the main symptom from: cough")
+    finally:
+        await server.close()
+
+
+def test_key_is_sent_in_header():
+    assert asyncio.run(call_gemini(0.0)) == "cough"
+
+
+def test_errors_do_not_reveal_key():
+    with pytest.raises(aiohttp.ClientResponseError) as error:
+        asyncio.run(call_gemini(1.0))
+    assert KEY not in str(error.value)
@@ -0,0 +1,51 @@
+import io
+
+import pytest
+from fastapi.testclient import TestClient
+from PIL import Image
+
+import main
+from ocr_jobs import JobQueue
+
+KEY = "SECRET-GEMINI-KEY"
+
+
+@pytest.fixture
+def failing_ocr(monkeypatch):
+    async def generate(prompt, image=None, **kwargs):
+        raise RuntimeError(f"400, message='Bad Request', url='https://example.test/generateContent?key={KEY}'")
+
+    async def analyze_text(*args, **kwargs):
+        raise AssertionError("the pipeline must not run on a failed OCR")
+
+    monkeypatch.setattr(main, "GEMINI_API_KEY", KEY)
+    monkeypatch.setattr(main.gemini_client, "generate", generate)
+    monkeypatch.setattr(main, "analyze_text", analyze_text)
+    monkeypatch.setattr(main, "analyze_or_reuse", analyze_text)
+    monkeypatch.setattr(main, "ocr_jobs", JobQueue())
+    monkeypatch.setattr(main, "WARMUP_MODE", "off")
+    # One event loop for the whole test, so queued jobs outlive the request that submitted them
+    with TestClient(main.app) as client:
+        yield client
+    if main.image_pool is not None:
+        main.image_pool.shutdown(cancel_futures=True)
+        main.image_pool = None
+
+
+def png(color):
+    buffer = io.BytesIO()
+    Image.new("RGB", (64, 48), color).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def test_failed_ocr_is_an_error_not_a_query(failing_ocr):
+    response = failing_ocr.post("/process", files={"file": ("claim.png", png("white"), "image/png")})
+    assert response.status_code == 502
+    assert KEY not in response.text
+
+
+def test_failed_ocr_job_is_marked_failed(failing_ocr):
+    job = failing_ocr.post("/ocr/jobs", files={"file": ("claim.png", png("gray"), "image/png")}).json()
+    status = failing_ocr.get(job["poll"], params={"wait": 10}).json()
+    assert status["status"] == "failed"
+    assert "text" not in status and KEY not in status["error"]
@@ -0,0 +1,64 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from cache import MemoryBackend, ResponseCache
+from pipeline import Stage, run_pipeline
+
+
+async def fail(**kwargs):
+    raise RuntimeError("upstream down")
+
+
+async def hang(**kwargs):
+    await asyncio.sleep(1)
+
+
+def force_fallbacks(stages, func, timeout):
+    return [Stage(stage.name, func, stage.deps, timeout, stage.fallback) for stage in stages]
+
+
+@pytest.mark.parametrize("is_continuing_conversation", [False, True])
+@pytest.mark.parametrize("func, timeout, status", [(fail, None, "error"), (hang, 0.01, "timeout")])
+def test_every_stage_falls_back(is_continuing_conversation, func, timeout, status):
+    stages = force_fallbacks(main.build_stages(is_continuing_conversation), func, timeout)
+    text = "Does garlic cure a cold?"
+    result = asyncio.run(run_pipeline(stages, inputs={"text": text, "classification": main.classify(text)}))
+
+    assert result.statuses == {stage.name: status for stage in stages}
+    assert result["pubmed"] == [] and result["fact_checks"] == []
+    assert result["query"] == main.fallback_extract_query(main.normalize_query_text(text))
+    response = main.build_response(result, is_continuing_conversation)
+    assert response["summary"]
+    if not is_continuing_conversation:
+        assert response["chat_title"] == main.fallback_chat_title(text)
+
+
+def test_fallback_gets_dependency_results():
+    async def run():
+        stages = [
+            Stage("query", fail, deps=["text"], fallback=lambda text: text.upper()),
+            Stage("summary", fail, deps=["text", "query"], fallback=lambda text, query: f"{query}!"),
+        ]
+        return await run_pipeline(stages, inputs={"text": "cough"})
+
+    result = asyncio.run(run())
+    assert result["query"] == "COUGH"
+    assert result["summary"] == "COUGH!"
+
+
+def test_degraded_answer_is_served_but_not_cached(monkeypatch):
+    build_stages = main.build_stages
+    monkeypatch.setattr(main, "build_stages", lambda *args: force_fallbacks(build_stages(*args), fail, None))
+    monkeypatch.setattr(main, "response_cache", ResponseCache(MemoryBackend()))
+    monkeypatch.setattr(main, "SEMANTIC_CACHE_ENABLED", False)
+    client = TestClient(main.app)
+    text = "Does garlic cure a cold?"
+
+    response = client.get("/verify", params={"q": text})
+    assert response.status_code == 200
+    assert response.json()["degraded"] is True
+    assert response.headers["cache-control"] == "no-store"
+    assert asyncio.run(main.response_cache.peek(main.get_cache_key(text))) is None
@@ -0,0 +1,120 @@
+import asyncio
+
+from cache import RedisBackend, ResponseCache
+from mock_redis import MockRedis
+
+
+def run(test, password=None):
+    async def main():
+        async with MockRedis(password) as server:
+            return await test(server)
+
+    return asyncio.run(main())
+
+
+def test_roundtrip_with_prefix_and_binary_payload():
+    async def test(server):
+        backend = RedisBackend(server.url, prefix="vg:")
+        payload = b"line one\r\n$5\r\n\x00\xff"
+        await backend.set("answer", payload, ttl=60)
+        assert await backend.get("answer") == payload
+        assert set(server.databases[0]) == {b"vg:answer"}
+        await backend.delete("answer")
+        assert await backend.get("answer") is None
+        await backend.close()
+
+    run(test)
+
+
+def test_entries_expire():
+    async def test(server):
+        backend = RedisBackend(server.url)
+        await backend.set("short", b"x", ttl=0.05)
+        assert await backend.get("short") == b"x"
+        await asyncio.sleep(0.1)
+        assert await backend.get("short") is None
+
+    run(test)
+
+
+def test_connections_are_pooled():
+    async def test(server):
+        backend = RedisBackend(server.url, pool_size=4)
+        for i in range(20):
+            await backend.set(f"k{i}", b"v", ttl=60)
+        assert server.connections == 1
+        values = await asyncio.gather(*(backend.get(f"k{i}") for i in range(20)))
+        assert values == [b"v"] * 20
+        assert server.connections <= 4
+        assert backend.stats()["idle_connections"] == server.connections
+
+    run(test)
+
+
+def test_auth_and_select_on_connect():
+    async def test(server):
+        backend = RedisBackend(f"redis://:secret@127.0.0.1:{server.port}/3")
+        await backend.set("k", b"v", ttl=60)
+        assert server.databases[3] == {b"veriguard:k": server.databases[3][b"veriguard:k"]}
+        assert server.commands["AUTH"] == 1 and server.commands["SELECT"] == 1
+
+        wrong = RedisBackend(f"redis://:wrong@127.0.0.1:{server.port}/0")
+        assert await wrong.get("k") is None
+        assert wrong.errors == 1
+
+    run(test, password="secret")
+
+
+def test_error_reply_keeps_connection():
+    async def test(server):
+        backend = RedisBackend(server.url)
+        await backend.set("k", b"v", ttl=60)
+        server.fail_next["GET"] = "OOM command not allowed"
+        assert await backend.get("k") is None
+        assert backend.errors == 1
+        assert await backend.get("k") == b"v"
+        assert server.connections == 1
+
+    run(test)
+
+
+def test_dropped_connection_is_replaced():
+    async def test(server):
+        backend = RedisBackend(server.url)
+        await backend.set("k", b"v", ttl=60)
+        server.drop_next.add("GET")
+        assert await backend.get("k") is None
+        assert backend.errors == 1
+        assert await backend.get("k") == b"v"
+        assert server.connections == 2
+
+    run(test)
+
+
+def test_unreachable_server_degrades_to_misses():
+    async def test(server):
+        port = server.port
+        await server.close()
+        backend = RedisBackend(f"redis://127.0.0.1:{port}/0", timeout=0.5)
+        assert await backend.get("k") is None
+        await backend.set("k", b"v", ttl=60)
+        assert backend.errors == 2
+
+    run(test)
+
+
+def test_response_cache_over_redis():
+    async def test(server):
+        cache = ResponseCache(RedisBackend(server.url), ttl=60)
+        calls = []
+
+        async def compute():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return {"summary": "ok"}
+
+        results = await asyncio.gather(*(cache.get_or_compute("q", compute) for _ in range(5)))
+        assert results == [{"summary": "ok"}] * 5 and len(calls) == 1
+        assert await ResponseCache(RedisBackend(server.url)).get("q") == {"summary": "ok"}
+
+    run(test)
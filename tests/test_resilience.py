@@ -0,0 +1,56 @@
+import asyncio
+
+import aiohttp
+from aiohttp.test_utils import TestServer
+
+from cache import MemoryBackend, ResponseCache
+from evidence import PubMedEvidence
+from llm import GeminiClient
+from ratelimit import TokenBucket
+from mock_upstreams import load_profile, make_app
+from resilience import UpstreamPolicy
+
+FAST = {"latency": {"dist": "fixed", "value": 0.05}, "error_rate": 0.0, "rate_limit": None}
+
+
+async def serve(run):
+    """Run run(base_url, session) against the mock upstreams with every upstream answering in 50 ms."""
+    profile = load_profile()
+    for settings in profile.values():
+        settings.update(FAST)
+    server = TestServer(make_app(profile))
+    await server.start_server()
+    try:
+        async with aiohttp.ClientSession() as session:
+            return await run(str(server.make_url("")), session)
+    finally:
+        await server.close()
+
+
+def test_rate_limit_wait_is_not_upstream_latency():
+    policy = UpstreamPolicy("pubmed", max_timeout=0.5, max_attempts=1)
+
+    async def run(base_url, session):
+        evidence = PubMedEvidence(lambda: session, ResponseCache(MemoryBackend()), TokenBucket(20, burst=1),
+                                  base_url=f"{base_url}/pubmed", batch_window=0.5, policy=policy)
+        # 20 searches queue for ~1s of tokens, twice the policy timeout
+        return await asyncio.gather(*(evidence.search(f"symptom {i}") for i in range(20)))
+
+    results = asyncio.run(serve(run))
+    assert all(len(articles) == 2 for articles in results)
+    assert max(policy.latencies._samples) < 0.5
+    assert policy.breaker.state == "closed"
+
+
+def test_semaphore_wait_is_not_upstream_latency():
+    policy = UpstreamPolicy("gemini", max_timeout=0.2, max_attempts=1)
+
+    async def run(base_url, session):
+        client = GeminiClient(lambda: session, "key", base_url=f"{base_url}/gemini", max_concurrency=1,
+                              policy=policy)
+        # Ten 50 ms calls through one slot take 0.5s, longer than the 0.2s timeout
+        return await asyncio.gather(*(client.generate(f"Extract the main symptom from: cough {i}") for i in range(10)))
+
+    results = asyncio.run(serve(run))
+    assert results == ["cough"] * 10
+    assert max(policy.latencies._samples) < 0.2
@@ -0,0 +1,44 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+import main
+from semantic_cache import SemanticCache
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def reuses(cached, query):
+    index = SemanticCache(capacity=16, dim=2048, threshold=0.6)
+    index.add(cached, "cached", main.semantic_signature(cached))
+    key, _ = index.nearest(query, main.semantic_signature(query))
+    return key == "cached"
+
+
+@pytest.mark.parametrize("cached, query", [
+    ("I have a headache", "I have a headache for 3 weeks"),
+    ("I have a headache", "I have a severe headache"),
+    ("I have a headache", "I have had a headache since yesterday"),
+    ("headache for 2 days", "headache for 3 days"),
+    ("I have a fever", "I don't have a fever"),
+    ("I have a headache", "I have a heartache"),
+    ("Does garlic cure a cold?", "Does ginger cure a cold?"),
+])
+def test_queries_that_ask_something_else_do_not_match(cached, query):
+    assert not reuses(cached, query)
+
+
+@pytest.mark.parametrize("cached, query", [
+    ("I have a headache", "i have headaches"),
+    ("I have a headache!", "i have a headache."),
+    ("Does garlic cure colds?", "does garlic cure colds"),
+])
+def test_paraphrases_match(cached, query):
+    assert reuses(cached, query)
+
+
+def test_import_does_not_load_numpy():
+    code = "import sys, main; assert 'numpy' not in sys.modules and main.semantic_cache is None"
+    subprocess.run([sys.executable, "-c", code], cwd=ROOT, check=True, capture_output=True)
@@ -0,0 +1,41 @@
+from fastapi.testclient import TestClient
+
+import main
+
+ANSWER = {
+    "summary": "- Rest and drink fluids.",
+    "sources": {"pubmed": [{"title": "Headache care", "url": "https://pubmed.ncbi.nlm.nih.gov/1/"}], "fact_checks": []},
+    "chat_title": "Headache help",
+}
+
+
+def test_followup_to_verify_chat_is_seeded_from_first_message(monkeypatch):
+    first = "Is a headache after coffee normal?"
+
+    async def analyze_or_reuse(text):
+        main.remember_extraction(main.normalize_query_text(text), "headache")
+        return ANSWER
+
+    sessions = []
+
+    async def analyze_text(text, is_continuing_conversation, on_complete=None, on_token=None, session=None):
+        sessions.append(session)
+        return {**ANSWER, "chat_title": None}
+
+    monkeypatch.setattr(main, "analyze_or_reuse", analyze_or_reuse)
+    monkeypatch.setattr(main, "analyze_text", analyze_text)
+    client = TestClient(main.app)
+
+    assert client.get("/verify", params={"q": first}).status_code == 200
+    # The client makes up its own chat id for chats begun at /verify
+    form = {"chat_id": "chat-verify-1", "conversation_context": "true", "text": "what about for kids?"}
+    client.post("/process", data={**form, "first_message": first})
+
+    session = sessions[0]
+    assert [turn["text"] for turn in session.turns[:1]] == [first]
+    assert session.last_symptom == "headache"
+    assert session.sources_for("headache")["pubmed"] == ANSWER["sources"]["pubmed"]
+
+    # Without first_message an unknown chat still starts empty
+    client.post("/process", data={**form, "chat_id": "chat-verify-2"})
+    assert sessions[1] is None